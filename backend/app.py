@@ -1,29 +1,51 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
-from models import db, FacebookPage, Message, Comment
+from models import db, Message, Comment
 from services.facebook_service import FacebookService
 from services.response_service import ResponseService
+from services.event_queue import EventQueue
+from services.page_identity import page_identity_cache
+from services.page_registry import page_registry
+from services.rule_snapshot import rule_cache
+from services.webhook_signature import webhook_verifier
+from services.http_client import pool_stats
+from services.profile_cache import profile_cache
+from services.outbound_dispatcher import outbound_dispatcher
+from services.event_dedup import event_dedup
+from services.stats_counters import stats_counters
+from services.nlp_annotations import nlp_annotator
+from services.nlp_rollups import nlp_rollups
+from services.history_export import history_exporter
+from services.metrics import events, registry, stage_seconds
+from services.structured_logging import (configure_logging, get_logger, log_context, log_payload,
+                                         logging_stats, new_correlation_id)
+from migrations import run_migrations
 from config import Config
 import os
-import requests
+
+log = get_logger('webhook')
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     
+    # Logs structurés écrits par un thread dédié (LOG_LEVEL, LOG_FORMAT)
+    configure_logging(app)
+    
     # Configuration CORS
     CORS(app, 
          resources={r"/api/*": {"origins": "*"}},
          supports_credentials=True,
          allow_headers=["Content-Type", "Authorization"],
+         expose_headers=["X-Next-Cursor"],
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
     
     # Initialiser la base de données
     db.init_app(app)
     
-    # Créer les tables
+    # Créer / mettre à jour le schéma (migrations numérotées)
     with app.app_context():
-        db.create_all()
+        run_migrations(db.engine)
     
     # Enregistrer les blueprints
     try:
@@ -49,6 +71,38 @@ def create_app():
     
     # ==================== WEBHOOKS FACEBOOK ====================
     
+    # File d'ingestion: le webhook répond tout de suite, les workers traitent
+    event_queue = None
+    if app.config.get('WEBHOOK_ASYNC'):
+        event_queue = EventQueue(
+            app,
+            lambda entry: process_entry(entry),
+            max_size=app.config.get('WEBHOOK_QUEUE_SIZE', 1000),
+            workers=app.config.get('WEBHOOK_WORKERS', 4)
+        )
+        app.extensions['event_queue'] = event_queue
+    
+    # Déduplication des webhooks: purge des réservations anciennes (commande flask dedup-purge)
+    event_dedup.init_app(app)
+    
+    # Signature X-Hub-Signature-256 des webhooks (FACEBOOK_APP_SECRET)
+    webhook_verifier.init_app(app)
+    
+    # Envoi des réponses cadencé par page, avec reprise après redémarrage
+    outbound_dispatcher.init_app(app)
+    
+    # Compteurs de /stats (commandes flask stats-rebuild / stats-check)
+    stats_counters.init_app(app)
+    
+    # Analyse NLP enregistrée avec les messages (commande flask nlp-reanalyze)
+    nlp_annotator.init_app(app)
+    
+    # Agrégats NLP par tranche de temps (compaction en arrière-plan)
+    nlp_rollups.init_app(app)
+    
+    # Export de l'historique (commande flask export, jobs via /api/exports)
+    history_exporter.init_app(app)
+    
     @app.route('/webhook', methods=['GET'])
     def verify_webhook():
         """Vérification du webhook Facebook"""
@@ -56,66 +110,117 @@ def create_app():
         token = request.args.get('hub.verify_token')
         challenge = request.args.get('hub.challenge')
         
-        print(f"🔐 Vérification webhook: mode={mode}, token={token}")
-        
         if mode == 'subscribe' and token == Config.FACEBOOK_VERIFY_TOKEN:
-            print('✅ Webhook vérifié avec succès!')
+            log.info('Webhook vérifié', extra={'mode': mode})
             return challenge, 200
         
-        print('❌ Échec de la vérification du webhook')
+        log.warning('Échec de la vérification du webhook', extra={'mode': mode})
         return 'Forbidden', 403
     
     @app.route('/webhook', methods=['POST'])
     def webhook():
         """Recevoir les notifications de Facebook"""
-        data = request.get_json()
+        # Signature vérifiée sur le corps brut, avant tout décodage ou requête
+        if not webhook_verifier.verify_request(request):
+            log.warning('Signature du webhook invalide, requête rejetée')
+            return 'Forbidden', 403
         
-        print("=" * 60)
-        print(f"📨 WEBHOOK REÇU")
-        print("=" * 60)
-        print(f"Data: {data}")
-        print("=" * 60)
-        
-        if not data or data.get('object') != 'page':
-            print("⚠️ Objet non-page, ignoré")
-            return 'OK', 200
+        data = request.get_json()
         
-        for entry in data.get('entry', []):
-            # Traiter les messages privés
-            if 'messaging' in entry:
-                print("💬 Événement messaging détecté")
-                for messaging_event in entry['messaging']:
-                    handle_message(messaging_event)
+        with log_context(request_id=new_correlation_id()):
+            log_payload(log, 'Webhook reçu', data)
             
-            # Traiter les commentaires
-            if 'changes' in entry:
-                print("💭 Événement changes détecté")
-                for change in entry['changes']:
-                    field = change.get('field')
-                    print(f"   Field: {field}")
-                    
-                    if field == 'feed':
-                        value = change.get('value', {})
-                        print(f"   Value: {value}")
-                        handle_comment(value)
+            if not data or data.get('object') != 'page':
+                log.info('Objet non-page, ignoré')
+                return 'OK', 200
+            
+            for entry in data.get('entry', []):
+                # Mode asynchrone: mettre en file et répondre immédiatement
+                if event_queue and event_queue.enqueue(entry):
+                    continue
+                
+                # Mode synchrone (ou file pleine): traiter directement
+                process_entry(entry)
         
         return 'OK', 200
     
+    @app.route('/health/ingestion', methods=['GET'])
+    def ingestion_stats():
+        """Métriques de la file d'ingestion des webhooks"""
+        if not event_queue:
+            return jsonify({'mode': 'sync', 'dedup': event_dedup.stats(), 'pages': page_registry.stats(),
+                            'rules': rule_cache.stats(), 'signature': webhook_verifier.stats()}), 200
+        
+        return jsonify({'mode': 'async', **event_queue.stats(), 'dedup': event_dedup.stats(),
+                        'pages': page_registry.stats(), 'rules': rule_cache.stats(),
+                        'signature': webhook_verifier.stats()}), 200
+    
+    @app.route('/health/http', methods=['GET'])
+    def http_stats():
+        """Réutilisation des connexions du pool HTTP vers le Graph API"""
+        return jsonify(pool_stats()), 200
+    
+    @app.route('/health/outbound', methods=['GET'])
+    def outbound_stats():
+        """File d'envoi des réponses et débit courant par page"""
+        return jsonify(outbound_dispatcher.stats()), 200
+    
+    @app.route('/health/logging', methods=['GET'])
+    def logging_health():
+        """File d'écriture des logs (enregistrements en attente / abandonnés)"""
+        return jsonify(logging_stats()), 200
+    
+    # Valeurs lues au moment du scrape de /metrics
+    if event_queue:
+        registry.gauge('chatbot_ingestion_queue_depth', 'Entrées webhook en attente de traitement',
+                       lambda: event_queue.stats().get('queue_depth'))
+    registry.gauge('chatbot_log_records_dropped', 'Enregistrements de log abandonnés (file pleine)',
+                   lambda: logging_stats().get('dropped'))
+    
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Compteurs et histogrammes de latence par étape (format Prometheus)"""
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
     @app.route('/privacy-policy', methods=['GET'])
     def privacy_policy():
         return render_template('privacy-policy.html')
     
     # ==================== HANDLERS ====================
     
-    def handle_message(messaging_event):
+    def process_entry(entry):
+        """Traiter une entrée webhook (messages privés et commentaires)"""
+        with log_context(entry_page_id=entry.get('id')):
+            # Traiter les messages privés
+            for messaging_event in entry.get('messaging', []):
+                handle_message(messaging_event, entry.get('id'))
+            
+            # Traiter les commentaires
+            for change in entry.get('changes', []):
+                field = change.get('field')
+                if field == 'feed':
+                    handle_comment(change.get('value', {}), entry.get('id'))
+                else:
+                    log.debug('Changement ignoré', extra={'field': field})
+    
+    def handle_message(messaging_event, entry_page_id=None):
         """Traiter un message reçu - VERSION SANS DOUBLONS"""
+        message = messaging_event.get('message', {})
+        page_label = str(entry_page_id or '')
+        events.inc('message', page_label, 'received')
+        with log_context(event_id=f"message:{message.get('mid')}", channel='message'), \
+                stage_seconds.time('message', 'total'):
+            outcome = _handle_message(messaging_event, message, entry_page_id)
+        events.inc('message', page_label, outcome)
+    
+    def _handle_message(messaging_event, message, entry_page_id):
+        """Issue de l'événement pour chatbot_events_total (replied, deduped, ignored, failed)"""
+        claimed_id = None
         try:
             # ✅ ÉTAPE 1: Éviter les échos (messages envoyés par le bot lui-même)
-            message = messaging_event.get('message', {})
-            
             if 'is_echo' in message or message.get('is_echo'):
-                print("   ⏭️ Écho détecté, ignoré")
-                return
+                log.debug('Écho ignoré')
+                return 'ignored'
             
             # ✅ ÉTAPE 2: Extraire les informations
             sender_id = messaging_event.get('sender', {}).get('id')
@@ -123,122 +228,117 @@ def create_app():
             message_id = message.get('mid')
             
             if not message_text or not sender_id or not message_id:
-                print("   ℹ️ Message incomplet, ignoré")
-                return
-            
-            print(f"📩 Message reçu de {sender_id}: {message_text[:50]}...")
-            
-            # ✅ ÉTAPE 3: VÉRIFIER SI DÉJÀ TRAITÉ (éviter doublons)
-            existing_message = Message.query.filter_by(message_id=message_id).first()
-            if existing_message:
-                print(f"   ⚠️ Message {message_id} déjà traité, ignoré")
-                return
-            
-            # ✅ ÉTAPE 4: Récupérer la page active
-            page = FacebookPage.query.filter_by(is_active=True).first()
+                log.debug('Message incomplet, ignoré')
+                return 'ignored'
+            
+            log.info('Message reçu', extra={'sender_id': sender_id})
+            log.debug('Texte du message: %s', message_text[:100])
+            
+            # ✅ ÉTAPE 3: RÉSERVER L'ÉVÉNEMENT (un seul INSERT, pas de doublons entre workers)
+            with stage_seconds.time('message', 'dedup'):
+                claimed = event_dedup.claim('message', message_id)
+            if not claimed:
+                log.info('Message déjà traité, ignoré')
+                return 'deduped'
+            claimed_id = message_id
+            
+            # ✅ ÉTAPE 4: Page destinataire (ID de l'entrée webhook, sinon du destinataire)
+            page = page_registry.resolve(entry_page_id or messaging_event.get('recipient', {}).get('id'))
             if not page:
-                print('   ❌ Aucune page active trouvée')
-                return
+                log.warning('Aucune page active pour cette entrée')
+                event_dedup.release('message', message_id)
+                return 'ignored'
             
             fb_service = FacebookService(page.access_token)
             
             # ✅ ÉTAPE 5: Vérifier que ce n'est pas notre propre page qui envoie
-            try:
-                page_info_url = f"https://graph.facebook.com/v18.0/me"
-                page_info_response = requests.get(page_info_url, params={
-                    'access_token': page.access_token
-                }, timeout=5)
-                
-                if page_info_response.status_code == 200:
-                    page_fb_id = page_info_response.json().get('id')
-                    
-                    if sender_id and str(sender_id) == str(page_fb_id):
-                        print(f"   ⚠️ C'est notre propre page ({sender_id}), ignoré")
-                        return
-            except Exception as e:
-                print(f"   ℹ️ Impossible de vérifier page ID: {e}")
+            with stage_seconds.time('message', 'page_identity'):
+                own_page = page_identity_cache.is_own_page(page.access_token, sender_id, fallback=page.page_id)
+            if own_page:
+                log.info('Message de notre propre page, ignoré')
+                return 'ignored'
             
             # ✅ ÉTAPE 6: Obtenir les infos de l'utilisateur
             try:
-                user_info = fb_service.get_user_info(sender_id)
-                sender_name = user_info.get('name', 'Utilisateur')
+                with stage_seconds.time('message', 'profile'):
+                    user_info = profile_cache.get_profile(fb_service, page.id, sender_id)
+                sender_name = (user_info or {}).get('name', 'Utilisateur')
             except:
                 sender_name = 'Utilisateur'
             
             # ✅ ÉTAPE 7: Trouver une réponse appropriée
-            response_text = ResponseService.find_matching_response(message_text, 'message')
+            with stage_seconds.time('message', 'match'):
+                response_text, analysis = ResponseService.match_response(message_text, 'message', page.id)
+            matched = bool(response_text)
             if not response_text:
                 response_text = ResponseService.get_default_response()
             
-            print(f"💬 Réponse: {response_text[:50]}...")
-            
             # ✅ ÉTAPE 8: ENREGISTRER D'ABORD (avant envoi)
-            new_message = Message(
-                message_id=message_id,
-                sender_id=sender_id,
-                sender_name=sender_name,
-                message_text=message_text,
-                response_sent=response_text,
-                is_automated=True,
-                page_id=page.id
-            )
-            db.session.add(new_message)
-            db.session.commit()
-            
-            print(f"   ✅ Message enregistré en base")
-            
-            # ✅ ÉTAPE 9: Envoyer la réponse (après enregistrement)
-            result = fb_service.send_message(sender_id, response_text)
-            
-            if 'error' in result:
-                print(f"❌ Erreur envoi: {result['error']}")
-                # Mettre à jour le message avec l'erreur
-                new_message.is_automated = False
-                new_message.response_sent = f"ERREUR: {result['error'].get('message', 'Erreur inconnue')}"
+            with stage_seconds.time('message', 'db_write'):
+                new_message = Message(
+                    message_id=message_id,
+                    sender_id=sender_id,
+                    sender_name=sender_name,
+                    message_text=message_text,
+                    response_sent=response_text,
+                    is_automated=True,
+                    page_id=page.id,
+                    **nlp_annotator.columns(analysis, response_text)
+                )
+                db.session.add(new_message)
+                db.session.flush()
+                stats_counters.record('message', page.id, new_message.timestamp, new_message.is_automated)
+                nlp_rollups.record('message', new_message)
+            
+                # ✅ ÉTAPE 9: Mettre la réponse en file d'envoi (même transaction)
+                reply = outbound_dispatcher.enqueue(page.id, 'message', sender_id, response_text, message=new_message)
                 db.session.commit()
-                return
             
-            print(f'✅ Message traité et envoyé à {sender_name}')
+            log.info('Message enregistré, réponse en file d\'envoi',
+                     extra={'page_id': page.id, 'reply_id': reply.id, 'matched': matched})
+            outbound_dispatcher.submit(reply)
+            return 'replied'
         
-        except Exception as e:
-            print(f'❌ Erreur traitement message: {str(e)}')
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            log.exception('Erreur traitement message')
             db.session.rollback()
+            if claimed_id:
+                # Laisser Facebook renvoyer l'événement
+                event_dedup.release('message', claimed_id)
+            return 'failed'
     
-    def handle_comment(comment_data):
+    def handle_comment(comment_data, entry_page_id=None):
         """Traiter un commentaire reçu - VERSION CORRIGÉE ET ROBUSTE"""
+        comment_id = comment_data.get('comment_id') or comment_data.get('id')
+        page_label = str(entry_page_id or '')
+        events.inc('comment', page_label, 'received')
+        with log_context(event_id=f'comment:{comment_id}', channel='comment'), \
+                stage_seconds.time('comment', 'total'):
+            outcome = _handle_comment(comment_data, comment_id, entry_page_id)
+        events.inc('comment', page_label, outcome)
+    
+    def _handle_comment(comment_data, comment_id, entry_page_id):
+        """Issue de l'événement pour chatbot_events_total (replied, unanswered, deduped, ignored, failed)"""
+        claimed_id = None
         try:
-            print("\n" + "=" * 60)
-            print("💭 TRAITEMENT COMMENTAIRE")
-            print("=" * 60)
-            print(f"Données brutes complètes: {comment_data}")
-            print("=" * 60)
+            log_payload(log, 'Commentaire brut', comment_data)
             
             # ÉTAPE 1: Vérifier le type d'item
             item_type = comment_data.get('item')
-            print(f"1️⃣ Type d'item: {item_type}")
             
             # Accepter 'comment' ou si pas d'item mais qu'on a comment_id
             if item_type and item_type not in ['comment', 'post', 'status']:
-                print(f"   ❌ Type '{item_type}' ignoré")
-                return
+                log.debug('Type d\'item ignoré', extra={'item': item_type})
+                return 'ignored'
             
             # ÉTAPE 2: Vérifier le verbe (action)
             verb = comment_data.get('verb', 'add')
-            print(f"2️⃣ Verbe: {verb}")
             
             if verb in ['remove', 'edited', 'hide']:
-                print(f"   ℹ️ Action '{verb}' ignorée")
-                return
+                log.debug('Action ignorée', extra={'verb': verb})
+                return 'ignored'
             
             # ÉTAPE 3: Extraire les données - PLUSIEURS FORMATS POSSIBLES
-            comment_id = comment_data.get('comment_id')
-            
-            # Si pas de comment_id direct, chercher dans 'id'
-            if not comment_id:
-                comment_id = comment_data.get('id')
-            
             post_id = comment_data.get('post_id')
             
             # Si pas de post_id, essayer de l'extraire du comment_id
@@ -260,130 +360,100 @@ def create_app():
             if not comment_text:
                 comment_text = comment_data.get('comment', '')
             
-            print(f"3️⃣ Données extraites:")
-            print(f"   - Comment ID: {comment_id}")
-            print(f"   - Post ID: {post_id}")
-            print(f"   - User ID: {user_id}")
-            print(f"   - User Name: {user_name}")
-            print(f"   - Texte: {comment_text[:100] if comment_text else 'VIDE'}...")
-            
             # ÉTAPE 4: Validations essentielles
             if not comment_id:
-                print("   ⚠️ Pas de comment_id trouvé dans les données")
-                print("   Structure reçue:", list(comment_data.keys()))
-                return
+                log.warning('Pas de comment_id dans les données', extra={'keys': list(comment_data.keys())})
+                return 'ignored'
             
             if not comment_text or str(comment_text).strip() == '':
-                print("   ℹ️ Commentaire vide ou sans texte, ignoré")
-                return
+                log.debug('Commentaire vide ou sans texte, ignoré')
+                return 'ignored'
             
-            # ÉTAPE 5: Récupérer la page active
-            page = FacebookPage.query.filter_by(is_active=True).first()
-            if not page:
-                print('   ❌ Aucune page active trouvée')
-                return
+            log.info('Commentaire reçu', extra={'post_id': post_id, 'user_id': user_id})
+            log.debug('Texte du commentaire: %s', str(comment_text)[:100])
             
-            print(f"4️⃣ Page active: {page.page_name} (ID: {page.page_id})")
+            # ÉTAPE 5: Page destinataire (ID de l'entrée webhook)
+            page = page_registry.resolve(entry_page_id)
+            if not page:
+                log.warning('Aucune page active pour cette entrée')
+                return 'ignored'
             
             # ÉTAPE 6: Vérifier si c'est notre propre commentaire
-            try:
-                page_info_url = f"https://graph.facebook.com/v18.0/me"
-                page_info_response = requests.get(page_info_url, params={
-                    'access_token': page.access_token
-                }, timeout=5)
-                
-                if page_info_response.status_code == 200:
-                    page_fb_id = page_info_response.json().get('id')
-                    
-                    if user_id and str(user_id) == str(page_fb_id):
-                        print(f"   ⚠️ C'est notre propre commentaire ({user_id}), ignoré")
-                        return
-            except Exception as e:
-                print(f"   ℹ️ Impossible de vérifier page ID: {e}")
+            with stage_seconds.time('comment', 'page_identity'):
+                own_page = page_identity_cache.is_own_page(page.access_token, user_id, fallback=page.page_id)
+            if own_page:
+                log.info('Commentaire de notre propre page, ignoré')
+                return 'ignored'
             
             # ÉTAPE 7: Vérifier si déjà traité (éviter doublons)
-            existing = Comment.query.filter_by(comment_id=str(comment_id)).first()
-            if existing:
-                print(f"   ℹ️ Commentaire {comment_id} déjà traité, ignoré")
-                return
-            
-            print(f"5️⃣ Nouveau commentaire valide, recherche de réponse...")
+            with stage_seconds.time('comment', 'dedup'):
+                claimed = event_dedup.claim('comment', comment_id)
+            if not claimed:
+                log.info('Commentaire déjà traité, ignoré')
+                return 'deduped'
+            claimed_id = comment_id
             
             # ÉTAPE 8: Chercher une réponse appropriée
-            fb_service = FacebookService(page.access_token)
-            response_text = ResponseService.find_matching_response(comment_text, 'comment')
+            with stage_seconds.time('comment', 'match'):
+                response_text, analysis = ResponseService.match_response(comment_text, 'comment', page.id)
             
             if not response_text:
-                print("   ℹ️ Aucune réponse automatique trouvée")
-                
                 # Enregistrer quand même sans réponse
+                with stage_seconds.time('comment', 'db_write'):
+                    new_comment = Comment(
+                        comment_id=str(comment_id),
+                        post_id=str(post_id) if post_id else None,
+                        user_id=str(user_id) if user_id else None,
+                        user_name=user_name,
+                        comment_text=comment_text,
+                        response_sent=None,
+                        is_automated=False,
+                        page_id=page.id,
+                        **nlp_annotator.columns(analysis, None)
+                    )
+                    db.session.add(new_comment)
+                    db.session.flush()
+                    stats_counters.record('comment', page.id, new_comment.timestamp, new_comment.is_automated)
+                    nlp_rollups.record('comment', new_comment)
+                    db.session.commit()
+                log.info('Commentaire enregistré sans réponse automatique', extra={'page_id': page.id})
+                return 'unanswered'
+            
+            # ÉTAPE 9: Enregistrer D'ABORD en base (avant envoi)
+            with stage_seconds.time('comment', 'db_write'):
                 new_comment = Comment(
                     comment_id=str(comment_id),
                     post_id=str(post_id) if post_id else None,
                     user_id=str(user_id) if user_id else None,
                     user_name=user_name,
                     comment_text=comment_text,
-                    response_sent=None,
-                    is_automated=False,
-                    page_id=page.id
+                    response_sent=response_text,
+                    is_automated=True,
+                    page_id=page.id,
+                    **nlp_annotator.columns(analysis, response_text)
                 )
                 db.session.add(new_comment)
-                db.session.commit()
-                print("   ℹ️ Commentaire enregistré sans réponse")
-                return
+                db.session.flush()
+                stats_counters.record('comment', page.id, new_comment.timestamp, new_comment.is_automated)
+                nlp_rollups.record('comment', new_comment)
             
-            print(f"6️⃣ Réponse trouvée: {response_text[:50]}...")
-            
-            # ÉTAPE 9: Enregistrer D'ABORD en base (avant envoi)
-            new_comment = Comment(
-                comment_id=str(comment_id),
-                post_id=str(post_id) if post_id else None,
-                user_id=str(user_id) if user_id else None,
-                user_name=user_name,
-                comment_text=comment_text,
-                response_sent=response_text,
-                is_automated=True,
-                page_id=page.id
-            )
-            db.session.add(new_comment)
-            db.session.commit()
-            print("   ✅ Commentaire enregistré en base")
-            
-            # ÉTAPE 10: Envoyer la réponse (après enregistrement)
-            print(f"7️⃣ Envoi de la réponse au commentaire {comment_id}...")
-            result = fb_service.reply_to_comment(str(comment_id), response_text)
-            
-            print(f"   Résultat API: {result}")
-            
-            # ÉTAPE 11: Vérifier le résultat
-            if 'error' in result:
-                error = result['error']
-                error_msg = error.get('message', 'Erreur inconnue')
-                error_code = error.get('code', 'N/A')
-                error_type = error.get('type', 'N/A')
-                
-                print(f"   ❌ ERREUR API:")
-                print(f"      Code: {error_code}")
-                print(f"      Type: {error_type}")
-                print(f"      Message: {error_msg}")
-                
-                # Mettre à jour avec erreur
-                new_comment.response_sent = f"ERREUR: {error_msg}"
-                new_comment.is_automated = False
+                # ÉTAPE 10: Mettre la réponse en file d'envoi (même transaction)
+                reply = outbound_dispatcher.enqueue(page.id, 'comment', str(comment_id), response_text, comment=new_comment)
                 db.session.commit()
-                
-                return
             
-            print("   ✅ Réponse envoyée avec succès!")
-            print(f"8️⃣ ✅ SUCCÈS COMPLET - Commentaire de {user_name} traité")
-            print("=" * 60 + "\n")
+            # ÉTAPE 11: Envoi cadencé par le dispatcher (limites de débit par page)
+            log.info('Commentaire enregistré, réponse en file d\'envoi',
+                     extra={'page_id': page.id, 'reply_id': reply.id})
+            outbound_dispatcher.submit(reply)
+            return 'replied'
         
-        except Exception as e:
-            print(f'❌ ERREUR CRITIQUE traitement commentaire: {str(e)}')
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            log.exception('Erreur traitement commentaire')
             db.session.rollback()
-            print("=" * 60 + "\n")
+            if claimed_id:
+                # Laisser Facebook renvoyer l'événement
+                event_dedup.release('comment', claimed_id)
+            return 'failed'
     
     # Route de santé
     @app.route('/health', methods=['GET'])
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark: appels Graph individuels vs regroupés (endpoint batch)
+
+Simule N threads qui demandent chacun un profil utilisateur en même temps,
+contre le faux serveur Graph local, avec et sans GraphBatcher.
+
+Usage:
+    python benchmarks/bench_graph_batch.py --callers 100 --latency 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import threading
+import time
+
+from common import configure_environment
+from fake_graph import FakeGraphServer
+
+
+def run_callers(service, callers):
+    results = []
+    lock = threading.Lock()
+
+    def call(i):
+        info = service.get_user_info(f'user_{i}')
+        with lock:
+            results.append(info)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--callers', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--window-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    graph = FakeGraphServer(latency=args.latency).start()
+    configure_environment(graph_url=graph.url)
+
+    from config import Config
+    from services.facebook_service import FacebookService
+
+    service = FacebookService('bench-token')
+    report = {}
+
+    for label, window in (('individuels', 0), ('regroupés', args.window_ms)):
+        Config.GRAPH_BATCH_WINDOW_MS = window
+        graph.reset()
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, results = run_callers(service, args.callers)
+        errors = sum(1 for r in results if 'error' in r)
+        report[label] = (elapsed, graph.calls['total'], errors)
+
+    graph.stop()
+
+    print('=' * 70)
+    print(f'📊 PROFILS: {args.callers} appels simultanés, Graph simulé à {args.latency * 1000:.0f} ms')
+    print('=' * 70)
+    for label, (elapsed, round_trips, errors) in report.items():
+        print(f'{label:12} durée={elapsed * 1000:8.1f} ms  allers-retours HTTP={round_trips:4}  erreurs={errors}')
+    print('=' * 70)
+
+
+if __name__ == '__main__':
+    main()
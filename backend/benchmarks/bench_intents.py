@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark + parité: classification des intentions
+
+Compare le parcours d'origine (un re.search par intention, dans l'ordre,
+sur le texte mis en minuscules) à IntentClassifier (index mot ->
+intentions), et vérifie que l'intention principale est identique
+pour chaque message et que chaque intention rapportée est bien présente.
+
+Usage:
+    python benchmarks/bench_intents.py --messages 5000
+    python benchmarks/bench_intents.py --extra-intents 40
+"""
+
+import argparse
+import random
+import re
+import statistics
+import time
+
+import common  # noqa: F401  (chemin du backend)
+
+from services.intent_classifier import IntentClassifier
+from services.response_service import NLPChatbot
+
+FILLERS = ['je', 'voudrais', 'le', 'la', 'pour', 'votre', 'svp', 'est-ce', 'que', 'hello', 'the',
+           'my', 'order', 'is', 'today', '!!', '??', 'Bonjour,', 'MERCI', 'marche', 'pas', 'rien']
+
+
+def reference_intent(patterns, text):
+    """Parcours d'origine de extract_intent"""
+    text_lower = text.lower()
+    for intent, pattern in patterns.items():
+        if re.search(pattern, text_lower, re.IGNORECASE):
+            return intent
+    return 'general'
+
+
+def keywords_regex(keywords):
+    """Regex équivalente à une liste de mots-clés (sémantique \\b...\\b d'origine)"""
+    return r'\b(?:' + '|'.join(re.escape(word) for word in keywords) + r')\b'
+
+
+def micros(latencies):
+    ordered = sorted(latencies)
+    return {
+        'p50': ordered[len(ordered) // 2] * 1e6,
+        'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6,
+        'mean': statistics.fmean(ordered) * 1e6
+    }
+
+
+def pattern_words(patterns):
+    words = []
+    for pattern in patterns.values():
+        inner = re.search(r'\((?:\?:)?([^()]*)\)', pattern)
+        if inner:
+            words.extend(w.replace('\\', '') for w in inner.group(1).split('|'))
+    return words
+
+
+def make_messages(rng, words, count, hit_ratio=0.6):
+    messages = []
+    for _ in range(count):
+        tokens = [rng.choice(FILLERS) for _ in range(rng.randint(2, 20))]
+        if rng.random() < hit_ratio:
+            for _ in range(rng.randint(1, 3)):
+                word = rng.choice(words)
+                tokens.insert(rng.randint(0, len(tokens)), word.upper() if rng.random() < 0.1 else word)
+        messages.append(' '.join(tokens))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--extra-intents', type=int, default=0,
+                        help='Intentions supplémentaires (comme définies en base), placées en tête')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    intents, patterns = {}, {}
+    for i in range(args.extra_intents):
+        keywords = [f'mot{i}x{j}' for j in range(rng.randint(2, 6))]
+        if i % 3 == 0:
+            # Expression de plusieurs mots, vérifiée à partir du premier
+            keywords.append(f'mot{i}x0 suivi')
+        intents[f'perso_{i}'] = tuple(keywords)
+        patterns[f'perso_{i}'] = keywords_regex(keywords)
+    builtin = NLPChatbot().intent_patterns
+    intents.update(builtin)
+    patterns.update(builtin)
+
+    classifier = IntentClassifier(intents)
+    messages = make_messages(rng, pattern_words(patterns), args.messages)
+
+    reference_latencies, classify_latencies, find_all_latencies = [], [], []
+    mismatches, false_hits = [], []
+    for message in messages:
+        start = time.perf_counter()
+        expected = reference_intent(patterns, message)
+        reference_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        got = classifier.classify(message)
+        classify_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        matches = classifier.find_all(message)
+        find_all_latencies.append(time.perf_counter() - start)
+
+        if expected != got or classifier.primary(matches) != got:
+            mismatches.append((message, expected, got))
+        for match in matches:
+            if message[match.start:match.end] != match.text or \
+                    not re.search(patterns[match.intent], message.lower(), re.IGNORECASE):
+                false_hits.append((message, match))
+
+    reference = micros(reference_latencies)
+    single = micros(classify_latencies)
+    complete = micros(find_all_latencies)
+
+    print('=' * 70)
+    print(f'🎯 INTENTIONS: {len(patterns)} intentions, {args.messages} messages')
+    print('=' * 70)
+    print(f"Parcours d'origine      p50={reference['p50']:8.2f} µs  p99={reference['p99']:8.2f} µs")
+    print(f"Index (classify)        p50={single['p50']:8.2f} µs  p99={single['p99']:8.2f} µs")
+    print(f"Toutes + positions      p50={complete['p50']:8.2f} µs  p99={complete['p99']:8.2f} µs")
+    if single['mean']:
+        print(f"Accélération moyenne (classify): x{reference['mean'] / single['mean']:.1f}")
+    print(f'Parité intention principale: {len(messages) - len(mismatches)}/{len(messages)}')
+    for message, expected, got in mismatches[:10]:
+        print(f'   ❌ "{message}": attendu {expected}, obtenu {got}')
+    print(f'Intentions rapportées à tort: {len(false_hits)}')
+    for message, match in false_hits[:10]:
+        print(f'   ❌ "{message}": {match}')
+    print('=' * 70)
+
+    return 1 if mismatches or false_hits else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: recherche de mots-clés, boucle d'origine vs automate compilé
+
+Compare la boucle règles × mots-clés (sous-chaîne + regex \\b construite à
+chaque test) à KeywordMatcher, et vérifie que la règle choisie est identique.
+
+Avec --whole-words (KEYWORD_WHOLE_WORDS), la référence n'accepte que les
+mots entiers (regex \\b) et une partie des messages contient des
+mots-clés collés à d'autres mots, qui ne doivent pas déclencher de règle.
+
+Usage:
+    python benchmarks/bench_keyword_matcher.py --rules 10000 --messages 500
+    python benchmarks/bench_keyword_matcher.py --whole-words
+"""
+
+import argparse
+import random
+import re
+import time
+
+from common import summarize
+
+from services.keyword_matcher import KeywordMatcher
+
+SYLLABLES = ['ba', 'ko', 'ri', 'mu', 'te', 'la', 'zo', 'ni', 'pe', 'ga', 'vu', 'do', 'si', 'fa']
+
+
+def make_word(rng, min_syllables=2, max_syllables=4):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(min_syllables, max_syllables)))
+
+
+def make_rules(rng, count):
+    """Triggers déjà triés par priorité décroissante"""
+    return [', '.join(make_word(rng, 3, 5) for _ in range(rng.randint(2, 5))) for _ in range(count)]
+
+
+def make_messages(rng, rules, count, hit_ratio=0.3, glued_ratio=0.0):
+    messages = []
+    for _ in range(count):
+        words = [make_word(rng) for _ in range(rng.randint(8, 25))]
+        if rng.random() < hit_ratio:
+            keyword = rng.choice(rng.choice(rules).split(',')).strip()
+            words.insert(rng.randint(0, len(words)), keyword)
+        if rng.random() < glued_ratio:
+            # Mot-clé collé à un autre mot: sous-chaîne, pas mot entier
+            keyword = rng.choice(rng.choice(rules).split(',')).strip()
+            words.insert(rng.randint(0, len(words)), make_word(rng, 1, 1) + keyword)
+        messages.append(' '.join(words))
+    return messages
+
+
+def legacy_first_match(triggers, message, whole_words=False):
+    """Boucle d'origine de find_matching_response (mots entiers seulement si whole_words)"""
+    message_lower = message.lower()
+    for index, trigger in enumerate(triggers):
+        for keyword in trigger.lower().split(','):
+            keyword = keyword.strip()
+            if (not whole_words and keyword in message_lower) or \
+                    re.search(r'\b' + re.escape(keyword) + r'\b', message_lower):
+                return index
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, default=10000)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--whole-words', action='store_true',
+                        help='Mots entiers seulement (KEYWORD_WHOLE_WORDS=true)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    triggers = make_rules(rng, args.rules)
+    messages = make_messages(rng, triggers, args.messages, glued_ratio=0.3 if args.whole_words else 0.0)
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(triggers, whole_words=args.whole_words)
+    build_time = time.perf_counter() - start
+
+    legacy_latencies, compiled_latencies = [], []
+    mismatches = 0
+    for message in messages:
+        start = time.perf_counter()
+        expected = legacy_first_match(triggers, message, args.whole_words)
+        legacy_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        got = matcher.first_match(message)
+        compiled_latencies.append(time.perf_counter() - start)
+
+        if got != expected:
+            mismatches += 1
+
+    legacy = summarize(legacy_latencies)
+    compiled = summarize(compiled_latencies)
+
+    print('=' * 70)
+    mode = 'mots entiers' if args.whole_words else 'sous-chaînes'
+    print(f'📊 MOTS-CLÉS: {args.rules} règles, {matcher.keyword_count} mots-clés, {args.messages} messages ({mode})')
+    print('=' * 70)
+    print(f'Construction de l\'automate: {build_time * 1000:.1f} ms')
+    print(f"Boucle d'origine   p50={legacy['p50_ms']:9.3f} ms  p99={legacy['p99_ms']:9.3f} ms")
+    print(f"Automate compilé   p50={compiled['p50_ms']:9.3f} ms  p99={compiled['p99_ms']:9.3f} ms")
+    if compiled['mean_ms']:
+        print(f"Accélération moyenne: x{legacy['mean_ms'] / compiled['mean_ms']:.0f}")
+    print(f'Résultats différents: {mismatches}')
+    print('=' * 70)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
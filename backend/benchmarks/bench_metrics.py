@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: coût des métriques par étape de traitement
+
+Mesure, en µs par appel, l'incrément d'un compteur étiqueté, une
+observation d'histogramme et le chronométrage complet d'une étape
+(`with stage_seconds.time(...)`), comparé à un bloc vide. Optionnellement
+avec plusieurs threads en concurrence sur le même verrou.
+
+Usage:
+    python benchmarks/bench_metrics.py
+    python benchmarks/bench_metrics.py --repeat 500000 --threads 4
+"""
+
+import argparse
+import threading
+import time
+from contextlib import nullcontext
+
+import common  # noqa: F401  (chemin du backend)
+
+from services.metrics import MetricsRegistry
+
+
+def per_call_us(fn, repeat, threads=1):
+    def run():
+        for _ in range(repeat):
+            fn()
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (repeat * threads) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    events = registry.counter('bench_events_total', 'bench', ('channel', 'page', 'outcome'))
+    stages = registry.histogram('bench_stage_seconds', 'bench', ('channel', 'stage'))
+
+    def empty_block():
+        with nullcontext():
+            pass
+
+    def timed_block():
+        with stages.time('message', 'match'):
+            pass
+
+    cases = [
+        ('bloc vide (référence)', empty_block),
+        ('compteur inc()', lambda: events.inc('message', '100000000000001', 'received')),
+        ('histogramme observe()', lambda: stages.observe(0.0042, 'message', 'match')),
+        ('étape chronométrée', timed_block),
+    ]
+
+    print('=' * 70)
+    print('📈 COÛT DES MÉTRIQUES (µs par appel)')
+    print('=' * 70)
+    print(f"{'opération':<28}" + ''.join(f"{f'{t} thread(s)':>14}" for t in args.threads))
+    for label, fn in cases:
+        row = [per_call_us(fn, args.repeat // threads, threads) for threads in args.threads]
+        print(f'{label:<28}' + ''.join(f'{us:>14.3f}' for us in row))
+
+    rendered = registry.render()
+    started = time.perf_counter()
+    registry.render()
+    render_ms = (time.perf_counter() - started) * 1000
+    print('-' * 70)
+    print(f'Rendu /metrics: {render_ms:.2f} ms ({len(rendered.splitlines())} lignes)')
+    print('=' * 70)
+
+
+if __name__ == '__main__':
+    main()
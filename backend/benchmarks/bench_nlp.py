@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks NLP: NLPChatbot et ResponseService.find_matching_response
+
+Sur un corpus français/anglais généré (graine fixe), mesure:
+- preprocess_text, tokenize, extract_intent, analyze_sentiment,
+  calculate_similarity et analyze_message (µs par appel);
+- find_matching_response sur des jeux de 10 à 50 000 règles (une page
+  par taille): construction de l'instantané à froid et mémoire retenue,
+  latence par message p50/p95/p99, mémoire allouée par message (pic
+  tracemalloc).
+
+Les résultats sont comparés à une référence enregistrée
+(benchmarks/baselines/nlp.json): un cas plus lent que la référence de
+plus de --threshold (30 % par défaut) fait échouer le script. Les temps
+sont normalisés par une boucle de calibration exécutée juste avant et
+après chaque cas: la vitesse d'une machine (ou d'une VM partagée) varie
+d'un moment à l'autre, pas seulement d'une machine à l'autre.
+
+Usage:
+    python benchmarks/bench_nlp.py
+    python benchmarks/bench_nlp.py --sizes 10 1000 50000 --messages 300
+    python benchmarks/bench_nlp.py --save-baseline
+    python benchmarks/bench_nlp.py --threshold 0.10 --json resultats.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from common import configure_environment, percentile
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'nlp.json')
+
+FR_WORDS = ['prix', 'tarif', 'livraison', 'délai', 'commande', 'acheter', 'disponible', 'stock',
+            'problème', 'erreur', 'contact', 'téléphone', 'horaire', 'ouvert', 'produit', 'taille',
+            'couleur', 'promo', 'réduction', 'retour', 'échange', 'paiement', 'adresse', 'boutique',
+            'colis', 'remboursement', 'garantie', 'facture', 'modèle', 'réservation']
+EN_WORDS = ['price', 'delivery', 'order', 'shipping', 'refund', 'size', 'available', 'color',
+            'discount', 'payment', 'address', 'store', 'warranty', 'invoice', 'booking', 'opening']
+
+FR_TEMPLATES = [
+    'Bonjour, je voudrais savoir le {a} pour la {b} svp',
+    "Salut ! C'est quoi le {a} ? Et la {b} ça marche comment ??",
+    'Merci pour votre réponse, super {a} mais problème de {b}',
+    "J'ai une erreur avec ma {a}, pouvez-vous m'aider pour le {b} ?",
+    'Est-ce que le {a} est disponible ? Je veux commander avant la {b}',
+    'Bonsoir, combien pour la {a} et la {b} ? Merci !!',
+]
+EN_TEMPLATES = [
+    'Hello, what is the {a} for {b}?',
+    'Hi, thanks for the quick {a}, the {b} was great',
+    'Is the {a} still available? I want to place an {b}',
+    'Any update on my {a}? The {b} is late',
+]
+
+
+def make_messages(rng, count):
+    messages = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            template, words = rng.choice(FR_TEMPLATES), FR_WORDS
+        else:
+            template, words = rng.choice(EN_TEMPLATES), EN_WORDS
+        messages.append(template.format(a=rng.choice(words), b=rng.choice(words)))
+    return messages
+
+
+def make_rules(rng, count):
+    """Déclencheurs: mots du corpus (rares, l'essentiel passe par le scoring NLP) et mots synthétiques"""
+    vocabulary = FR_WORDS + EN_WORDS
+    rules = []
+    for i in range(count):
+        words = [f'{rng.choice(vocabulary)}{i}' for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.02:
+            words.append(rng.choice(vocabulary))
+        rules.append((', '.join(words), rng.randint(0, 100)))
+    return rules
+
+
+def calibrate(repeat=3):
+    """Durée (µs) d'une boucle de référence indépendante du code mesuré"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        table = {}
+        for i in range(50000):
+            key = f'k{i % 997}'
+            table[key] = table.get(key, 0) + i * i
+        best = min(best, time.perf_counter() - started)
+    return best * 1e6
+
+
+def time_calls(fn, inputs, rounds):
+    """Latences (µs) de fn sur chaque entrée, `rounds` passes"""
+    latencies = []
+    for _ in range(rounds):
+        for value in inputs:
+            started = time.perf_counter()
+            fn(value)
+            latencies.append((time.perf_counter() - started) * 1e6)
+    return latencies
+
+
+def peak_alloc_kib(fn, inputs):
+    """Pic mémoire moyen alloué par appel (KiB), mesuré par tracemalloc"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for value in inputs:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            fn(value)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1024 if peaks else 0.0
+
+
+def measure(fn, inputs, rounds, trials=5):
+    """
+    Latences p50/p95/p99 (µs), chaque essai encadré par deux calibrations
+
+    Comme timeit, on garde le meilleur essai (p50 rapporté à la
+    calibration): les autres ont été ralentis par la machine, pas par le code.
+    """
+    best = None
+    for _ in range(trials):
+        before = calibrate()
+        latencies = time_calls(fn, inputs, rounds)
+        stats = {
+            'p50_us': round(percentile(latencies, 50), 2),
+            'p95_us': round(percentile(latencies, 95), 2),
+            'p99_us': round(percentile(latencies, 99), 2),
+            'calibration_us': round((before + calibrate()) / 2, 1)
+        }
+        if best is None or stats['p50_us'] / stats['calibration_us'] < best['p50_us'] / best['calibration_us']:
+            best = stats
+    return best
+
+
+def bench_functions(chatbot, messages, rounds):
+    keywords = [', '.join(FR_WORDS[i:i + 3]) for i in range(0, len(FR_WORDS), 3)]
+    pairs = [(message, keywords[i % len(keywords)]) for i, message in enumerate(messages)]
+    processed = [chatbot.preprocess_text(message) for message in messages]
+
+    cases = {
+        'preprocess_text': (chatbot.preprocess_text, messages),
+        'tokenize': (chatbot.tokenize, processed),
+        'extract_intent': (chatbot.extract_intent, messages),
+        'analyze_sentiment': (chatbot.analyze_sentiment, messages),
+        'calculate_similarity': (lambda pair: chatbot.calculate_similarity(pair[0], pair[1]), pairs),
+        'analyze_message': (chatbot.analyze_message, messages),
+    }
+    results = {}
+    for name, (fn, inputs) in cases.items():
+        results[name] = {
+            **measure(fn, inputs, rounds),
+            'alloc_kib': round(peak_alloc_kib(fn, inputs), 2)
+        }
+    return results
+
+
+def bench_matching(sizes, messages, seed, rounds):
+    from app import create_app
+    from models import db, FacebookPage, AutoResponse
+    from services.response_service import ResponseService
+    from services.rule_snapshot import rule_cache
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    rng = random.Random(seed)
+    results = {}
+    with app.app_context():
+        for size in sizes:
+            page = FacebookPage(page_id=f'bench_{size}', page_name=f'{size} règles', access_token='bench')
+            db.session.add(page)
+            db.session.flush()
+            db.session.bulk_insert_mappings(AutoResponse, [
+                {'trigger_keyword': keyword, 'response_text': f'Réponse {i}', 'response_type': 'both',
+                 'is_active': True, 'priority': priority, 'page_id': page.id}
+                for i, (keyword, priority) in enumerate(make_rules(rng, size))
+            ])
+            db.session.commit()
+
+            def match(text, page_id=page.id):
+                return ResponseService.find_matching_response(text, 'message', page_id)
+
+            # Première recherche: chargement de l'instantané et de l'index de similarité
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            match(messages[0])
+            cold_ms = (time.perf_counter() - started) * 1000
+            retained_mib = (tracemalloc.get_traced_memory()[0] - before) / 1024 / 1024
+            tracemalloc.stop()
+
+            stats = measure(match, messages, rounds)
+            hits = sum(1 for message in messages if match(message))
+            results[f'match[{size}]'] = {
+                **stats,
+                'alloc_kib': round(peak_alloc_kib(match, messages[:50]), 2),
+                'cold_ms': round(cold_ms, 2),
+                'snapshot_mib': round(retained_mib, 2),
+                'hit_ratio': round(hits / len(messages), 3)
+            }
+            rule_cache.invalidate(page.id)
+            db.session.commit()
+    return results
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, threshold):
+    """Cas dont le p50 normalisé dépasse la référence de plus de `threshold`"""
+    regressions = []
+    for name, stats in results.items():
+        reference = baseline['cases'].get(name)
+        if not reference:
+            continue
+        normalized = stats['p50_us'] * reference['calibration_us'] / stats['calibration_us']
+        ratio = normalized / reference['p50_us'] if reference['p50_us'] else 1.0
+        stats['vs_baseline'] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append((name, reference['p50_us'], normalized, ratio))
+    return regressions
+
+
+def print_report(results, baseline):
+    print('=' * 86)
+    print('🧪 MICRO-BENCHMARKS NLP ' + ('(p50 normalisé vs référence)' if baseline else '(sans référence)'))
+    print('=' * 86)
+    print(f"{'cas':<24}{'p50 µs':>11}{'p95 µs':>11}{'p99 µs':>11}{'alloc KiB':>11}{'vs réf.':>9}")
+    for name, stats in results.items():
+        versus = f"{stats['vs_baseline']:.2f}x" if 'vs_baseline' in stats else '-'
+        print(f"{name:<24}{stats['p50_us']:>11.1f}{stats['p95_us']:>11.1f}{stats['p99_us']:>11.1f}"
+              f"{stats['alloc_kib']:>11.1f}{versus:>9}")
+    matching = {name: stats for name, stats in results.items() if 'cold_ms' in stats}
+    if matching:
+        print('-' * 86)
+        print(f"{'instantané':<24}{'froid ms':>11}{'mémoire MiB':>13}{'réponses':>10}")
+        for name, stats in matching.items():
+            print(f"{name:<24}{stats['cold_ms']:>11.1f}{stats['snapshot_mib']:>13.2f}{stats['hit_ratio']:>10.0%}")
+    print('=' * 86)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 50000],
+                        help='Nombres de règles pour find_matching_response')
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=3, help='Passes sur le corpus par cas')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='Enregistrer ces résultats comme référence')
+    parser.add_argument('--threshold', type=float, default=0.30,
+                        help='Ralentissement toléré par rapport à la référence (0.30 = +30 %%)')
+    parser.add_argument('--json', help='Écrire les résultats dans ce fichier JSON')
+    args = parser.parse_args()
+
+    # Base SQLite temporaire: à faire avant le premier import de config
+    configure_environment(RULES_VERSION_CHECK_INTERVAL=3600, LOG_LEVEL='WARNING')
+    from services.response_service import NLPChatbot
+
+    rng = random.Random(args.seed)
+    messages = make_messages(rng, args.messages)
+
+    results = bench_functions(NLPChatbot(), messages, args.rounds)
+    if args.sizes:
+        results.update(bench_matching(args.sizes, messages, args.seed, args.rounds))
+
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+    print_report(results, baseline)
+
+    report = {
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'messages': args.messages,
+        'cases': results
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'💾 Résultats écrits dans {args.json}')
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'📌 Référence enregistrée: {args.baseline}')
+
+    for name, reference, normalized, ratio in regressions:
+        print(f'❌ Régression {name}: p50 {normalized:.1f} µs (normalisé) vs {reference:.1f} µs, x{ratio:.2f}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latence par événement webhook avec et sans cache d'identité de page
+
+Avant: /me est appelé à chaque message/commentaire (TTL du cache = 0)
+Après: l'ID Graph de la page est résolu une fois puis lu en mémoire
+
+Usage:
+    python benchmarks/bench_page_identity.py --events 200 --latency 0.05
+"""
+
+import argparse
+import time
+
+from common import configure_environment, post_webhook, summarize
+from fake_graph import FakeGraphServer
+
+
+def run(events, latency):
+    graph = FakeGraphServer(latency=latency).start()
+    configure_environment(graph_url=graph.url)
+
+    from app import create_app
+    from models import db, FacebookPage, AutoResponse
+    from services.page_identity import page_identity_cache
+
+    app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        db.session.add(FacebookPage(page_id=graph.page_id, page_name='Bench', access_token='bench-token'))
+        db.session.add(AutoResponse(trigger_keyword='bonjour', response_text='Salut !', response_type='both', priority=10))
+        db.session.commit()
+
+    results = {}
+    default_ttl = page_identity_cache.ttl
+
+    for label, ttl in (('avant (sans cache)', 0), ('après (cache)', default_ttl)):
+        page_identity_cache.ttl = ttl
+        page_identity_cache.failure_ttl = min(60, ttl)
+        page_identity_cache.invalidate()
+        graph.reset()
+
+        latencies = []
+        for i in range(events):
+            payload = {
+                'object': 'page',
+                'entry': [{
+                    'id': graph.page_id,
+                    'changes': [{
+                        'field': 'feed',
+                        'value': {
+                            'item': 'comment',
+                            'verb': 'add',
+                            'comment_id': f'{label[:2]}_{ttl}_{i}',
+                            'post_id': 'post_1',
+                            'from': {'id': f'user_{i}', 'name': 'Bench'},
+                            'message': 'bonjour'
+                        }
+                    }]
+                }]
+            }
+            start = time.perf_counter()
+            post_webhook(client, payload)
+            latencies.append(time.perf_counter() - start)
+
+        results[label] = {
+            **summarize(latencies),
+            'me_calls_per_event': round(graph.calls['me'] / events, 3)
+        }
+
+    graph.stop()
+    return results
+
+
+if __name__ == '__main__':
+    import contextlib
+    import io
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Latence simulée du faux Graph API (secondes)')
+    args = parser.parse_args()
+
+    # Les handlers sont très bavards: on n'affiche que le résultat
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run(args.events, args.latency)
+
+    print('=' * 70)
+    print(f'📊 LATENCE PAR ÉVÉNEMENT ({args.events} événements, Graph simulé à {args.latency * 1000:.0f} ms)')
+    print('=' * 70)
+    for label, stats in results.items():
+        print(f"{label:20} p50={stats['p50_ms']:8.2f} ms  p95={stats['p95_ms']:8.2f} ms  "
+              f"p99={stats['p99_ms']:8.2f} ms  /me par événement={stats['me_calls_per_event']}")
+    print('=' * 70)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: statistiques NLP par agrégats SQL sur les lignes vs tranches d'agrégats
+
+Remplit message/comment avec N lignes analysées réparties sur une année,
+construit les tranches (rebuild + compaction), puis compare pour une
+fenêtre de 90 jours le GROUP BY sur les lignes et la somme des tranches
+(mêmes résultats attendus).
+
+Usage:
+    python benchmarks/bench_rollups.py --rows 200000
+    python benchmarks/bench_rollups.py --rows 10000000 --database-url postgresql://...
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from common import configure_environment
+
+TEXTS = [
+    'Bonjour, quel est le prix ?', 'Super produit, merci !', 'Toujours disponible en stock ?',
+    'Problème avec ma commande, erreur de livraison', 'Je veux commander deux pièces',
+    'Quel est le délai de livraison ?', 'Service nul, très déçu', 'Génial, parfait, top',
+    'Comment vous contacter par téléphone ?', 'Info sur la taille svp', 'ok'
+]
+
+
+def populate(rows, days, chunk=50000):
+    from models import db, Message, Comment
+    from services.response_service import ResponseService
+
+    chatbot = ResponseService.chatbot
+    version = chatbot.analyzer_version
+    analyses = []
+    for text in TEXTS:
+        analysis = chatbot.analyze_message(text)
+        analyses.append({
+            'intent': analysis['intent'],
+            'sentiment': analysis['sentiment']['sentiment'],
+            'sentiment_score': analysis['sentiment']['score'],
+            'token_count': len(analysis['tokens']),
+            'analyzer_version': version
+        })
+
+    now = datetime.utcnow()
+    span = days * 86400
+    random.seed(42)
+    for model, prefix, text_column in ((Message, 'm', 'message_text'), (Comment, 'c', 'comment_text')):
+        for start in range(0, rows // 2, chunk):
+            batch = []
+            for i in range(start, min(start + chunk, rows // 2)):
+                k = random.randrange(len(TEXTS))
+                batch.append({
+                    f'{model.__tablename__}_id': f'{prefix}_{i}',
+                    text_column: TEXTS[k],
+                    'is_automated': True,
+                    'timestamp': now - timedelta(seconds=random.randrange(span)),
+                    'page_id': random.randint(1, 3),
+                    **analyses[k]
+                })
+            db.session.execute(model.__table__.insert(), batch)
+            db.session.commit()
+
+
+def row_scan(start):
+    """Version précédente: GROUP BY sur les lignes de la fenêtre"""
+    from sqlalchemy import func
+    from models import db, Message, Comment
+
+    sentiments, intents = Counter(), Counter()
+    for model in (Message, Comment):
+        for intent, sentiment, count in db.session.query(
+            model.intent, model.sentiment, func.count(model.id)
+        ).filter(model.timestamp >= start, model.intent.isnot(None)).group_by(model.intent, model.sentiment):
+            sentiments[sentiment] += count
+            intents[intent] += count
+    return dict(sentiments), dict(intents)
+
+
+def timed(fn, repeat):
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - started)
+    return min(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=365, help='Étendue de l\'historique')
+    parser.add_argument('--window', type=int, default=90, help='Fenêtre interrogée (jours)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    configure_environment(database_url=args.database_url, NLP_ROLLUP_COMPACT_INTERVAL=0)
+
+    from app import create_app
+    from services.nlp_rollups import nlp_rollups, floor_day
+    from models import NlpRollup
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    with app.app_context():
+        started = time.perf_counter()
+        populate(args.rows, args.days)
+        populate_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        nlp_rollups.rebuild()
+        rebuild_s = time.perf_counter() - started
+        buckets = NlpRollup.query.count()
+
+        start = floor_day(datetime.utcnow() - timedelta(days=args.window))
+        scan_s, (scan_sentiments, scan_intents) = timed(lambda: row_scan(start), args.repeat)
+        rollup_s, totals = timed(lambda: nlp_rollups.totals(start), args.repeat)
+
+    same = scan_sentiments == totals['sentiments'] and scan_intents == totals['intents']
+
+    print('=' * 70)
+    print(f'📊 STATISTIQUES NLP: {args.rows} lignes sur {args.days} jours, fenêtre {args.window} jours')
+    print('=' * 70)
+    print(f'insertion des lignes   {populate_s:8.1f} s')
+    print(f'construction tranches  {rebuild_s:8.1f} s  ({buckets} tranches)')
+    print(f'GROUP BY sur lignes    {scan_s * 1000:8.1f} ms')
+    print(f'somme des tranches     {rollup_s * 1000:8.1f} ms  (x{scan_s / rollup_s:.0f})')
+    print(f"résultats identiques   {'✅' if same else '❌'}")
+    print('=' * 70)
+
+
+if __name__ == '__main__':
+    main()
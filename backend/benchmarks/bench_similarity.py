@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark + parité: scoring NLP de secours (find_best_response)
+
+Compare le calcul d'origine (calculate_similarity règle par règle) au
+SimilarityIndex vectorisé, et vérifie que la règle retenue (top-1, seuil
+0.3) est exactement la même pour chaque message.
+
+Usage:
+    python benchmarks/bench_similarity.py --rules 3000 --messages 200
+"""
+
+import argparse
+import random
+import re
+import time
+
+from common import summarize
+
+from services.response_service import NLPChatbot
+from services.similarity_index import SimilarityIndex
+
+VOCABULARY = [
+    'bonjour', 'salut', 'prix', 'tarif', 'livraison', 'délai', 'commande', 'acheter',
+    'disponible', 'stock', 'problème', 'erreur', 'merci', 'contact', 'téléphone',
+    'email', 'horaire', 'ouvert', 'fermé', 'information', 'détail', 'produit',
+    'taille', 'couleur', 'rouge', 'bleu', 'promo', 'réduction', 'retour', 'échange',
+    'paiement', 'carte', 'mobile', 'money', 'adresse', 'boutique', 'magasin', 'colis',
+    'hello', 'price', 'delivery', 'order', 'shipping', 'refund', 'size', 'available'
+]
+
+
+def make_rules(rng, count):
+    rules = []
+    for i in range(count):
+        words = rng.sample(VOCABULARY, rng.randint(1, 4))
+        if rng.random() < 0.5:
+            words.append(f'{rng.choice(VOCABULARY)}{i}')
+        rules.append({
+            'id': i + 1,
+            'trigger_keyword': ', '.join(words),
+            'response_text': f'Réponse {i}',
+            'response_type': 'both',
+            'is_active': rng.random() > 0.05,
+            'priority': rng.randint(0, 100)
+        })
+    return rules
+
+
+def make_messages(rng, count):
+    fillers = ['je', 'voudrais', 'savoir', 'le', 'la', 'pour', 'votre', 'svp', 'est-ce', 'que', '!!', '??']
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(VOCABULARY + fillers) for _ in range(rng.randint(1, 12))]
+        messages.append(' '.join(words))
+    return messages
+
+
+def reference_best_response(chatbot, user_message, responses_db):
+    """Calcul d'origine, règle par règle"""
+    if not responses_db:
+        return None
+
+    processed_message = chatbot.preprocess_text(user_message)
+    active_responses = [r for r in responses_db if r.get('is_active', True)]
+    if not active_responses:
+        return None
+
+    scored_responses = []
+    for response in active_responses:
+        keyword = response.get('trigger_keyword', '')
+        priority = response.get('priority', 0)
+        similarity = chatbot.calculate_similarity(processed_message, keyword)
+
+        keywords = [k.strip().lower() for k in keyword.split(',')]
+        keyword_match = 0.0
+        for kw in keywords:
+            if kw in processed_message or re.search(r'\b' + re.escape(kw) + r'\b', processed_message):
+                keyword_match = 1.0
+                break
+
+        final_score = (
+            similarity * 0.5 +
+            keyword_match * 0.4 +
+            (priority / 100) * 0.1
+        )
+        scored_responses.append({'response': response, 'score': final_score})
+
+    scored_responses.sort(key=lambda x: x['score'], reverse=True)
+    best = scored_responses[0]
+    return best['response'] if best['score'] >= 0.3 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, default=3000)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chatbot = NLPChatbot()
+    rules = make_rules(rng, args.rules)
+    messages = make_messages(rng, args.messages)
+
+    start = time.perf_counter()
+    index = SimilarityIndex(rules, chatbot)
+    build_time = time.perf_counter() - start
+
+    reference_latencies, indexed_latencies = [], []
+    mismatches = []
+    for message in messages:
+        start = time.perf_counter()
+        expected = reference_best_response(chatbot, message, rules)
+        reference_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        got = chatbot.find_best_response(message, rules, index=index)
+        indexed_latencies.append(time.perf_counter() - start)
+
+        if (expected or {}).get('id') != (got or {}).get('id'):
+            mismatches.append((message, (expected or {}).get('id'), (got or {}).get('id')))
+
+    reference = summarize(reference_latencies)
+    indexed = summarize(indexed_latencies)
+
+    print('=' * 70)
+    print(f'📊 SCORING NLP: {args.rules} règles, {args.messages} messages')
+    print('=' * 70)
+    print(f"Construction de l'index: {build_time * 1000:.1f} ms")
+    print(f"Calcul d'origine   p50={reference['p50_ms']:9.3f} ms  p99={reference['p99_ms']:9.3f} ms")
+    print(f"Index vectorisé    p50={indexed['p50_ms']:9.3f} ms  p99={indexed['p99_ms']:9.3f} ms")
+    if indexed['mean_ms']:
+        print(f"Accélération moyenne: x{reference['mean_ms'] / indexed['mean_ms']:.1f}")
+    print(f'Parité top-1: {len(messages) - len(mismatches)}/{len(messages)}')
+    for message, expected, got in mismatches[:10]:
+        print(f'   ❌ "{message}": attendu {expected}, obtenu {got}')
+    print('=' * 70)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
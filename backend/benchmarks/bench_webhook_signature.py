@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vérification X-Hub-Signature-256 vs décodage JSON du webhook
+
+Pour des corps de webhook de tailles croissantes (1 à N entrées), mesure
+le contrôle HMAC-SHA256 à temps constant, le rejet d'une requête non
+signée (en-tête absent) et json.loads du même corps.
+
+Usage:
+    python benchmarks/bench_webhook_signature.py
+    python benchmarks/bench_webhook_signature.py --entries 1 10 100 --repeat 20000
+"""
+
+import argparse
+import json
+import time
+from types import SimpleNamespace
+
+import common  # noqa: F401  (chemin du backend)
+
+from services.webhook_signature import WebhookSignatureVerifier, sign
+
+SECRET = 'bench-app-secret'
+
+
+def make_body(entries):
+    payload = {
+        'object': 'page',
+        'entry': [{
+            'id': '100000000000001',
+            'time': 1700000000 + i,
+            'messaging': [{
+                'sender': {'id': f'user_{i}'},
+                'recipient': {'id': '100000000000001'},
+                'timestamp': 1700000000000 + i,
+                'message': {'mid': f'm_{i}', 'text': 'Bonjour, quel est le prix de la livraison ?'}
+            }]
+        } for i in range(entries)]
+    }
+    return json.dumps(payload).encode()
+
+
+def per_call_us(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    verifier = WebhookSignatureVerifier()
+    verifier.init_app(SimpleNamespace(config={'FACEBOOK_APP_SECRET': SECRET}))
+
+    print('=' * 70)
+    print('🔏 SIGNATURE WEBHOOK vs DÉCODAGE JSON (µs par appel)')
+    print('=' * 70)
+    print(f"{'entrées':>8} {'octets':>9} {'HMAC':>9} {'non signé':>10} {'json.loads':>11} {'ratio':>7}")
+    for entries in args.entries:
+        body = make_body(entries)
+        header = sign(body, SECRET)
+        repeat = max(100, args.repeat // entries)
+
+        assert verifier.verify(body, header) and not verifier.verify(body + b' ', header)
+
+        hmac_us = per_call_us(lambda: verifier.verify(body, header), repeat)
+        unsigned_us = per_call_us(lambda: verifier.verify(body, None), repeat)
+        json_us = per_call_us(lambda: json.loads(body), repeat)
+        print(f'{entries:>8} {len(body):>9} {hmac_us:>9.2f} {unsigned_us:>10.2f} {json_us:>11.2f} '
+              f'{hmac_us / json_us:>6.0%}')
+    print('=' * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Vérification EXPLAIN: les requêtes chaudes utilisent bien les index
+
+Crée le schéma via les migrations, insère des données de test, puis
+vérifie que le plan de chaque requête (historique, /stats, statistiques
+NLP, règles actives, file d'envoi) passe par l'index attendu.
+Code de sortie 1 si un plan ne l'utilise pas.
+
+Usage:
+    python benchmarks/check_indexes.py
+    python benchmarks/check_indexes.py --database-url postgresql://... --rows 5000
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+from datetime import datetime, timedelta
+
+from common import configure_environment
+
+
+def hot_queries(since):
+    """(description, requête SQLAlchemy, index attendu)"""
+    from models import db, AutoResponse, Message, Comment, OutboundReply
+    from sqlalchemy import func, select
+    from services.history import encode_cursor, history_query
+
+    return [
+        ('messages récents (/messages)',
+         select(Message).order_by(Message.timestamp.desc()).limit(100),
+         'ix_message_timestamp'),
+        ('page suivante (curseur keyset)',
+         history_query('message', cursor=encode_cursor(since, 1000)).limit(101),
+         'ix_message_timestamp'),
+        ('commentaires récents (/comments)',
+         select(Comment).order_by(Comment.timestamp.desc()).limit(100),
+         'ix_comment_timestamp'),
+        ('messages automatiques (/stats)',
+         select(func.count(Message.id)).where(Message.is_automated == True),
+         'ix_message_automated_timestamp'),
+        ('satisfaction NLP (automatiques sur N jours)',
+         select(Comment).where(Comment.is_automated == True, Comment.timestamp >= since),
+         'ix_comment_automated_timestamp'),
+        ('historique d\'une page',
+         select(Message).where(Message.page_id == 1).order_by(Message.timestamp.desc()).limit(50),
+         'ix_message_page_timestamp'),
+        ('conversation d\'un expéditeur',
+         select(Message).where(Message.sender_id == 'user_1').order_by(Message.timestamp.desc()),
+         'ix_message_sender_timestamp'),
+        ('commentaires d\'une publication',
+         select(Comment).where(Comment.post_id == 'post_1').order_by(Comment.timestamp.desc()),
+         'ix_comment_post_timestamp'),
+        ('règles actives par type',
+         select(AutoResponse).where(
+             AutoResponse.is_active == True,
+             AutoResponse.response_type.in_(['message', 'both'])
+         ).order_by(AutoResponse.priority.desc()),
+         'ix_auto_response_active_type_priority'),
+        ('règles d\'une page',
+         select(AutoResponse).where(AutoResponse.page_id == 1, AutoResponse.is_active == True),
+         'ix_auto_response_page_active'),
+        ('file d\'envoi (dispatcher)',
+         select(OutboundReply).where(
+             OutboundReply.status == 'pending',
+             OutboundReply.next_attempt_at <= datetime.utcnow()
+         ).order_by(OutboundReply.next_attempt_at).limit(50),
+         'ix_outbound_reply_status_next_attempt'),
+    ]
+
+
+def populate(rows):
+    from models import db, AutoResponse, FacebookPage, Message, Comment, OutboundReply
+
+    page = FacebookPage(page_id='1', page_name='Page', access_token='token')
+    db.session.add(page)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for i in range(rows):
+        timestamp = now - timedelta(minutes=i)
+        automated = random.random() < 0.1
+        db.session.add(Message(
+            message_id=f'm_{i}', sender_id=f'user_{i % 500}', message_text='bonjour',
+            is_automated=automated, timestamp=timestamp, page_id=page.id
+        ))
+        db.session.add(Comment(
+            comment_id=f'c_{i}', post_id=f'post_{i % 200}', comment_text='prix ?',
+            is_automated=automated, timestamp=timestamp, page_id=page.id
+        ))
+        db.session.add(OutboundReply(
+            page_id=page.id, channel='message', recipient_id=f'user_{i}', response_text='ok',
+            status='pending' if i % 50 == 0 else 'sent', next_attempt_at=timestamp
+        ))
+    for i in range(max(50, rows // 20)):
+        db.session.add(AutoResponse(
+            trigger_keyword=f'mot{i}', response_text='réponse',
+            response_type=random.choice(['message', 'comment', 'both']),
+            is_active=i % 5 != 0, priority=i % 10, page_id=page.id if i % 4 == 0 else None
+        ))
+    db.session.commit()
+
+
+def explain(conn, statement):
+    """Texte du plan d'exécution (SQLite ou PostgreSQL)"""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+        return '\n'.join(row[-1] for row in rows)
+    rows = conn.exec_driver_sql(f'EXPLAIN {sql}').fetchall()
+    return '\n'.join(row[0] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='Base à utiliser (défaut: SQLite temporaire)')
+    parser.add_argument('--rows', type=int, default=2000)
+    args = parser.parse_args()
+
+    configure_environment(database_url=args.database_url)
+
+    from app import create_app
+    from models import db
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    failures = 0
+    with app.app_context():
+        populate(args.rows)
+
+        with db.engine.connect() as conn:
+            if conn.dialect.name == 'sqlite':
+                conn.exec_driver_sql('ANALYZE')
+            elif conn.dialect.name == 'postgresql':
+                conn.exec_driver_sql('ANALYZE')
+                # Petites tables: forcer le planificateur à montrer les index utilisables
+                conn.exec_driver_sql('SET enable_seqscan = off')
+
+            print('=' * 70)
+            print(f'🔎 PLANS D\'EXÉCUTION ({conn.dialect.name}, {args.rows} lignes)')
+            print('=' * 70)
+            for label, statement, index_name in hot_queries(datetime.utcnow() - timedelta(days=7)):
+                plan = explain(conn, statement)
+                ok = index_name in plan
+                failures += not ok
+                print(f"{'✅' if ok else '❌'} {label:45} {index_name}")
+                if not ok:
+                    print('   ' + plan.replace('\n', '\n   '))
+            print('=' * 70)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Vérification: réponses en erreur temporaire avec le dispatcher désactivé
+
+Avec OUTBOUND_DISPATCHER=false, l'envoi est fait tout de suite et aucun
+thread ne reprend les lignes replanifiées. Une erreur temporaire (code 2)
+doit donc marquer la réponse 'failed', relançable par
+POST /api/responses/deliveries/<id>/retry; une réponse 'pending' échue est
+aussi relançable, une réponse 'pending' à venir ne l'est pas.
+
+Vérifie aussi qu'un envoi qui lève une exception à chaque essai (passage
+par dispatch_due) finit 'failed' après OUTBOUND_MAX_ATTEMPTS tentatives.
+Code de sortie 1 si une vérification échoue.
+
+Usage:
+    python benchmarks/check_outbound_retry.py
+"""
+
+import contextlib
+import io
+from datetime import datetime, timedelta
+
+from common import configure_environment
+from fake_graph import FakeGraphServer, PAGE_ID
+
+
+def main():
+    graph = FakeGraphServer().start()
+    configure_environment(graph_url=graph.url, OUTBOUND_DISPATCHER='false')
+
+    from app import create_app
+    from models import db, FacebookPage, OutboundReply
+    from services.facebook_service import FacebookService
+    from services.outbound_dispatcher import outbound_dispatcher
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    client = app.test_client()
+
+    failures = []
+
+    def check(description, condition):
+        print(f"   {'✅' if condition else '❌'} {description}")
+        if not condition:
+            failures.append(description)
+
+    print('=' * 70)
+    print('🔁 RÉPONSES EN ERREUR TEMPORAIRE (dispatcher désactivé)')
+    print('=' * 70)
+
+    with app.app_context():
+        page = FacebookPage(page_id=PAGE_ID, page_name='Check', access_token='token')
+        db.session.add(page)
+        db.session.commit()
+
+        graph.send_error = {'code': 2}
+        reply = outbound_dispatcher.enqueue(page.id, 'message', 'user_1', 'Bonjour')
+        db.session.commit()
+        outbound_dispatcher.submit(reply)
+        check("erreur code 2 -> 'failed' (pas de 'pending' orphelin)",
+              reply.status == 'failed' and reply.last_error_code == '2')
+
+        graph.send_error = None
+        response = client.post(f'/api/responses/deliveries/{reply.id}/retry')
+        db.session.refresh(reply)
+        check("relance d'une réponse 'failed' -> envoyée",
+              response.status_code == 200 and reply.status == 'sent')
+
+        overdue = outbound_dispatcher.enqueue(page.id, 'message', 'user_2', 'Bonjour')
+        overdue.next_attempt_at = datetime.utcnow() - timedelta(minutes=5)
+        upcoming = outbound_dispatcher.enqueue(page.id, 'message', 'user_3', 'Bonjour')
+        upcoming.next_attempt_at = datetime.utcnow() + timedelta(minutes=5)
+        db.session.commit()
+
+        response = client.post(f'/api/responses/deliveries/{overdue.id}/retry')
+        db.session.refresh(overdue)
+        check("relance d'une réponse 'pending' échue -> envoyée",
+              response.status_code == 200 and overdue.status == 'sent')
+
+        response = client.post(f'/api/responses/deliveries/{upcoming.id}/retry')
+        check("relance d'une réponse 'pending' à venir refusée (400)", response.status_code == 400)
+
+        db.session.delete(upcoming)
+        db.session.commit()
+
+        def raising_send(self, recipient_id, message_text):
+            raise RuntimeError('envoi impossible')
+
+        original_send = FacebookService.send_message
+        FacebookService.send_message = raising_send
+        try:
+            crashing = outbound_dispatcher.enqueue(page.id, 'message', 'user_4', 'Bonjour')
+            db.session.commit()
+            for _ in range(outbound_dispatcher.max_attempts + 2):
+                with contextlib.redirect_stderr(io.StringIO()):
+                    outbound_dispatcher.dispatch_due()
+                db.session.refresh(crashing)
+                if crashing.status != 'pending':
+                    break
+                crashing.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+                db.session.commit()
+        finally:
+            FacebookService.send_message = original_send
+        check(f"exception à chaque envoi -> 'failed' après {outbound_dispatcher.max_attempts} tentatives",
+              crashing.status == 'failed' and crashing.attempts == outbound_dispatcher.max_attempts)
+
+    graph.stop()
+    print('=' * 70)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+"""
+Utilitaires partagés par les scripts de benchmark
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Secret d'application des benchmarks: les webhooks postés sont signés comme par Facebook
+APP_SECRET = 'bench-app-secret'
+
+
+def configure_environment(graph_url=None, database_url=None, **extra):
+    """
+    Préparer les variables d'environnement AVANT d'importer config/app
+
+    Par défaut la base est un fichier SQLite temporaire.
+    """
+    if database_url is None:
+        fd, path = tempfile.mkstemp(prefix='bench_', suffix='.db')
+        os.close(fd)
+        database_url = f'sqlite:///{path}'
+
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['FLASK_ENV'] = 'production'
+    os.environ['FACEBOOK_APP_SECRET'] = APP_SECRET
+    if graph_url:
+        os.environ['FACEBOOK_GRAPH_URL'] = graph_url
+    for key, value in extra.items():
+        os.environ[key] = str(value)
+
+    return database_url
+
+
+def post_webhook(client, payload):
+    """POST /webhook avec l'en-tête X-Hub-Signature-256, comme Facebook"""
+    from services.webhook_signature import SIGNATURE_HEADER, sign
+
+    body = json.dumps(payload).encode()
+    return client.post('/webhook', data=body, content_type='application/json',
+                       headers={SIGNATURE_HEADER: sign(body, APP_SECRET)})
+
+
+def percentile(values, pct):
+    """Percentile (interpolation linéaire) d'une liste de valeurs"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summarize(latencies_s):
+    """Résumé p50/p95/p99/moyenne en millisecondes"""
+    ms = [v * 1000 for v in latencies_s]
+    return {
+        'count': len(ms),
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else 0.0,
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3)
+    }
@@ -0,0 +1,168 @@
+"""
+Faux serveur Graph API local pour les benchmarks
+
+Répond aux quelques endpoints utilisés par l'application (/me, profils,
+envoi de messages, réponses aux commentaires) avec une latence simulée,
+et compte les appels reçus.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+PAGE_ID = '100000000000001'
+
+
+class FakeGraphServer:
+    """Serveur HTTP local imitant graph.facebook.com"""
+
+    def __init__(self, latency: float = 0.0, page_id: str = PAGE_ID):
+        self.latency = latency
+        self.page_id = page_id
+        self.calls = Counter()
+        # Erreur renvoyée aux envois (messages, réponses aux commentaires), ex. {'code': 2}
+        self.send_error = None
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # En-têtes et corps sont écrits séparément: sans TCP_NODELAY, Nagle et
+            # l'ACK retardé du client ajoutent ~40 ms à chaque appel keep-alive
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _read_body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                if not raw:
+                    return {}
+                if 'json' in (self.headers.get('Content-Type') or ''):
+                    return json.loads(raw)
+                return {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+
+            def _reply(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = urlparse(self.path).path.strip('/').split('/')[1:]
+                fake.record('GET', path)
+                self._reply(fake.handle_get(path))
+
+            def do_POST(self):
+                body = self._read_body()
+                path = urlparse(self.path).path.strip('/').split('/')[1:]
+                fake.record('POST', path)
+                self._reply(fake.handle_post(path, body))
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def record(self, method, path):
+        """Compter l'appel puis appliquer la latence simulée"""
+        kind = self.classify(method, path)
+        with self._lock:
+            self.calls[kind] += 1
+            self.calls['total'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def classify(method, path):
+        if path == ['me']:
+            return 'me'
+        if path == ['me', 'permissions']:
+            return 'permissions'
+        if path == ['me', 'messages']:
+            return 'send_message'
+        if len(path) == 2 and path[1] == 'comments':
+            return 'reply_comment'
+        if len(path) == 2 and path[1] == 'subscribed_apps':
+            return 'subscribed_apps'
+        if method == 'POST' and not path:
+            return 'batch'
+        return 'object'
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    def handle_get(self, path):
+        if path == ['me']:
+            return {'id': self.page_id, 'name': 'Fake Page'}
+        if path == ['me', 'permissions']:
+            perms = ['pages_messaging', 'pages_manage_metadata',
+                     'pages_read_engagement', 'pages_manage_posts']
+            return {'data': [{'permission': p, 'status': 'granted'} for p in perms]}
+        if len(path) == 2 and path[1] == 'subscribed_apps':
+            return {'data': [{'id': 'app', 'subscribed_fields': ['feed', 'messages']}]}
+        object_id = path[0] if path else ''
+        return {
+            'id': object_id,
+            'name': f'User {object_id}',
+            'first_name': 'User',
+            'last_name': object_id,
+            'message': 'commentaire de test'
+        }
+
+    def handle_batch(self, body):
+        """Endpoint batch: une réponse {code, body} par sous-requête"""
+        responses = []
+        for request in json.loads(body.get('batch') or '[]'):
+            parsed = urlparse(request.get('relative_url', ''))
+            path = [p for p in parsed.path.strip('/').split('/') if p]
+            method = request.get('method', 'GET').upper()
+            kind = self.classify(method, path)
+            with self._lock:
+                self.calls[f'batch_item:{kind}'] += 1
+            if method == 'GET':
+                payload = self.handle_get(path)
+            else:
+                sub_body = {k: v[0] for k, v in parse_qs(request.get('body') or '').items()}
+                for key, value in sub_body.items():
+                    if value.startswith('{'):
+                        sub_body[key] = json.loads(value)
+                payload = self.handle_post(path, sub_body)
+            responses.append({'code': 200, 'body': json.dumps(payload)})
+        return responses
+
+    def handle_post(self, path, body):
+        if not path and 'batch' in body:
+            return self.handle_batch(body)
+        if self.send_error and (path == ['me', 'messages'] or (len(path) == 2 and path[1] == 'comments')):
+            return {'error': dict({'message': 'Fake send error'}, **self.send_error)}
+        if path == ['me', 'messages']:
+            recipient = (body.get('recipient') or {}).get('id')
+            return {'recipient_id': recipient, 'message_id': f'm_{time.time_ns()}'}
+        if len(path) == 2 and path[1] == 'comments':
+            return {'id': f'{path[0]}_{time.time_ns()}'}
+        if len(path) == 2 and path[1] == 'subscribed_apps':
+            return {'success': True}
+        return {'error': {'message': 'Unsupported fake endpoint', 'code': 100}}
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Test de charge reproductible du pipeline webhook
+
+Démarre l'application via create_app() (SQLite temporaire par défaut, ou
+--database-url postgresql://...) face au faux Graph API local, puis rejoue
+des webhooks Messenger et commentaires synthétiques (générés à partir
+d'une graine) à un débit donné. Rapporte la latence p50/p95/p99 du POST
+/webhook, le débit, le nombre de requêtes SQL et d'appels Graph par
+événement, les issues (replied, deduped...) et la durée moyenne de chaque
+étape (métriques de /metrics).
+
+Les seuils --max-p95-ms, --max-db-per-event et --max-graph-per-event font
+échouer le script (code 1) en cas de régression.
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --events 2000 --rate 200 --concurrency 4 --async
+    python benchmarks/load_test.py --latency 0.05 --dispatcher --json resultats.json
+    python benchmarks/load_test.py --max-p95-ms 25 --max-db-per-event 12
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from common import configure_environment, post_webhook, summarize
+from fake_graph import FakeGraphServer
+
+KEYWORDS = ['livraison', 'prix', 'horaires', 'retour', 'remboursement', 'commande',
+            'delivery', 'price', 'opening hours', 'refund', 'order', 'stock']
+
+MATCHING_TEMPLATES = [
+    'Bonjour, quel est le délai de {kw} ?',
+    'Salut ! Je voudrais des infos sur {kw} svp',
+    'Hello, can you tell me about {kw}?',
+    "C'est possible d'avoir le {kw} pour demain ?",
+    'Hi there, what about {kw} for my order',
+]
+
+OTHER_TEXTS = [
+    'Merci beaucoup pour votre aide',
+    'Super page, continuez comme ça !',
+    'Thanks, have a nice day',
+    "Je n'ai pas compris votre dernier post",
+    'Is anyone there?',
+]
+
+
+class Scenario:
+    """Événements synthétiques déterministes (même graine = mêmes payloads)"""
+
+    def __init__(self, seed, pages, rules, comment_ratio, duplicate_ratio, match_ratio):
+        self.random = random.Random(seed)
+        self.pages = pages
+        self.comment_ratio = comment_ratio
+        self.duplicate_ratio = duplicate_ratio
+        self.match_ratio = match_ratio
+        self.keywords = [KEYWORDS[i % len(KEYWORDS)] if i < len(KEYWORDS) else f'produit{i}'
+                         for i in range(rules)]
+        self._sent = []
+
+    def text(self):
+        if self.keywords and self.random.random() < self.match_ratio:
+            keyword = self.random.choice(self.keywords)
+            return self.random.choice(MATCHING_TEMPLATES).format(kw=keyword)
+        return self.random.choice(OTHER_TEXTS)
+
+    def event(self, index):
+        """Payload webhook de l'événement n° index (parfois un renvoi d'un événement précédent)"""
+        if self._sent and self.random.random() < self.duplicate_ratio:
+            return self.random.choice(self._sent)
+
+        page_id = self.random.choice(self.pages)
+        user_id = f'user_{self.random.randrange(10 ** 6)}'
+        if self.random.random() < self.comment_ratio:
+            entry = {
+                'id': page_id,
+                'time': 1700000000 + index,
+                'changes': [{
+                    'field': 'feed',
+                    'value': {
+                        'item': 'comment',
+                        'verb': 'add',
+                        'comment_id': f'post_{index % 50}_{index}',
+                        'post_id': f'post_{index % 50}',
+                        'from': {'id': user_id, 'name': 'Load Test'},
+                        'message': self.text()
+                    }
+                }]
+            }
+        else:
+            entry = {
+                'id': page_id,
+                'time': 1700000000 + index,
+                'messaging': [{
+                    'sender': {'id': user_id},
+                    'recipient': {'id': page_id},
+                    'timestamp': 1700000000000 + index,
+                    'message': {'mid': f'm_load_{index}', 'text': self.text()}
+                }]
+            }
+        payload = {'object': 'page', 'entry': [entry]}
+        self._sent.append(payload)
+        return payload
+
+    def events(self, count):
+        return [self.event(i) for i in range(count)]
+
+
+def replay(app, payloads, rate, concurrency):
+    """
+    Poster les payloads à `rate` événements/s (0 = au plus vite) depuis
+    `concurrency` threads; le planning est fixé à l'avance (boucle ouverte)
+
+    Returns:
+        (latences en secondes, statuts HTTP, durée totale)
+    """
+    latencies = [0.0] * len(payloads)
+    statuses = Counter()
+    lock = threading.Lock()
+    next_index = iter(range(len(payloads)))
+    started = time.perf_counter()
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                index = next(next_index, None)
+            if index is None:
+                return
+            if rate:
+                delay = started + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sent_at = time.perf_counter()
+            response = post_webhook(client, payloads[index])
+            latencies[index] = time.perf_counter() - sent_at
+            with lock:
+                statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def wait_for_drain(app, timeout):
+    """Attendre la file d'ingestion (mode async) puis les réponses en attente du dispatcher"""
+    from models import OutboundReply
+
+    started = time.perf_counter()
+    event_queue = app.extensions.get('event_queue')
+    if event_queue and not event_queue.wait_until_empty(timeout):
+        return time.perf_counter() - started, False
+
+    deadline = started + timeout
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            pending = OutboundReply.query.filter(OutboundReply.status.in_(('pending', 'sending'))).count()
+            if not pending:
+                return time.perf_counter() - started, True
+            time.sleep(0.05)
+    return time.perf_counter() - started, False
+
+
+def run(args):
+    graph = FakeGraphServer(latency=args.latency).start()
+    configure_environment(
+        graph_url=graph.url,
+        database_url=args.database_url,
+        WEBHOOK_ASYNC='true' if args.use_async else 'false',
+        WEBHOOK_WORKERS=args.workers,
+        OUTBOUND_DISPATCHER='true' if args.dispatcher else 'false',
+        # Cadence non limitante: on mesure le pipeline, pas le token bucket
+        OUTBOUND_RATE_PER_PAGE=10000,
+        OUTBOUND_BURST=10000,
+        OUTBOUND_POLL_INTERVAL=0.05,
+        LOG_LEVEL=args.log_level
+    )
+
+    from sqlalchemy import event
+
+    from app import create_app
+    from models import db, FacebookPage, AutoResponse
+    from services.metrics import events as event_counter, stage_seconds
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    page_ids = [str(100000000000001 + i) for i in range(args.pages)]
+    scenario = Scenario(args.seed, page_ids, args.rules, args.comment_ratio,
+                        args.duplicate_ratio, args.match_ratio)
+
+    with app.app_context():
+        for page_id in page_ids:
+            db.session.add(FacebookPage(page_id=page_id, page_name=f'Load {page_id}',
+                                        access_token=f'token-{page_id}'))
+        for priority, keyword in enumerate(scenario.keywords):
+            db.session.add(AutoResponse(trigger_keyword=keyword, response_text=f'Réponse {keyword}',
+                                        response_type='both', priority=priority % 10))
+        db.session.commit()
+        engine = db.engine
+
+    payloads = scenario.events(args.events)
+
+    # Échauffement (caches, pool HTTP, instantanés de règles), non compté
+    if args.warmup:
+        warmup = Scenario(args.seed + 1, page_ids, args.rules, args.comment_ratio, 0, args.match_ratio)
+        with contextlib.redirect_stdout(io.StringIO()):
+            replay(app, [_rename(p, 'warmup') for p in warmup.events(args.warmup)], 0, 1)
+            wait_for_drain(app, args.drain_timeout)
+
+    statements = Counter()
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements['total'] += 1
+        statements[statement.lstrip().split(None, 1)[0].upper()] += 1
+
+    graph.reset()
+    events_before = event_counter.snapshot()
+    stages_before = stage_seconds.snapshot()
+    event.listen(engine, 'before_cursor_execute', count_statement)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies, statuses, elapsed = replay(app, payloads, args.rate, args.concurrency)
+        drain_seconds, drained = wait_for_drain(app, args.drain_timeout)
+
+    event.remove(engine, 'before_cursor_execute', count_statement)
+    graph.stop()
+
+    outcomes = Counter()
+    for (channel, page, outcome), value in event_counter.snapshot().items():
+        outcomes[outcome] += value - events_before.get((channel, page, outcome), 0)
+
+    stages = {}
+    for (channel, stage), (count, total) in sorted(stage_seconds.snapshot().items()):
+        before_count, before_total = stages_before.get((channel, stage), (0, 0.0))
+        if count > before_count:
+            stages[f'{channel}.{stage}'] = round((total - before_total) / (count - before_count) * 1000, 3)
+
+    received = outcomes.pop('received', 0) or len(payloads)
+    return {
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'latency': summarize(latencies),
+        'throughput_eps': round(len(payloads) / elapsed, 1),
+        'end_to_end_eps': round(len(payloads) / (elapsed + drain_seconds), 1),
+        'drain_seconds': round(drain_seconds, 3),
+        'drained': drained,
+        'http_statuses': dict(statuses),
+        'outcomes': dict(outcomes),
+        'db_statements_per_event': round(statements['total'] / received, 2),
+        'db_statements': dict(statements),
+        'graph_calls_per_event': round(graph.calls['total'] / received, 2),
+        'graph_calls': dict(graph.calls),
+        'stage_mean_ms': stages
+    }
+
+
+def _rename(payload, prefix):
+    """Identifiants distincts pour l'échauffement (pas de collision avec la déduplication)"""
+    text = json.dumps(payload).replace('"m_load_', f'"m_{prefix}_').replace('"post_', f'"{prefix}_post_')
+    return json.loads(text)
+
+
+def check_thresholds(results, args):
+    """Seuils de régression dépassés (liste vide si tout va bien)"""
+    failures = []
+    if args.max_p95_ms is not None and results['latency']['p95_ms'] > args.max_p95_ms:
+        failures.append(f"p95 {results['latency']['p95_ms']} ms > {args.max_p95_ms} ms")
+    if args.max_db_per_event is not None and results['db_statements_per_event'] > args.max_db_per_event:
+        failures.append(f"SQL/événement {results['db_statements_per_event']} > {args.max_db_per_event}")
+    if args.max_graph_per_event is not None and results['graph_calls_per_event'] > args.max_graph_per_event:
+        failures.append(f"Graph/événement {results['graph_calls_per_event']} > {args.max_graph_per_event}")
+    if not results['drained']:
+        failures.append('file non vidée avant --drain-timeout')
+    return failures
+
+
+def print_report(results):
+    latency = results['latency']
+    config = results['config']
+    mode = 'async' if config['use_async'] else 'sync'
+    print('=' * 70)
+    print(f"🚦 TEST DE CHARGE ({config['events']} événements, {config['pages']} page(s), "
+          f"{config['rules']} règles, mode {mode})")
+    print('=' * 70)
+    print(f"Latence POST /webhook  p50={latency['p50_ms']:.2f} ms  p95={latency['p95_ms']:.2f} ms  "
+          f"p99={latency['p99_ms']:.2f} ms")
+    print(f"Débit                  {results['throughput_eps']} évén./s "
+          f"(bout en bout {results['end_to_end_eps']} évén./s, vidage {results['drain_seconds']} s)")
+    print(f"SQL par événement      {results['db_statements_per_event']}  {results['db_statements']}")
+    print(f"Graph par événement    {results['graph_calls_per_event']}  {results['graph_calls']}")
+    print(f"Issues                 {results['outcomes']}  HTTP {results['http_statuses']}")
+    print('-' * 70)
+    print('Durée moyenne par étape (ms)')
+    for stage, mean_ms in results['stage_mean_ms'].items():
+        print(f'  {stage:<28} {mean_ms:>9.3f}')
+    print('=' * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Événements par seconde (0 = au plus vite)')
+    parser.add_argument('--concurrency', type=int, default=1, help='Threads qui postent les webhooks')
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--rules', type=int, default=50)
+    parser.add_argument('--comment-ratio', type=float, default=0.3)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.05,
+                        help='Part des événements renvoyés (comme les retries de Facebook)')
+    parser.add_argument('--match-ratio', type=float, default=0.7,
+                        help='Part des textes contenant un mot-clé de règle')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Latence simulée du faux Graph API (secondes)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='File d\'ingestion (WEBHOOK_ASYNC): le POST répond avant le traitement')
+    parser.add_argument('--workers', type=int, default=4, help='Workers de la file d\'ingestion')
+    parser.add_argument('--dispatcher', action='store_true',
+                        help='Envoi des réponses par le dispatcher en arrière-plan (sinon dans la requête)')
+    parser.add_argument('--database-url', default=None,
+                        help='Base à utiliser (défaut: SQLite temporaire)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--drain-timeout', type=float, default=60)
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--json', help='Écrire les résultats dans ce fichier JSON')
+    parser.add_argument('--max-p95-ms', type=float)
+    parser.add_argument('--max-db-per-event', type=float)
+    parser.add_argument('--max-graph-per-event', type=float)
+    args = parser.parse_args()
+
+    results = run(args)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f'💾 Résultats écrits dans {args.json}')
+
+    failures = check_thresholds(results, args)
+    for failure in failures:
+        print(f'❌ Régression: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -22,8 +22,88 @@ class Config:
     FACEBOOK_PAGE_ACCESS_TOKEN = os.getenv('FACEBOOK_PAGE_ACCESS_TOKEN')
     FACEBOOK_VERIFY_TOKEN = os.getenv('FACEBOOK_VERIFY_TOKEN', 'my_verify_token_123')
     FACEBOOK_GRAPH_VERSION = 'v18.0'
-
-
+    FACEBOOK_GRAPH_URL = os.getenv('FACEBOOK_GRAPH_URL', 'https://graph.facebook.com')
+    
+    # Rejeter les webhooks sans signature X-Hub-Signature-256 valide (si FACEBOOK_APP_SECRET est défini)
+    WEBHOOK_VERIFY_SIGNATURE = os.getenv('WEBHOOK_VERIFY_SIGNATURE', 'true').lower() == 'true'
+    
+    # Transport HTTP vers le Graph API (Session partagée par processus)
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 3))
+    HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5))
+    
+    # Regroupement des appels Graph (endpoint batch), 0 = désactivé
+    GRAPH_BATCH_WINDOW_MS = float(os.getenv('GRAPH_BATCH_WINDOW_MS', 0))
+    # Un batcher (et son thread) par token, arrêté après cette inactivité
+    GRAPH_BATCH_IDLE_SECONDS = float(os.getenv('GRAPH_BATCH_IDLE_SECONDS', 60))
+    
+    # Cache de l'ID Graph de la page (détection des échos), en secondes
+    PAGE_IDENTITY_TTL = int(os.getenv('PAGE_IDENTITY_TTL', 3600))
+    
+    # Cache des profils expéditeurs (get_user_info), en secondes
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 10000))
+    PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 86400))
+    PROFILE_CACHE_NEGATIVE_TTL = int(os.getenv('PROFILE_CACHE_NEGATIVE_TTL', 3600))
+    PROFILE_CACHE_PERSIST = os.getenv('PROFILE_CACHE_PERSIST', 'false').lower() == 'true'
+    
+    # Déduplication des événements webhook: IDs récents gardés en mémoire
+    DEDUP_RECENT_SIZE = int(os.getenv('DEDUP_RECENT_SIZE', 10000))
+    # Événements réservés gardés N heures (Facebook renvoie pendant 36 h au plus),
+    # purgés toutes les DEDUP_PURGE_INTERVAL secondes (0 = commande flask dedup-purge seule)
+    DEDUP_RETENTION_HOURS = int(os.getenv('DEDUP_RETENTION_HOURS', 72))
+    DEDUP_PURGE_INTERVAL = float(os.getenv('DEDUP_PURGE_INTERVAL', 3600))
+    
+    # Agrégats NLP: tranches horaires gardées N heures, puis repliées par jour
+    NLP_ROLLUP_HOURLY_RETENTION = int(os.getenv('NLP_ROLLUP_HOURLY_RETENTION', 48))
+    NLP_ROLLUP_COMPACT_INTERVAL = float(os.getenv('NLP_ROLLUP_COMPACT_INTERVAL', 3600))
+    
+    # Export de l'historique: dossier de sortie, lignes par segment (point de reprise)
+    EXPORT_DIR = os.getenv('EXPORT_DIR', 'exports')
+    EXPORT_SEGMENT_SIZE = int(os.getenv('EXPORT_SEGMENT_SIZE', 50000))
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+    
+    # Intervalle de vérification de la version des règles en base, en secondes
+    RULES_VERSION_CHECK_INTERVAL = float(os.getenv('RULES_VERSION_CHECK_INTERVAL', 2))
+    # Instantané de règles d'une page oublié après N secondes sans événement
+    RULES_IDLE_TTL = float(os.getenv('RULES_IDLE_TTL', 1800))
+    # Mots-clés des règles: mots entiers seulement ('prix' ne déclenche pas sur 'surprix');
+    # désactivé = recherche de sous-chaîne, comportement historique
+    KEYWORD_WHOLE_WORDS = os.getenv('KEYWORD_WHOLE_WORDS', 'false').lower() == 'true'
+    
+    # Idem pour le registre des pages connectées (routage des webhooks par page)
+    PAGE_REGISTRY_CHECK_INTERVAL = float(os.getenv('PAGE_REGISTRY_CHECK_INTERVAL', 2))
+    # ... et pour les intentions définies en base (classification NLP)
+    INTENTS_VERSION_CHECK_INTERVAL = float(os.getenv('INTENTS_VERSION_CHECK_INTERVAL', 2))
+    
+    # Logs: niveau, format (text ou json), part des payloads journalisés en INFO
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', 0.01))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    
+    # Webhook - traitement asynchrone des événements. La file est en mémoire:
+    # les entrées acquittées mais non traitées sont perdues au redémarrage
+    # (Facebook ne les renvoie pas). Désactivé par défaut.
+    WEBHOOK_ASYNC = os.getenv('WEBHOOK_ASYNC', 'false').lower() == 'true'
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+    WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 4))
+    
+    # Envoi des réponses: file persistante cadencée par page (token bucket)
+    OUTBOUND_DISPATCHER = os.getenv('OUTBOUND_DISPATCHER', 'true').lower() == 'true'
+    # Débit total par page, réparti entre les processus qui envoient (un
+    # dispatcher par worker gunicorn: WEB_CONCURRENCY, lu aussi par gunicorn)
+    OUTBOUND_RATE_PER_PAGE = float(os.getenv('OUTBOUND_RATE_PER_PAGE', 2))
+    OUTBOUND_BURST = int(os.getenv('OUTBOUND_BURST', 10))
+    OUTBOUND_PROCESSES = int(os.getenv('OUTBOUND_PROCESSES', os.getenv('WEB_CONCURRENCY', 1)))
+    OUTBOUND_POLL_INTERVAL = float(os.getenv('OUTBOUND_POLL_INTERVAL', 1))
+    OUTBOUND_RATE_LIMIT_DELAY = int(os.getenv('OUTBOUND_RATE_LIMIT_DELAY', 60))
+    
+    # Nouvelles tentatives des envois en erreur temporaire (backoff exponentiel)
+    OUTBOUND_MAX_ATTEMPTS = int(os.getenv('OUTBOUND_MAX_ATTEMPTS', 8))
+    OUTBOUND_RETRY_BASE_DELAY = float(os.getenv('OUTBOUND_RETRY_BASE_DELAY', 5))
+    OUTBOUND_RETRY_MAX_DELAY = float(os.getenv('OUTBOUND_RETRY_MAX_DELAY', 3600))
     
     # CORS - Ajoutez votre domaine Render
     CORS_ORIGINS = [
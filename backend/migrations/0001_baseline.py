@@ -0,0 +1,109 @@
+"""
+Schéma initial: les tables telles qu'elles existaient avant les migrations
+(remplace db.create_all())
+
+Le schéma est figé ici, indépendamment des modèles: les colonnes, index et
+tables ajoutés depuis relèvent des migrations suivantes. Sur une base
+existante, seules les tables manquantes sont créées.
+"""
+
+from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text,
+                        UniqueConstraint)
+
+metadata = MetaData()
+
+Table(
+    'facebook_page', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('page_id', String(100), unique=True, nullable=False),
+    Column('page_name', String(200)),
+    Column('access_token', Text, nullable=False),
+    Column('is_active', Boolean),
+    Column('created_at', DateTime)
+)
+
+Table(
+    'auto_response', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('trigger_keyword', String(200), nullable=False),
+    Column('response_text', Text, nullable=False),
+    Column('response_type', String(50)),
+    Column('is_active', Boolean),
+    Column('priority', Integer),
+    Column('created_at', DateTime)
+)
+
+Table(
+    'message', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('message_id', String(100), unique=True),
+    Column('sender_id', String(100)),
+    Column('sender_name', String(200)),
+    Column('message_text', Text),
+    Column('response_sent', Text),
+    Column('is_automated', Boolean),
+    Column('timestamp', DateTime),
+    Column('page_id', Integer, ForeignKey('facebook_page.id'))
+)
+
+Table(
+    'comment', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('comment_id', String(100), unique=True),
+    Column('post_id', String(100)),
+    Column('user_id', String(100)),
+    Column('user_name', String(200)),
+    Column('comment_text', Text),
+    Column('response_sent', Text),
+    Column('is_automated', Boolean),
+    Column('timestamp', DateTime),
+    Column('page_id', Integer, ForeignKey('facebook_page.id'))
+)
+
+Table(
+    'cache_version', metadata,
+    Column('name', String(50), primary_key=True),
+    Column('version', Integer, nullable=False),
+    Column('updated_at', DateTime)
+)
+
+Table(
+    'user_profile', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('page_id', Integer, ForeignKey('facebook_page.id')),
+    Column('sender_id', String(100), nullable=False),
+    Column('name', String(200)),
+    Column('first_name', String(100)),
+    Column('last_name', String(100)),
+    Column('is_accessible', Boolean),
+    Column('fetched_at', DateTime),
+    UniqueConstraint('page_id', 'sender_id')
+)
+
+Table(
+    'outbound_reply', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('page_id', Integer, ForeignKey('facebook_page.id')),
+    Column('channel', String(20), nullable=False),
+    Column('recipient_id', String(100), nullable=False),
+    Column('response_text', Text, nullable=False),
+    Column('status', String(20)),
+    Column('attempts', Integer),
+    Column('next_attempt_at', DateTime),
+    Column('last_error_code', String(50)),
+    Column('last_error', Text),
+    Column('message_id', Integer, ForeignKey('message.id')),
+    Column('comment_id', Integer, ForeignKey('comment.id')),
+    Column('created_at', DateTime),
+    Column('sent_at', DateTime)
+)
+
+Table(
+    'processed_event', metadata,
+    Column('event_key', String(150), primary_key=True),
+    Column('created_at', DateTime)
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
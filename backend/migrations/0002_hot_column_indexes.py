@@ -0,0 +1,24 @@
+"""
+Index des colonnes filtrées et triées par l'historique, /stats et les
+statistiques NLP (timestamp, page_id, is_automated, sender_id, post_id),
+des règles actives et de la file d'envoi
+"""
+
+from migrations import create_indexes
+from models import db
+
+
+def upgrade(conn):
+    create_indexes(
+        conn, db.metadata,
+        'ix_message_timestamp',
+        'ix_message_page_timestamp',
+        'ix_message_automated_timestamp',
+        'ix_message_sender_timestamp',
+        'ix_comment_timestamp',
+        'ix_comment_page_timestamp',
+        'ix_comment_automated_timestamp',
+        'ix_comment_post_timestamp',
+        'ix_auto_response_active_type_priority',
+        'ix_outbound_reply_status_next_attempt'
+    )
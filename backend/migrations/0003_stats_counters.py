@@ -0,0 +1,18 @@
+"""
+Table des compteurs de /stats (stats_counter), remplie depuis l'historique
+"""
+
+from models import db, StatsCounter
+
+
+def upgrade(conn):
+    StatsCounter.__table__.create(conn, checkfirst=True)
+
+    from services.stats_counters import aggregate_history
+    rows = [
+        {'page_id': page_id, 'day': day, 'channel': channel, 'is_automated': automated, 'count': count}
+        for (page_id, day, channel, automated), count in aggregate_history(conn).items()
+    ]
+    if rows:
+        conn.execute(StatsCounter.__table__.delete())
+        conn.execute(StatsCounter.__table__.insert(), rows)
@@ -0,0 +1,17 @@
+"""
+Colonnes d'analyse NLP sur message et comment (intention, sentiment,
+score, nombre de tokens, version de l'analyseur)
+
+Les lignes existantes restent à NULL: `flask nlp-reanalyze` les remplit.
+"""
+
+from migrations import add_column
+from models import Message, Comment
+
+COLUMNS = ('intent', 'sentiment', 'sentiment_score', 'token_count', 'response_sentiment', 'analyzer_version')
+
+
+def upgrade(conn):
+    for model in (Message, Comment):
+        for name in COLUMNS:
+            add_column(conn, model.__tablename__, model.__table__.c[name])
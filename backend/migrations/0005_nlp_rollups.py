@@ -0,0 +1,17 @@
+"""
+Agrégats NLP par tranche horaire/journalière (nlp_rollup), remplis depuis
+les lignes déjà analysées (le thread de compaction replie ensuite les
+tranches anciennes en journées)
+"""
+
+from models import NlpRollup
+
+
+def upgrade(conn):
+    NlpRollup.__table__.create(conn, checkfirst=True)
+
+    from services.nlp_rollups import hourly_history
+    conn.execute(NlpRollup.__table__.delete())
+    rows = list(hourly_history(conn))
+    if rows:
+        conn.execute(NlpRollup.__table__.insert(), rows)
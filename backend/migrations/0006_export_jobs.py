@@ -0,0 +1,9 @@
+"""
+Table export_job: exports de l'historique et leur point de reprise
+"""
+
+from models import ExportJob
+
+
+def upgrade(conn):
+    ExportJob.__table__.create(conn, checkfirst=True)
@@ -0,0 +1,12 @@
+"""
+Règles de réponse par page: auto_response.page_id (NULL = règle globale,
+ce que deviennent les règles existantes) et son index
+"""
+
+from migrations import add_column, create_indexes
+from models import db, AutoResponse
+
+
+def upgrade(conn):
+    add_column(conn, 'auto_response', AutoResponse.__table__.c.page_id)
+    create_indexes(conn, db.metadata, 'ix_auto_response_page_active')
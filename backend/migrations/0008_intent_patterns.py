@@ -0,0 +1,9 @@
+"""
+Table intent_pattern: intentions NLP définies par l'utilisateur
+"""
+
+from models import IntentPattern
+
+
+def upgrade(conn):
+    IntentPattern.__table__.create(conn, checkfirst=True)
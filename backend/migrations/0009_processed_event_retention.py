@@ -0,0 +1,11 @@
+"""
+Index processed_event.created_at: purge des événements réservés au-delà
+de la fenêtre de renvoi de Facebook (DEDUP_RETENTION_HOURS)
+"""
+
+from migrations import create_indexes
+from models import db
+
+
+def upgrade(conn):
+    create_indexes(conn, db.metadata, 'ix_processed_event_created_at')
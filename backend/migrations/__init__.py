@@ -0,0 +1,117 @@
+"""
+Migrations du schéma de la base de données
+
+Chaque fichier NNNN_description.py de ce dossier définit une fonction
+upgrade(conn). Les versions appliquées sont enregistrées dans la table
+schema_version; au démarrage, seules les migrations manquantes sont
+exécutées, chacune dans sa propre transaction.
+
+Les migrations doivent rester idempotentes (checkfirst, add_column) car
+plusieurs workers peuvent démarrer en même temps sur SQLite.
+"""
+
+import importlib
+import os
+import re
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+_MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+# Verrou PostgreSQL partagé par les workers pendant les migrations
+_ADVISORY_LOCK_ID = 72817001
+
+_schema_metadata = MetaData()
+schema_version = Table(
+    'schema_version', _schema_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, default=datetime.utcnow)
+)
+
+
+def available_migrations() -> List[Tuple[int, str]]:
+    """(version, nom du module) triés par version"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), filename[:-3]))
+    return sorted(migrations)
+
+
+def applied_versions(conn) -> set:
+    return {row[0] for row in conn.execute(schema_version.select().with_only_columns(schema_version.c.version))}
+
+
+def run_migrations(engine) -> List[int]:
+    """
+    Appliquer les migrations manquantes
+
+    Returns:
+        Les versions appliquées par cet appel
+    """
+    _schema_metadata.create_all(engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+
+    applied = []
+    for version, module_name in available_migrations():
+        if version in done:
+            continue
+
+        module = importlib.import_module(f'{__name__}.{module_name}')
+        try:
+            with engine.begin() as conn:
+                if engine.dialect.name == 'postgresql':
+                    conn.execute(text('SELECT pg_advisory_xact_lock(:id)'), {'id': _ADVISORY_LOCK_ID})
+                    # Un autre worker a pu l'appliquer pendant l'attente du verrou
+                    if version in applied_versions(conn):
+                        continue
+
+                module.upgrade(conn)
+                conn.execute(schema_version.insert().values(
+                    version=version,
+                    name=module_name,
+                    applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Version enregistrée en parallèle par un autre worker
+            continue
+
+        print(f'🗄️ Migration {module_name} appliquée')
+        applied.append(version)
+
+    return applied
+
+
+# ---------- Helpers pour les migrations ----------
+
+def add_column(conn, table_name: str, column: Column):
+    """ALTER TABLE ... ADD COLUMN, si la colonne n'existe pas encore"""
+    existing = {c['name'] for c in inspect(conn).get_columns(table_name)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=conn.dialect)
+    ddl = f'ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}'
+    if column.server_default is not None:
+        ddl += f' DEFAULT {column.server_default.arg}'
+    try:
+        conn.execute(text(ddl))
+    except OperationalError as e:
+        # SQLite n'a pas de verrou consultatif: un autre worker a pu ajouter
+        # la colonne entre l'inspection et l'ALTER TABLE
+        if 'duplicate column' not in str(e).lower():
+            raise
+
+
+def create_indexes(conn, metadata, *names: str):
+    """Créer les index déclarés dans les modèles (__table_args__), s'ils manquent"""
+    indexes = {index.name: index for table in metadata.tables.values() for index in table.indexes}
+    for name in names:
+        indexes[name].create(conn, checkfirst=True)
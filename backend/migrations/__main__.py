@@ -0,0 +1,29 @@
+"""
+Appliquer les migrations et afficher la version du schéma
+
+Usage:
+    python -m migrations
+"""
+
+from app import create_app
+from migrations import applied_versions, available_migrations
+from models import db
+
+
+def main():
+    app = create_app()  # applique les migrations manquantes au démarrage
+
+    with app.app_context():
+        with db.engine.connect() as conn:
+            done = applied_versions(conn)
+
+    print("\n" + "=" * 60)
+    print("🗄️ MIGRATIONS")
+    print("=" * 60)
+    for version, name in available_migrations():
+        print(f"   {'✅' if version in done else '⏳'} {name}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,15 +12,31 @@ class FacebookPage(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class AutoResponse(db.Model):
+    __table_args__ = (
+        # Chargement des règles actives par type, triées par priorité
+        db.Index('ix_auto_response_active_type_priority', 'is_active', 'response_type', 'priority'),
+        # Règles d'une page (instantané par page)
+        db.Index('ix_auto_response_page_active', 'page_id', 'is_active'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     trigger_keyword = db.Column(db.String(200), nullable=False)
     response_text = db.Column(db.Text, nullable=False)
     response_type = db.Column(db.String(50))  # message, comment, both
     is_active = db.Column(db.Boolean, default=True)
     priority = db.Column(db.Integer, default=0)
+    page_id = db.Column(db.Integer, db.ForeignKey('facebook_page.id'))  # NULL = règle globale
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Message(db.Model):
+    __table_args__ = (
+        # Historique trié par date, filtres par page / réponse automatique / expéditeur
+        db.Index('ix_message_timestamp', 'timestamp'),
+        db.Index('ix_message_page_timestamp', 'page_id', 'timestamp'),
+        db.Index('ix_message_automated_timestamp', 'is_automated', 'timestamp'),
+        db.Index('ix_message_sender_timestamp', 'sender_id', 'timestamp'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     message_id = db.Column(db.String(100), unique=True)
     sender_id = db.Column(db.String(100))
@@ -30,8 +46,24 @@ class Message(db.Model):
     is_automated = db.Column(db.Boolean, default=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     page_id = db.Column(db.Integer, db.ForeignKey('facebook_page.id'))
+    
+    # Analyse NLP calculée à la réception (voir services/nlp_annotations.py)
+    intent = db.Column(db.String(50))
+    sentiment = db.Column(db.String(20))
+    sentiment_score = db.Column(db.Float)
+    token_count = db.Column(db.Integer)
+    response_sentiment = db.Column(db.String(20))
+    analyzer_version = db.Column(db.String(40))
 
 class Comment(db.Model):
+    __table_args__ = (
+        # Historique trié par date, filtres par page / réponse automatique / publication
+        db.Index('ix_comment_timestamp', 'timestamp'),
+        db.Index('ix_comment_page_timestamp', 'page_id', 'timestamp'),
+        db.Index('ix_comment_automated_timestamp', 'is_automated', 'timestamp'),
+        db.Index('ix_comment_post_timestamp', 'post_id', 'timestamp'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     comment_id = db.Column(db.String(100), unique=True)
     post_id = db.Column(db.String(100))
@@ -41,4 +73,106 @@ class Comment(db.Model):
     response_sent = db.Column(db.Text)
     is_automated = db.Column(db.Boolean, default=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    page_id = db.Column(db.Integer, db.ForeignKey('facebook_page.id'))
\ No newline at end of file
+    page_id = db.Column(db.Integer, db.ForeignKey('facebook_page.id'))
+    
+    # Analyse NLP calculée à la réception (voir services/nlp_annotations.py)
+    intent = db.Column(db.String(50))
+    sentiment = db.Column(db.String(20))
+    sentiment_score = db.Column(db.Float)
+    token_count = db.Column(db.Integer)
+    response_sentiment = db.Column(db.String(20))
+    analyzer_version = db.Column(db.String(40))
+
+class CacheVersion(db.Model):
+    """Compteur de version partagé entre workers (invalidation des caches en mémoire)"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserProfile(db.Model):
+    """Profil d'un expéditeur mis en cache (get_user_info)"""
+    __table_args__ = (db.UniqueConstraint('page_id', 'sender_id'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    page_id = db.Column(db.Integer, db.ForeignKey('facebook_page.id'))
+    sender_id = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(200))
+    first_name = db.Column(db.String(100))
+    last_name = db.Column(db.String(100))
+    is_accessible = db.Column(db.Boolean, default=True)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class OutboundReply(db.Model):
+    """Réponse sortante en attente d'envoi (file persistante du dispatcher)"""
+    __table_args__ = (db.Index('ix_outbound_reply_status_next_attempt', 'status', 'next_attempt_at'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    page_id = db.Column(db.Integer, db.ForeignKey('facebook_page.id'))
+    channel = db.Column(db.String(20), nullable=False)  # message, comment
+    recipient_id = db.Column(db.String(100), nullable=False)  # sender_id ou comment_id
+    response_text = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error_code = db.Column(db.String(50))
+    last_error = db.Column(db.Text)
+    message_id = db.Column(db.Integer, db.ForeignKey('message.id'))
+    comment_id = db.Column(db.Integer, db.ForeignKey('comment.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class ProcessedEvent(db.Model):
+    """Événement webhook déjà réservé par un worker (déduplication des renvois Facebook)"""
+    __table_args__ = (
+        # Purge des réservations plus anciennes que la fenêtre de renvoi
+        db.Index('ix_processed_event_created_at', 'created_at'),
+    )
+    event_key = db.Column(db.String(150), primary_key=True)  # message:<mid>, comment:<id>
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StatsCounter(db.Model):
+    """Compteurs de /stats maintenus à chaque événement (page, jour, canal, automatique)"""
+    page_id = db.Column(db.Integer, primary_key=True, default=0)  # 0 = sans page
+    day = db.Column(db.Date, primary_key=True)
+    channel = db.Column(db.String(20), primary_key=True)  # message, comment
+    is_automated = db.Column(db.Boolean, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class NlpRollup(db.Model):
+    """Agrégats NLP par tranche horaire ou journalière (page × canal × intention × sentiment)"""
+    granularity = db.Column(db.String(10), primary_key=True)  # hour, day
+    bucket = db.Column(db.DateTime, primary_key=True)  # début de la tranche
+    page_id = db.Column(db.Integer, primary_key=True, default=0)  # 0 = sans page
+    channel = db.Column(db.String(20), primary_key=True)  # message, comment
+    intent = db.Column(db.String(50), primary_key=True)
+    sentiment = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+class IntentPattern(db.Model):
+    """Intention définie par l'utilisateur: mots-clés séparés par des virgules, comme les déclencheurs"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    keywords = db.Column(db.Text, nullable=False)
+    priority = db.Column(db.Integer, default=0)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExportJob(db.Model):
+    """Export de l'historique en fichiers partitionnés (jour × page), repris au dernier id exporté"""
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), default='pending')  # pending, running, done, failed
+    format = db.Column(db.String(20), nullable=False)  # parquet, csv, ndjson
+    channels = db.Column(db.String(50), nullable=False, default='message,comment')
+    output_dir = db.Column(db.Text, nullable=False)
+    page_id = db.Column(db.Integer)  # filtres optionnels
+    since = db.Column(db.DateTime)
+    until = db.Column(db.DateTime)
+    last_message_id = db.Column(db.Integer, nullable=False, default=0)
+    last_comment_id = db.Column(db.Integer, nullable=False, default=0)
+    rows_exported = db.Column(db.Integer, nullable=False, default=0)
+    files_written = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # dernier point de reprise
+    finished_at = db.Column(db.DateTime)
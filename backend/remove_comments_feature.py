@@ -2,7 +2,7 @@
 Script pour supprimer la fonctionnalité des commentaires
 Garde uniquement les messages Messenger
 """
-from models import db, Comment
+from models import db, Comment, OutboundReply, StatsCounter, NlpRollup
 from app import create_app
 
 def remove_comments_feature():
@@ -24,8 +24,11 @@ def remove_comments_feature():
             confirm = input(f"\n⚠️ Supprimer {comment_count} commentaire(s) ? (o/n): ").strip().lower()
             
             if confirm == 'o':
-                # Supprimer tous les commentaires
+                # Supprimer tous les commentaires (et leurs envois / compteurs)
+                OutboundReply.query.filter(OutboundReply.comment_id.isnot(None)).delete()
                 Comment.query.delete()
+                StatsCounter.query.filter_by(channel='comment').delete()
+                NlpRollup.query.filter_by(channel='comment').delete()
                 db.session.commit()
                 print(f"   ✅ {comment_count} commentaire(s) supprimé(s)")
             else:
@@ -0,0 +1,63 @@
+"""
+Routes des exports de l'historique (jobs exécutés en arrière-plan)
+"""
+from datetime import datetime
+from flask import request, jsonify
+from routes import exports_bp
+from models import db, ExportJob
+from services.history_export import ExportError, available_formats, history_exporter
+
+@exports_bp.route('', methods=['GET'])
+@exports_bp.route('/', methods=['GET'])
+def list_exports():
+    """Derniers exports et formats disponibles"""
+    limit = request.args.get('limit', 50, type=int)
+    jobs = ExportJob.query.order_by(ExportJob.id.desc()).limit(limit).all()
+    return jsonify({
+        'formats': available_formats(),
+        'exports': [history_exporter.to_dict(job) for job in jobs]
+    })
+
+@exports_bp.route('', methods=['POST'])
+@exports_bp.route('/', methods=['POST'])
+def create_export():
+    """
+    Lancer un export
+    POST /api/exports
+    Body: {"format": "parquet|csv|ndjson", "channels": ["message", "comment"],
+           "page_id": 1, "since": "2024-01-01", "until": "2024-02-01"}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        since = datetime.fromisoformat(data['since']) if data.get('since') else None
+        until = datetime.fromisoformat(data['until']) if data.get('until') else None
+        job = history_exporter.create_job(
+            format=data.get('format'),
+            channels=tuple(data.get('channels') or ('message', 'comment')),
+            page_id=data.get('page_id'),
+            since=since,
+            until=until
+        )
+    except (ExportError, ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    history_exporter.start(job.id)
+    return jsonify(history_exporter.to_dict(job)), 202
+
+@exports_bp.route('/<int:job_id>', methods=['GET'])
+def get_export(job_id):
+    """Avancement d'un export"""
+    job = ExportJob.query.get_or_404(job_id)
+    return jsonify(history_exporter.to_dict(job))
+
+@exports_bp.route('/<int:job_id>/resume', methods=['POST'])
+def resume_export(job_id):
+    """Reprendre un export en échec ou interrompu depuis son dernier id exporté"""
+    job = ExportJob.query.get_or_404(job_id)
+    if job.status == 'done':
+        return jsonify({'error': 'Export déjà terminé'}), 400
+    if history_exporter.is_running(job):
+        return jsonify({'error': 'Export déjà en cours'}), 409
+
+    history_exporter.start(job.id)
+    return jsonify(history_exporter.to_dict(job)), 202
@@ -1,8 +1,16 @@
 from flask import request, jsonify
 from routes import facebook_bp
-from models import db, FacebookPage
+from models import db, AutoResponse, FacebookPage
 from services.facebook_service import FacebookService
-import requests
+from services.page_identity import page_identity_cache
+from services.page_registry import page_registry
+from services.rule_snapshot import rule_cache
+from services.http_client import get_session
+from services.profile_cache import profile_cache
+from services.structured_logging import get_logger
+from config import Config
+
+log = get_logger('facebook')
 
 @facebook_bp.route('/pages', methods=['GET'])
 def get_pages():
@@ -30,7 +38,9 @@ def connect_page():
     page = FacebookPage.query.filter_by(page_id=data['page_id']).first()
     
     if page:
-        # Mettre à jour
+        # Mettre à jour (l'ancien token ne doit plus être résolu)
+        if page.access_token != data['access_token']:
+            page_identity_cache.invalidate(page.access_token)
         page.access_token = data['access_token']
         page.page_name = data.get('page_name', page.page_name)
         page.is_active = True
@@ -46,8 +56,13 @@ def connect_page():
         db.session.add(page)
         message = 'Page connectée avec succès'
     
+    page_registry.invalidate()
     db.session.commit()
     
+    # Mettre en cache l'ID Graph de la page (détection des échos sans /me)
+    page_identity_cache.invalidate(page.access_token)
+    page_identity_cache.resolve(page.access_token, fallback=page.page_id)
+    
     return jsonify({
         'message': message,
         'page': {
@@ -61,7 +76,12 @@ def connect_page():
 def disconnect_page(page_id):
     """Déconnecter une page"""
     page = FacebookPage.query.get_or_404(page_id)
+    page_identity_cache.invalidate(page.access_token)
+    # Les règles propres à la page disparaissent avec elle
+    AutoResponse.query.filter_by(page_id=page.id).delete()
+    rule_cache.invalidate(page.id)
     db.session.delete(page)
+    page_registry.invalidate()
     db.session.commit()
     return jsonify({'message': 'Page déconnectée'}), 200
 
@@ -70,12 +90,24 @@ def toggle_page(page_id):
     """Activer/désactiver une page"""
     page = FacebookPage.query.get_or_404(page_id)
     page.is_active = not page.is_active
+    page_registry.invalidate()
     db.session.commit()
     return jsonify({
         'message': 'Statut modifié',
         'is_active': page.is_active
     }), 200
 
+@facebook_bp.route('/profile-cache/stats', methods=['GET'])
+def profile_cache_stats():
+    """Statistiques du cache des profils expéditeurs (hits/misses)"""
+    return jsonify(profile_cache.stats()), 200
+
+@facebook_bp.route('/profile-cache', methods=['DELETE'])
+def clear_profile_cache():
+    """Vider le cache mémoire des profils expéditeurs"""
+    profile_cache.invalidate()
+    return jsonify({'message': 'Cache des profils vidé'}), 200
+
 @facebook_bp.route('/test-connection', methods=['POST'])
 def test_connection():
     """Tester la connexion Facebook avec diagnostic complet"""
@@ -88,23 +120,21 @@ def test_connection():
     try:
         fb_service = FacebookService(access_token)
         
-        # Test 1: Récupérer les infos de la page
-        response = requests.get(
-            f'https://graph.facebook.com/v18.0/me',
-            params={'access_token': access_token, 'fields': 'id,name'}
-        )
+        # Test 1 + Test 2: infos de la page et permissions en une seule requête batch
+        page_info, permissions_result = fb_service.batch([
+            ('GET', 'me?fields=id,name', None),
+            ('GET', 'me/permissions', None)
+        ])
         
-        if response.status_code != 200:
+        if 'error' in page_info:
             return jsonify({
                 'success': False,
                 'error': 'Token invalide',
-                'details': response.json()
+                'details': page_info
             }), 400
         
-        page_info = response.json()
-        
-        # Test 2: Vérifier les permissions
-        perms = fb_service.test_permissions()
+        # Vérifier les permissions
+        perms = fb_service.test_permissions(permissions_result)
         
         return jsonify({
             'success': True,
@@ -133,14 +163,7 @@ def subscribe_webhooks(page_id):
     try:
         page = FacebookPage.query.get_or_404(page_id)
         
-        print("\n" + "="*60)
-        print("📡 ABONNEMENT AUX WEBHOOKS")
-        print("="*60)
-        print(f"Page: {page.page_name}")
-        print(f"Page ID: {page.page_id}")
-        print("="*60)
-        
-        url = f'https://graph.facebook.com/v18.0/{page.page_id}/subscribed_apps'
+        url = f'{Config.FACEBOOK_GRAPH_URL}/{Config.FACEBOOK_GRAPH_VERSION}/{page.page_id}/subscribed_apps'
         
         # ✅ CHAMPS VALIDES - SANS message_echoes pour éviter doublons
         subscribed_fields = [
@@ -159,16 +182,16 @@ def subscribe_webhooks(page_id):
             'access_token': page.access_token
         }
         
-        print(f"\nChamps d'abonnement: {subscribed_fields}")
-        print(f"\nEnvoi requête POST vers: {url}")
-        print(f"Payload: {payload}")
-        
-        response = requests.post(url, data=payload)
+        response = get_session().post(url, data=payload)
         result = response.json()
         
-        print(f"\nStatut: {response.status_code}")
-        print(f"Réponse: {result}")
-        print("="*60 + "\n")
+        # Le payload contient le token de la page: seuls les champs sont journalisés
+        log.info('Abonnement aux webhooks', extra={
+            'page_id': page.page_id,
+            'fields': payload['subscribed_fields'],
+            'status': response.status_code,
+            'result': result
+        })
         
         if response.status_code == 200 and result.get('success'):
             return jsonify({
@@ -187,9 +210,7 @@ def subscribe_webhooks(page_id):
             }), 400
     
     except Exception as e:
-        print(f"\n❌ Erreur abonnement webhooks: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception('Erreur abonnement webhooks')
         
         return jsonify({
             'success': False,
@@ -202,9 +223,9 @@ def check_webhook_status(page_id):
     try:
         page = FacebookPage.query.get_or_404(page_id)
         
-        url = f'https://graph.facebook.com/v18.0/{page.page_id}/subscribed_apps'
+        url = f'{Config.FACEBOOK_GRAPH_URL}/{Config.FACEBOOK_GRAPH_VERSION}/{page.page_id}/subscribed_apps'
         
-        response = requests.get(url, params={
+        response = get_session().get(url, params={
             'access_token': page.access_token
         })
         
@@ -4,11 +4,35 @@ Compatible avec votre structure existante
 """
 
 from flask import Blueprint, request, jsonify
+from sqlalchemy import func
 from services.response_service import ResponseService
-from models import Message, Comment, db
+from services.nlp_annotations import nlp_annotator
+from services.nlp_rollups import nlp_rollups
+from services.intent_classifier import DEFAULT_INTENT, intent_registry, parse_keywords
+from models import Message, Comment, IntentPattern, db
 
 nlp_bp = Blueprint('nlp', __name__)
 
+
+def _period_from_args():
+    """
+    Période demandée: ?days=N (défaut 7) ou ?start=AAAA-MM-JJ&end=AAAA-MM-JJ (inclus)
+    
+    Returns:
+        (début, fin exclue ou None, libellé)
+    """
+    from datetime import datetime, timedelta
+    
+    start = request.args.get('start')
+    if start:
+        start_date = datetime.strptime(start, '%Y-%m-%d')
+        end = request.args.get('end')
+        end_date = datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1) if end else None
+        return start_date, end_date, f"{start} → {end or 'maintenant'}"
+    
+    days = request.args.get('days', 7, type=int)
+    return datetime.utcnow() - timedelta(days=days), None, f'{days} jours'
+
 @nlp_bp.route('/analyze', methods=['POST'])
 def analyze_text():
     """
@@ -39,11 +63,12 @@ def test_response():
     """
     Tester une réponse pour un message donné
     POST /api/nlp/test-response
-    Body: {"message": "Message de test", "type": "message"}
+    Body: {"message": "Message de test", "type": "message", "page_id": 1}
     """
     data = request.get_json()
     message = data.get('message', '')
     message_type = data.get('type', 'both')
+    page_id = data.get('page_id')
     
     if not message:
         return jsonify({'error': 'Message requis'}), 400
@@ -53,7 +78,7 @@ def test_response():
         analysis = ResponseService.analyze_message_details(message)
         
         # Trouver la réponse
-        response_text = ResponseService.find_matching_response(message, message_type)
+        response_text = ResponseService.find_matching_response(message, message_type, page_id)
         
         if not response_text:
             response_text = ResponseService.get_default_response()
@@ -65,7 +90,8 @@ def test_response():
             'success': True,
             'input': {
                 'message': message,
-                'type': message_type
+                'type': message_type,
+                'page_id': page_id
             },
             'analysis': analysis,
             'response': {
@@ -101,7 +127,9 @@ def get_conversation_insights():
             messages_data.extend([{
                 'message_text': m.message_text,
                 'type': 'message',
-                'timestamp': m.timestamp.isoformat()
+                'timestamp': m.timestamp.isoformat(),
+                'intent': m.intent,
+                'sentiment_score': m.sentiment_score
             } for m in messages if m.message_text])
         
         # Récupérer les commentaires
@@ -113,7 +141,9 @@ def get_conversation_insights():
             messages_data.extend([{
                 'message_text': c.comment_text,
                 'type': 'comment',
-                'timestamp': c.timestamp.isoformat()
+                'timestamp': c.timestamp.isoformat(),
+                'intent': c.intent,
+                'sentiment_score': c.sentiment_score
             } for c in comments if c.comment_text])
         
         # Analyser les conversations
@@ -136,63 +166,45 @@ def get_sentiment_stats():
     """
     Statistiques de sentiment sur les messages/commentaires
     GET /api/nlp/sentiment-stats?days=7
+    GET /api/nlp/sentiment-stats?start=2024-01-01&end=2024-03-31&page_id=1
     """
-    from datetime import datetime, timedelta
-    
-    days = request.args.get('days', 7, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
+    try:
+        start_date, end_date, period = _period_from_args()
+    except ValueError:
+        return jsonify({'error': 'Dates invalides (format AAAA-MM-JJ)'}), 400
+    page_id = request.args.get('page_id', type=int)
     
     try:
-        # Messages récents
-        messages = Message.query.filter(
-            Message.timestamp >= start_date
-        ).all()
-        
-        # Commentaires récents
-        comments = Comment.query.filter(
-            Comment.timestamp >= start_date
-        ).all()
-        
-        # Analyser les sentiments
+        # Somme des tranches d'agrégats (pas de parcours des lignes)
+        totals = nlp_rollups.totals(start_date, end_date, page_id=page_id)
         sentiment_counts = {
             'positif': 0,
             'negatif': 0,
             'neutre': 0
         }
+        for sentiment, count in totals['sentiments'].items():
+            sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + count
         
+        # Éléments récents: 20 lignes par table via l'index sur timestamp
         all_items = []
-        
-        for msg in messages:
-            if msg.message_text:
-                try:
-                    analysis = ResponseService.analyze_message_details(msg.message_text)
-                    sentiment = analysis['sentiment']['sentiment']
-                    sentiment_counts[sentiment] += 1
-                    all_items.append({
-                        'type': 'message',
-                        'text': msg.message_text[:50] + '...' if len(msg.message_text) > 50 else msg.message_text,
-                        'sentiment': sentiment,
-                        'score': analysis['sentiment']['score'],
-                        'timestamp': msg.timestamp.isoformat()
-                    })
-                except:
-                    continue
-        
-        for comment in comments:
-            if comment.comment_text:
-                try:
-                    analysis = ResponseService.analyze_message_details(comment.comment_text)
-                    sentiment = analysis['sentiment']['sentiment']
-                    sentiment_counts[sentiment] += 1
-                    all_items.append({
-                        'type': 'comment',
-                        'text': comment.comment_text[:50] + '...' if len(comment.comment_text) > 50 else comment.comment_text,
-                        'sentiment': sentiment,
-                        'score': analysis['sentiment']['score'],
-                        'timestamp': comment.timestamp.isoformat()
-                    })
-                except:
-                    continue
+        for model, text_column, item_type in ((Message, Message.message_text, 'message'),
+                                              (Comment, Comment.comment_text, 'comment')):
+            recent = db.session.query(text_column, model.sentiment, model.sentiment_score, model.timestamp).filter(
+                model.timestamp >= start_date,
+                model.sentiment.isnot(None)
+            )
+            if end_date is not None:
+                recent = recent.filter(model.timestamp < end_date)
+            if page_id is not None:
+                recent = recent.filter(model.page_id == page_id)
+            recent = recent.order_by(model.timestamp.desc()).limit(20).all()
+            all_items.extend({
+                'type': item_type,
+                'text': text[:50] + '...' if len(text) > 50 else text,
+                'sentiment': sentiment,
+                'score': score,
+                'timestamp': timestamp.isoformat()
+            } for text, sentiment, score, timestamp in recent)
         
         total = sum(sentiment_counts.values())
         
@@ -204,7 +216,7 @@ def get_sentiment_stats():
         
         return jsonify({
             'success': True,
-            'period': f'{days} jours',
+            'period': period,
             'total_analyzed': total,
             'sentiment_counts': sentiment_counts,
             'sentiment_percentages': percentages,
@@ -226,59 +238,36 @@ def get_intents_stats():
     """
     Statistiques sur les intentions détectées
     GET /api/nlp/intents-stats?days=7
+    GET /api/nlp/intents-stats?start=2024-01-01&end=2024-03-31&page_id=1
     """
-    from datetime import datetime, timedelta
     from collections import Counter
     
-    days = request.args.get('days', 7, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
+    try:
+        start_date, end_date, period = _period_from_args()
+    except ValueError:
+        return jsonify({'error': 'Dates invalides (format AAAA-MM-JJ)'}), 400
+    page_id = request.args.get('page_id', type=int)
     
     try:
-        # Récupérer les messages et commentaires récents
-        messages = Message.query.filter(
-            Message.timestamp >= start_date
-        ).all()
-        
-        comments = Comment.query.filter(
-            Comment.timestamp >= start_date
-        ).all()
-        
-        # Analyser les intentions
-        intents = []
-        
-        for msg in messages:
-            if msg.message_text:
-                try:
-                    analysis = ResponseService.analyze_message_details(msg.message_text)
-                    intents.append(analysis['intent'])
-                except:
-                    continue
+        # Somme des tranches d'agrégats (pas de parcours des lignes)
+        intent_counts = Counter(nlp_rollups.totals(start_date, end_date, page_id=page_id)['intents'])
         
-        for comment in comments:
-            if comment.comment_text:
-                try:
-                    analysis = ResponseService.analyze_message_details(comment.comment_text)
-                    intents.append(analysis['intent'])
-                except:
-                    continue
-        
-        # Compter les intentions
-        intent_counts = Counter(intents)
+        total = sum(intent_counts.values())
         
         # Formater les résultats
         intent_stats = [
             {
                 'intent': intent,
                 'count': count,
-                'percentage': round((count / len(intents) * 100) if intents else 0, 1)
+                'percentage': round((count / total * 100) if total else 0, 1)
             }
             for intent, count in intent_counts.most_common()
         ]
         
         return jsonify({
             'success': True,
-            'period': f'{days} jours',
-            'total_analyzed': len(intents),
+            'period': period,
+            'total_analyzed': total,
             'intent_stats': intent_stats,
             'top_3_intents': [item['intent'] for item in intent_stats[:3]]
         }), 200
@@ -289,6 +278,108 @@ def get_intents_stats():
         }), 500
 
 
+def _intent_error(data, partial=False):
+    """Message d'erreur si le nom ou les mots-clés d'une intention sont invalides"""
+    name = (data.get('name') or '').strip()
+    if not partial or 'name' in data:
+        if not name:
+            return 'Nom requis'
+        if name == DEFAULT_INTENT:
+            return f"Nom réservé: {DEFAULT_INTENT}"
+    if (not partial or 'keywords' in data) and not parse_keywords(data.get('keywords')):
+        return 'Mots-clés requis (séparés par des virgules)'
+    return None
+
+
+@nlp_bp.route('/intents', methods=['GET'])
+def get_intents():
+    """
+    Intentions reconnues: intégrées et définies en base (par priorité)
+    GET /api/nlp/intents
+    """
+    intents = IntentPattern.query.order_by(IntentPattern.priority.desc(), IntentPattern.id).all()
+    return jsonify({
+        'success': True,
+        'builtin': list(ResponseService.chatbot.intent_patterns),
+        'custom': [{
+            'id': i.id,
+            'name': i.name,
+            'keywords': i.keywords,
+            'priority': i.priority,
+            'is_active': i.is_active,
+            'created_at': i.created_at.isoformat()
+        } for i in intents],
+        'registry': intent_registry.stats()
+    }), 200
+
+
+@nlp_bp.route('/intents', methods=['POST'])
+def create_intent():
+    """
+    Créer une intention (prioritaire sur les intentions intégrées)
+    POST /api/nlp/intents
+    Body: {"name": "livraison", "keywords": "livraison, colis, expédition", "priority": 0}
+    """
+    data = request.get_json()
+    
+    error = _intent_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+    if IntentPattern.query.filter_by(name=data['name'].strip()).first():
+        return jsonify({'error': f"Intention déjà définie: {data['name'].strip()}"}), 409
+    
+    intent = IntentPattern(
+        name=data['name'].strip(),
+        keywords=data['keywords'],
+        priority=data.get('priority', 0),
+        is_active=data.get('is_active', True)
+    )
+    
+    db.session.add(intent)
+    intent_registry.invalidate()
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Intention créée avec succès',
+        'id': intent.id
+    }), 201
+
+
+@nlp_bp.route('/intents/<int:intent_id>', methods=['PUT'])
+def update_intent(intent_id):
+    """Mettre à jour une intention"""
+    intent = IntentPattern.query.get_or_404(intent_id)
+    data = request.get_json()
+    
+    error = _intent_error(data, partial=True)
+    if error:
+        return jsonify({'error': error}), 400
+    if 'name' in data:
+        name = data['name'].strip()
+        if IntentPattern.query.filter(IntentPattern.name == name, IntentPattern.id != intent_id).first():
+            return jsonify({'error': f'Intention déjà définie: {name}'}), 409
+        intent.name = name
+    
+    intent.keywords = data.get('keywords', intent.keywords)
+    intent.priority = data.get('priority', intent.priority)
+    intent.is_active = data.get('is_active', intent.is_active)
+    
+    intent_registry.invalidate()
+    db.session.commit()
+    
+    return jsonify({'message': 'Intention mise à jour avec succès'}), 200
+
+
+@nlp_bp.route('/intents/<int:intent_id>', methods=['DELETE'])
+def delete_intent(intent_id):
+    """Supprimer une intention"""
+    intent = IntentPattern.query.get_or_404(intent_id)
+    db.session.delete(intent)
+    intent_registry.invalidate()
+    db.session.commit()
+    return jsonify({'message': 'Intention supprimée avec succès'}), 200
+
+
 @nlp_bp.route('/response-quality', methods=['GET'])
 def get_response_quality():
     """
@@ -301,34 +392,28 @@ def get_response_quality():
     start_date = datetime.utcnow() - timedelta(days=days)
     
     try:
-        # Messages automatiques
-        auto_messages = Message.query.filter(
+        # Réponses automatiques
+        auto_messages = db.session.query(func.count(Message.id)).filter(
             Message.timestamp >= start_date,
             Message.is_automated == True
-        ).all()
+        ).scalar()
         
-        # Commentaires automatiques
-        auto_comments = Comment.query.filter(
+        auto_comments = db.session.query(func.count(Comment.id)).filter(
             Comment.timestamp >= start_date,
             Comment.is_automated == True
-        ).all()
+        ).scalar()
         
-        total_auto = len(auto_messages) + len(auto_comments)
+        total_auto = auto_messages + auto_comments
         
-        # Analyser la satisfaction (basée sur les réponses reçues)
-        positive_responses = 0
-        negative_responses = 0
+        # Analyser la satisfaction (sentiment des réponses envoyées aux messages)
+        response_sentiments = dict(db.session.query(Message.response_sentiment, func.count(Message.id)).filter(
+            Message.timestamp >= start_date,
+            Message.is_automated == True,
+            Message.response_sentiment.isnot(None)
+        ).group_by(Message.response_sentiment).all())
         
-        for msg in auto_messages:
-            if msg.response_sent:
-                try:
-                    analysis = ResponseService.analyze_message_details(msg.response_sent)
-                    if analysis['sentiment']['sentiment'] == 'positif':
-                        positive_responses += 1
-                    elif analysis['sentiment']['sentiment'] == 'negatif':
-                        negative_responses += 1
-                except:
-                    continue
+        positive_responses = response_sentiments.get('positif', 0)
+        negative_responses = response_sentiments.get('negatif', 0)
         
         satisfaction_rate = round(
             (positive_responses / total_auto * 100) if total_auto > 0 else 0,
@@ -348,4 +433,28 @@ def get_response_quality():
     except Exception as e:
         return jsonify({
             'error': f'Erreur d\'évaluation: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@nlp_bp.route('/reanalyze', methods=['POST'])
+def reanalyze():
+    """
+    Recalculer l'analyse NLP des messages/commentaires obsolètes
+    (règles de NLPChatbot modifiées, ou lignes antérieures à l'analyse)
+    POST /api/nlp/reanalyze?limit=1000
+    """
+    limit = request.args.get('limit', 1000, type=int)
+    
+    try:
+        done = nlp_annotator.reanalyze(limit=limit)
+        return jsonify({
+            'success': True,
+            'analyzer_version': nlp_annotator.version,
+            'reanalyzed': done,
+            'remaining': nlp_annotator.pending()
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'error': f'Erreur d\'analyse: {str(e)}'
+        }), 500
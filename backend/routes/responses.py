@@ -1,18 +1,33 @@
 """
 Routes pour gérer les réponses automatiques
 """
-from flask import request, jsonify
+import json
+from flask import request, jsonify, Response, stream_with_context
 from routes import responses_bp  # ✅ Importer depuis __init__.py
-from models import db, AutoResponse, Message, Comment
+from datetime import datetime
+from sqlalchemy import func
+from models import db, AutoResponse, FacebookPage, Message, Comment, OutboundReply
+from services.rule_snapshot import rule_cache
+from services.outbound_dispatcher import outbound_dispatcher
+from services.stats_counters import stats_counters
+from services.history import (FILTER_COLUMNS, InvalidCursor, fetch_page, history_query,
+                              serialize, stream_rows)
 
 @responses_bp.route('', methods=['GET', 'OPTIONS'])
 @responses_bp.route('/', methods=['GET', 'OPTIONS'])
 def get_responses():
-    """Récupérer toutes les réponses"""
+    """
+    Récupérer toutes les réponses
+    GET /api/responses?page_id=1 (règles de la page + règles globales)
+    """
     if request.method == 'OPTIONS':
         return '', 200
     
-    responses = AutoResponse.query.order_by(AutoResponse.priority.desc()).all()
+    query = AutoResponse.query
+    page_id = request.args.get('page_id', type=int)
+    if page_id is not None:
+        query = query.filter((AutoResponse.page_id == page_id) | AutoResponse.page_id.is_(None))
+    responses = query.order_by(AutoResponse.priority.desc()).all()
     return jsonify([{
         'id': r.id,
         'trigger_keyword': r.trigger_keyword,
@@ -20,24 +35,37 @@ def get_responses():
         'response_type': r.response_type,
         'is_active': r.is_active,
         'priority': r.priority,
+        'page_id': r.page_id,
         'created_at': r.created_at.isoformat()
     } for r in responses])
 
+def _page_error(page_id):
+    """Message d'erreur si page_id (None = règle globale) ne désigne aucune page"""
+    if page_id is not None and db.session.get(FacebookPage, page_id) is None:
+        return f'Page introuvable: {page_id}'
+    return None
+
 @responses_bp.route('', methods=['POST'])
 @responses_bp.route('/', methods=['POST'])
 def create_response():
-    """Créer une nouvelle réponse"""
+    """Créer une nouvelle réponse (page_id absent ou null = règle globale)"""
     data = request.get_json()
     
+    error = _page_error(data.get('page_id'))
+    if error:
+        return jsonify({'error': error}), 400
+    
     new_response = AutoResponse(
         trigger_keyword=data['trigger_keyword'],
         response_text=data['response_text'],
         response_type=data.get('response_type', 'both'),
         priority=data.get('priority', 0),
-        is_active=data.get('is_active', True)
+        is_active=data.get('is_active', True),
+        page_id=data.get('page_id')
     )
     
     db.session.add(new_response)
+    rule_cache.invalidate(new_response.page_id)
     db.session.commit()
     
     return jsonify({
@@ -51,12 +79,22 @@ def update_response(response_id):
     response = AutoResponse.query.get_or_404(response_id)
     data = request.get_json()
     
+    previous_page_id = response.page_id
+    if 'page_id' in data:
+        error = _page_error(data['page_id'])
+        if error:
+            return jsonify({'error': error}), 400
+        response.page_id = data['page_id']
+    
     response.trigger_keyword = data.get('trigger_keyword', response.trigger_keyword)
     response.response_text = data.get('response_text', response.response_text)
     response.response_type = data.get('response_type', response.response_type)
     response.is_active = data.get('is_active', response.is_active)
     response.priority = data.get('priority', response.priority)
     
+    rule_cache.invalidate(response.page_id)
+    if previous_page_id != response.page_id:
+        rule_cache.invalidate(previous_page_id)
     db.session.commit()
     
     return jsonify({'message': 'Réponse mise à jour avec succès'}), 200
@@ -66,59 +104,147 @@ def delete_response(response_id):
     """Supprimer une réponse"""
     response = AutoResponse.query.get_or_404(response_id)
     db.session.delete(response)
+    rule_cache.invalidate(response.page_id)
     db.session.commit()
     return jsonify({'message': 'Réponse supprimée avec succès'}), 200
 
+# Taille maximale d'une page JSON (au-delà: ?format=ndjson)
+MAX_PAGE_SIZE = 1000
+
+def _history_filters(channel):
+    """Filtres de l'historique depuis la query string"""
+    filters = {name: request.args.get(name) for name in FILTER_COLUMNS[channel]}
+    filters['page_id'] = request.args.get('page_id', type=int)
+    
+    automated = request.args.get('automated')
+    if automated is not None:
+        filters['automated'] = automated.lower() in ('1', 'true', 'yes')
+    
+    for name in ('since', 'until'):
+        value = request.args.get(name)
+        if value:
+            filters[name] = datetime.fromisoformat(value)
+    return filters
+
+def _history_response(channel):
+    """
+    Historique paginé par curseur (JSON) ou en flux (NDJSON)
+    
+    JSON: liste au format habituel, curseur suivant dans l'en-tête X-Next-Cursor
+    NDJSON (?format=ndjson): une ligne JSON par élément, toute la sélection
+    """
+    try:
+        filters = _history_filters(channel)
+    except ValueError:
+        return jsonify({'error': 'Dates invalides (format ISO 8601)'}), 400
+    cursor = request.args.get('cursor')
+    
+    wants_ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+    
+    try:
+        if wants_ndjson:
+            statement = history_query(channel, filters, cursor)
+            limit = request.args.get('limit', type=int)
+            if limit:
+                statement = statement.limit(limit)
+            
+            def generate():
+                for row in stream_rows(statement):
+                    yield json.dumps(serialize(row), ensure_ascii=False) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_PAGE_SIZE)
+        items, next_cursor = fetch_page(channel, filters, cursor, limit)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
 @responses_bp.route('/messages', methods=['GET'])
 def get_messages():
-    """Récupérer l'historique des messages"""
-    limit = request.args.get('limit', 100, type=int)
-    messages = Message.query.order_by(Message.timestamp.desc()).limit(limit).all()
-    
-    return jsonify([{
-        'id': m.id,
-        'message_id': m.message_id,
-        'sender_id': m.sender_id,
-        'sender_name': m.sender_name,
-        'message_text': m.message_text,
-        'response_sent': m.response_sent,
-        'is_automated': m.is_automated,
-        'timestamp': m.timestamp.isoformat()
-    } for m in messages])
+    """
+    Récupérer l'historique des messages
+    GET /api/responses/messages?limit=100&cursor=...&page_id=1&sender_id=...&automated=true&since=2024-01-01
+    """
+    return _history_response('message')
 
 @responses_bp.route('/comments', methods=['GET'])
 def get_comments():
-    """Récupérer l'historique des commentaires"""
+    """
+    Récupérer l'historique des commentaires
+    GET /api/responses/comments?limit=100&cursor=...&page_id=1&user_id=...&post_id=...&automated=true
+    """
+    return _history_response('comment')
+
+@responses_bp.route('/deliveries', methods=['GET'])
+def get_deliveries():
+    """File d'envoi des réponses: en attente, en cours et en échec"""
     limit = request.args.get('limit', 100, type=int)
-    comments = Comment.query.order_by(Comment.timestamp.desc()).limit(limit).all()
+    statuses = request.args.get('status', 'pending,sending,failed').split(',')
     
-    return jsonify([{
-        'id': c.id,
-        'comment_id': c.comment_id,
-        'post_id': c.post_id,
-        'user_id': c.user_id,
-        'user_name': c.user_name,
-        'comment_text': c.comment_text,
-        'response_sent': c.response_sent,
-        'is_automated': c.is_automated,
-        'timestamp': c.timestamp.isoformat()
-    } for c in comments])
+    counts = dict(
+        db.session.query(OutboundReply.status, func.count(OutboundReply.id))
+        .group_by(OutboundReply.status).all()
+    )
+    oldest = db.session.query(func.min(OutboundReply.created_at)).filter(
+        OutboundReply.status == 'pending'
+    ).scalar()
+    
+    deliveries = OutboundReply.query.filter(
+        OutboundReply.status.in_(statuses)
+    ).order_by(OutboundReply.next_attempt_at).limit(limit).all()
+    
+    return jsonify({
+        'counts': {status: counts.get(status, 0) for status in ('pending', 'sending', 'sent', 'failed')},
+        'oldest_pending_seconds': (datetime.utcnow() - oldest).total_seconds() if oldest else None,
+        'deliveries': [{
+            'id': d.id,
+            'channel': d.channel,
+            'recipient_id': d.recipient_id,
+            'response_text': d.response_text,
+            'status': d.status,
+            'attempts': d.attempts,
+            'next_attempt_at': d.next_attempt_at.isoformat() if d.next_attempt_at else None,
+            'last_error_code': d.last_error_code,
+            'last_error': d.last_error,
+            'message_id': d.message_id,
+            'comment_id': d.comment_id,
+            'created_at': d.created_at.isoformat()
+        } for d in deliveries]
+    })
+
+@responses_bp.route('/deliveries/<int:delivery_id>/retry', methods=['POST'])
+def retry_delivery(delivery_id):
+    """Relancer une réponse en échec (ou en attente dont l'échéance est passée)"""
+    delivery = OutboundReply.query.get_or_404(delivery_id)
+    if not outbound_dispatcher.can_retry(delivery):
+        return jsonify({'error': 'Seules les réponses en échec ou en attente échue peuvent être relancées'}), 400
+    
+    outbound_dispatcher.retry_now(delivery)
+    db.session.commit()
+    outbound_dispatcher.submit(delivery)
+    
+    return jsonify({'message': 'Réponse remise en file d\'envoi'}), 200
 
 @responses_bp.route('/stats', methods=['GET'])
 def get_stats():
-    """Obtenir les statistiques"""
-    total_responses = AutoResponse.query.count()
-    active_responses = AutoResponse.query.filter_by(is_active=True).count()
-    total_messages = Message.query.count()
-    total_comments = Comment.query.count()
-    automated_messages = Message.query.filter_by(is_automated=True).count()
-    automated_comments = Comment.query.filter_by(is_automated=True).count()
+    """Obtenir les statistiques (compteurs maintenus à chaque événement)"""
+    total_responses, active_responses = db.session.query(
+        func.count(AutoResponse.id),
+        func.count(AutoResponse.id).filter(AutoResponse.is_active == True)
+    ).one()
+    counters = stats_counters.totals()
     
     return jsonify({
         'total_responses': total_responses,
         'active_responses': active_responses,
-        'total_messages': total_messages,
-        'total_comments': total_comments,
-        'automated_messages': automated_messages,
-        'automated_comments': automated_comments
+        'total_messages': counters['total_messages'],
+        'total_comments': counters['total_comments'],
+        'automated_messages': counters['automated_messages'],
+        'automated_comments': counters['automated_comments']
     })
\ No newline at end of file
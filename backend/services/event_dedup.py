@@ -0,0 +1,189 @@
+"""
+Déduplication des événements webhook (renvois de Facebook)
+
+Un seul INSERT ... ON CONFLICT DO NOTHING réserve l'événement: le worker
+qui insère la ligne le traite, les autres l'ignorent, sans fenêtre de
+course entre la vérification et l'insertion. Un LRU en mémoire des IDs
+récents évite la base pour les renvois rapprochés.
+
+Rétention: Facebook renvoie un événement non acquitté pendant 36 heures au
+plus. Les réservations plus anciennes que DEDUP_RETENTION_HOURS (72 h par
+défaut) ne servent plus et sont supprimées par un thread de fond toutes les
+DEDUP_PURGE_INTERVAL secondes, ou par la commande `flask dedup-purge`.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import click
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from models import db, ProcessedEvent
+from services.structured_logging import get_logger
+
+log = get_logger('dedup')
+
+_DIALECT_INSERTS = {
+    'postgresql': pg_insert,
+    'sqlite': sqlite_insert
+}
+
+
+class EventDeduplicator:
+    """Réservation atomique des événements + LRU des IDs récents"""
+
+    def __init__(self, max_recent: int = 10000):
+        self.app = None
+        self.max_recent = max_recent
+        self.retention_hours = 72
+        self.purge_interval = 3600.0
+        self._recent: 'OrderedDict[str, None]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.memory_hits = 0
+        self.db_conflicts = 0
+        self.claimed = 0
+        self.purged = 0
+        self.last_purge: Optional[datetime] = None
+
+    def _remember(self, key: str):
+        with self._lock:
+            self._recent[key] = None
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_recent:
+                self._recent.popitem(last=False)
+
+    def _insert(self, key: str) -> bool:
+        """INSERT ... ON CONFLICT DO NOTHING; True si la ligne a été insérée"""
+        insert = _DIALECT_INSERTS.get(db.engine.dialect.name)
+
+        if insert is not None:
+            statement = insert(ProcessedEvent).values(event_key=key).on_conflict_do_nothing(
+                index_elements=['event_key']
+            )
+            inserted = db.session.execute(statement).rowcount == 1
+            db.session.commit()
+            return inserted
+
+        # Autres bases: insertion simple, le conflit remonte en IntegrityError
+        try:
+            db.session.add(ProcessedEvent(event_key=key))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    def claim(self, kind: str, event_id) -> bool:
+        """
+        Réserver un événement
+
+        Returns:
+            True si ce worker doit le traiter, False s'il est déjà traité
+        """
+        key = f'{kind}:{event_id}'
+
+        with self._lock:
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                self.memory_hits += 1
+                return False
+
+        inserted = self._insert(key)
+        self._remember(key)
+
+        with self._lock:
+            if inserted:
+                self.claimed += 1
+            else:
+                self.db_conflicts += 1
+        return inserted
+
+    def release(self, kind: str, event_id):
+        """Libérer un événement non traité (erreur) pour que le renvoi soit accepté"""
+        key = f'{kind}:{event_id}'
+        with self._lock:
+            self._recent.pop(key, None)
+        try:
+            ProcessedEvent.query.filter_by(event_key=key).delete()
+            db.session.commit()
+        except Exception as e:
+            log.warning('Impossible de libérer l\'événement %s: %s', key, e)
+            db.session.rollback()
+
+    def purge(self, older_than_hours: Optional[int] = None) -> int:
+        """Supprimer les réservations plus anciennes que la rétention; renvoie le nombre supprimé"""
+        hours = self.retention_hours if older_than_hours is None else older_than_hours
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        deleted = db.session.execute(
+            delete(ProcessedEvent).where(ProcessedEvent.created_at < cutoff)
+        ).rowcount
+        db.session.commit()
+        with self._lock:
+            self.purged += deleted
+            self.last_purge = datetime.utcnow()
+        return deleted
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'recent_ids': len(self._recent),
+                'max_recent': self.max_recent,
+                'memory_hits': self.memory_hits,
+                'db_conflicts': self.db_conflicts,
+                'claimed': self.claimed,
+                'purged': self.purged,
+                'last_purge': self.last_purge.isoformat() if self.last_purge else None,
+                'retention_hours': self.retention_hours
+            }
+
+    # ---------- Purge en arrière-plan ----------
+
+    def init_app(self, app):
+        self.app = app
+        self.retention_hours = app.config.get('DEDUP_RETENTION_HOURS', 72)
+        self.purge_interval = app.config.get('DEDUP_PURGE_INTERVAL', 3600.0)
+
+        if self.purge_interval > 0:
+            # Démarrage au premier appel HTTP (après le fork gunicorn), pas dans les scripts
+            app.before_request(self._ensure_started)
+
+        @app.cli.command('dedup-purge')
+        @click.option('--hours', type=int, default=None, help='Rétention en heures (défaut: DEDUP_RETENTION_HOURS)')
+        def dedup_purge(hours):
+            """Supprimer les événements réservés au-delà de la fenêtre de renvoi"""
+            deleted = self.purge(hours)
+            click.echo(f'✅ {deleted} événement(s) réservé(s) supprimé(s)')
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() or self.app is None:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='dedup-purge', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.purge()
+                except Exception:
+                    log.exception('Purge des événements réservés impossible')
+                    db.session.rollback()
+            time.sleep(self.purge_interval)
+
+
+event_dedup = EventDeduplicator(max_recent=Config.DEDUP_RECENT_SIZE)
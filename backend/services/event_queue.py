@@ -0,0 +1,153 @@
+"""
+File d'attente des événements webhook - traitement asynchrone
+
+Le webhook dépose les entrées brutes dans une file bornée en mémoire et
+répond immédiatement à Facebook ; un pool de consommateurs exécute ensuite
+le traitement (base de données, NLP, appels Graph) dans un contexte Flask.
+
+La file n'est pas persistée: une entrée acquittée (200) mais pas encore
+traitée est perdue si le processus redémarre, et Facebook ne la renvoie
+pas. WEBHOOK_ASYNC reste donc désactivé par défaut.
+
+Le contexte de l'appelant (contextvars, dont le request_id de log_context)
+est capturé à la mise en file et restauré pour le traitement; le contexte
+d'application Flask est poussé à l'intérieur, pour ne pas dépendre de
+celui de la requête déjà terminée.
+"""
+
+import contextvars
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List
+
+from services.structured_logging import get_logger
+
+log = get_logger('event_queue')
+
+
+class EventQueue:
+    """File bornée d'événements webhook avec pool de consommateurs"""
+
+    def __init__(self, app, handler: Callable[[Dict], None],
+                 max_size: int = 1000, workers: int = 4):
+        self.app = app
+        self.handler = handler
+        self.max_size = max_size
+        self.workers = workers
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+        # Métriques
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+        self._total_processing = 0.0
+
+    def _ensure_started(self):
+        """Démarrer les consommateurs (une fois par processus, après le fork gunicorn)"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            # Après un fork, les threads du parent n'existent plus
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._threads = []
+
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    name=f'webhook-worker-{i}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+            self._pid = os.getpid()
+
+    def enqueue(self, entry: Dict) -> bool:
+        """
+        Ajouter une entrée webhook à la file
+
+        Returns:
+            False si la file est pleine (l'appelant doit traiter lui-même)
+        """
+        self._ensure_started()
+
+        try:
+            self._queue.put_nowait((time.monotonic(), contextvars.copy_context(), entry))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _worker(self):
+        """Boucle d'un consommateur"""
+        while True:
+            enqueued_at, context, entry = self._queue.get()
+            started_at = time.monotonic()
+            lag = started_at - enqueued_at
+
+            failed = False
+            try:
+                context.run(self._process, entry)
+            except Exception:
+                failed = True
+                log.exception('Erreur worker webhook')
+            finally:
+                duration = time.monotonic() - started_at
+                with self._lock:
+                    self.processed += 1
+                    if failed:
+                        self.failed += 1
+                    self.last_lag = lag
+                    self.max_lag = max(self.max_lag, lag)
+                    self._total_lag += lag
+                    self._total_processing += duration
+                self._queue.task_done()
+
+    def _process(self, entry: Dict):
+        with self.app.app_context():
+            self.handler(entry)
+
+    def wait_until_empty(self, timeout: float = 10.0) -> bool:
+        """Attendre que toutes les entrées en file soient traitées"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._queue.unfinished_tasks == 0:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def stats(self) -> Dict:
+        """Profondeur de file et latences de traitement"""
+        with self._lock:
+            processed = self.processed
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self.max_size,
+                'workers': len(self._threads) if self._pid == os.getpid() else 0,
+                'enqueued': self.enqueued,
+                'processed': processed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'last_lag_ms': round(self.last_lag * 1000, 2),
+                'max_lag_ms': round(self.max_lag * 1000, 2),
+                'avg_lag_ms': round(self._total_lag / processed * 1000, 2) if processed else 0.0,
+                'avg_processing_ms': round(self._total_processing / processed * 1000, 2) if processed else 0.0
+            }
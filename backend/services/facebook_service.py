@@ -1,81 +1,80 @@
 import requests
 from models import db, Message, Comment, AutoResponse
+from config import Config
+from services.http_client import get_session
+from services.graph_batch import execute_batch, get_batcher
+from services.metrics import graph_errors
+from services.structured_logging import get_logger
 from datetime import datetime
 
+log = get_logger('facebook')
+
+# En-têtes d'utilisation renvoyés par Facebook (quotas de l'app et de la page)
+USAGE_HEADERS = ('X-App-Usage', 'X-Page-Usage', 'X-Business-Use-Case-Usage')
+
+# Aide associée aux codes d'erreur Graph les plus fréquents
+ERROR_HINTS = {
+    200: "Permissions manquantes: régénérer le token avec pages_manage_posts, "
+         "pages_read_engagement, pages_manage_metadata et pages_messaging",
+    190: "Token invalide ou expiré: générer un nouveau Page Access Token",
+    100: "Paramètre invalide: vérifier que le commentaire existe toujours",
+    10: "Permission refusée: vérifier le rôle d'admin de la page et les permissions de l'app"
+}
+
 class FacebookService:
     def __init__(self, access_token):
         self.access_token = access_token
-        self.base_url = "https://graph.facebook.com/v18.0"
+        self.base_url = f"{Config.FACEBOOK_GRAPH_URL}/{Config.FACEBOOK_GRAPH_VERSION}"
+        self.last_usage_headers = {}
     
     def _make_request(self, method, url, **kwargs):
         """Méthode helper pour gérer les requêtes avec erreurs détaillées"""
         try:
-            print(f"📡 Requête {method} vers: {url}")
+            log.debug('Requête Graph %s %s', method, url)
             
+            # Session partagée: connexions keep-alive, timeouts et retries
+            session = get_session()
             if method.upper() == 'GET':
-                response = requests.get(url, **kwargs)
+                response = session.get(url, **kwargs)
             elif method.upper() == 'POST':
-                response = requests.post(url, **kwargs)
+                response = session.post(url, **kwargs)
             else:
                 raise ValueError(f"Méthode HTTP non supportée: {method}")
             
-            print(f"   Status: {response.status_code}")
+            self.last_usage_headers = {
+                name: response.headers[name] for name in USAGE_HEADERS if name in response.headers
+            }
             
             result = response.json()
-            print(f"   Réponse: {result}")
+            log.debug('Réponse Graph %s: %s', response.status_code, result)
             
             # Vérifier les erreurs Facebook
             if 'error' in result:
                 error = result['error']
-                print(f"❌ Erreur Facebook API:")
-                print(f"   Message: {error.get('message')}")
-                print(f"   Code: {error.get('code')}")
-                print(f"   Type: {error.get('type')}")
-                print(f"   Subcode: {error.get('error_subcode')}")
-                
-                # Messages d'aide spécifiques
                 error_code = error.get('code')
-                if error_code == 200:
-                    print("\n   💡 PERMISSIONS MANQUANTES!")
-                    print("   Solution:")
-                    print("   1. Allez sur developers.facebook.com")
-                    print("   2. Votre app > Outils de jetons d'accès")
-                    print("   3. Générez un nouveau token avec:")
-                    print("      - pages_manage_posts (CRITIQUE)")
-                    print("      - pages_read_engagement")
-                    print("      - pages_manage_metadata")
-                    print("      - pages_messaging")
-                    
-                elif error_code == 190:
-                    print("\n   💡 TOKEN INVALIDE OU EXPIRÉ!")
-                    print("   Solution:")
-                    print("   1. Générez un nouveau Page Access Token")
-                    print("   2. Mettez-le à jour dans votre config")
-                    
-                elif error_code == 100:
-                    print("\n   💡 PARAMÈTRE INVALIDE!")
-                    print("   Solution:")
-                    print("   1. Vérifiez que le comment_id est correct")
-                    print("   2. Vérifiez que le commentaire existe toujours")
-                    
-                elif error_code == 10:
-                    print("\n   💡 PERMISSION REFUSÉE!")
-                    print("   Solution:")
-                    print("   1. Vérifiez que vous êtes admin de la page")
-                    print("   2. Vérifiez les permissions de l'app")
+                graph_errors.inc(str(error_code))
+                log.warning('Erreur Facebook API: %s', error.get('message'), extra={
+                    'status': response.status_code,
+                    'code': error_code,
+                    'type': error.get('type'),
+                    'subcode': error.get('error_subcode'),
+                    # Messages d'aide spécifiques
+                    'hint': ERROR_HINTS.get(error_code)
+                })
             
             return result
         
         except requests.exceptions.RequestException as e:
-            print(f"❌ Erreur réseau: {str(e)}")
+            log.warning('Erreur réseau Graph API: %s', e)
+            graph_errors.inc('NETWORK_ERROR')
             return {'error': {'message': str(e), 'code': 'NETWORK_ERROR'}}
         except ValueError as e:
-            print(f"❌ Erreur JSON: {str(e)}")
+            log.warning('Réponse Graph API non JSON: %s', e)
+            graph_errors.inc('JSON_ERROR')
             return {'error': {'message': 'Invalid JSON response', 'code': 'JSON_ERROR'}}
         except Exception as e:
-            print(f"❌ Erreur inattendue: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            log.exception('Erreur inattendue Graph API')
+            graph_errors.inc('UNKNOWN_ERROR')
             return {'error': {'message': str(e), 'code': 'UNKNOWN_ERROR'}}
     
     def send_message(self, recipient_id, message_text):
@@ -87,13 +86,10 @@ class FacebookService:
             "access_token": self.access_token
         }
         
-        print(f"\n📤 Envoi message à {recipient_id}")
-        print(f"   Texte: {message_text[:50]}...")
-        
         result = self._make_request('POST', url, json=payload)
         
         if 'error' not in result:
-            print(f"   ✅ Message envoyé avec succès!")
+            log.info('Message envoyé', extra={'recipient_id': recipient_id})
         
         return result
     
@@ -115,24 +111,40 @@ class FacebookService:
             "access_token": self.access_token
         }
         
-        print(f"\n💬 Réponse au commentaire")
-        print(f"   Comment ID: {comment_id}")
-        print(f"   URL: {url}")
-        print(f"   Message: {message_text[:50]}...")
-        
         result = self._make_request('POST', url, json=payload)
         
         if 'error' not in result:
-            print(f"   ✅ Réponse au commentaire envoyée!")
-            if 'id' in result:
-                print(f"   ID de la réponse: {result['id']}")
+            log.info('Réponse au commentaire envoyée', extra={'comment_id': comment_id, 'graph_reply_id': result.get('id')})
         else:
-            print(f"   ❌ Échec de la réponse au commentaire")
+            log.warning('Échec de la réponse au commentaire', extra={'comment_id': comment_id})
         
         return result
     
+    def batch(self, calls):
+        """
+        Envoyer plusieurs appels Graph indépendants en une seule requête batch
+        
+        Args:
+            calls: liste de (méthode, URL relative, corps) ex: ('GET', 'me?fields=id', None)
+        
+        Returns:
+            list: une réponse par appel, dans le même ordre
+        """
+        log.debug('Batch Graph API: %d appel(s)', len(calls))
+        return execute_batch(self.access_token, calls)
+    
     def get_user_info(self, user_id):
         """Obtenir les informations d'un utilisateur"""
+        # Regroupement automatique avec les autres appels de la fenêtre
+        if Config.GRAPH_BATCH_WINDOW_MS > 0:
+            future = get_batcher(self.access_token).submit(
+                'GET', f"{user_id}?fields=name,first_name,last_name"
+            )
+            try:
+                return future.result(timeout=Config.HTTP_CONNECT_TIMEOUT + Config.HTTP_READ_TIMEOUT)
+            except Exception as e:
+                return {'error': {'message': str(e), 'code': 'BATCH_TIMEOUT'}}
+        
         url = f"{self.base_url}/{user_id}"
         params = {
             "fields": "name,first_name,last_name",
@@ -141,6 +153,15 @@ class FacebookService:
         
         return self._make_request('GET', url, params=params)
     
+    def get_users_info(self, user_ids):
+        """Obtenir les informations de plusieurs utilisateurs (requêtes batch)"""
+        user_ids = list(dict.fromkeys(str(u) for u in user_ids))
+        results = self.batch([
+            ('GET', f"{user_id}?fields=name,first_name,last_name", None)
+            for user_id in user_ids
+        ])
+        return dict(zip(user_ids, results))
+    
     def get_comment_info(self, comment_id):
         """Obtenir les détails d'un commentaire"""
         url = f"{self.base_url}/{comment_id}"
@@ -149,67 +170,48 @@ class FacebookService:
             "access_token": self.access_token
         }
         
-        print(f"\n🔍 Récupération info commentaire {comment_id}")
         return self._make_request('GET', url, params=params)
     
-    def test_permissions(self):
-        """Tester les permissions du token - DÉTAILLÉ"""
-        print("\n" + "="*60)
-        print("🔐 TEST DES PERMISSIONS")
-        print("="*60)
-        
-        url = f"{self.base_url}/me/permissions"
-        params = {"access_token": self.access_token}
+    def test_permissions(self, permissions_result=None):
+        """
+        Tester les permissions du token - DÉTAILLÉ
         
-        result = self._make_request('GET', url, params=params)
+        Args:
+            permissions_result: réponse de /me/permissions déjà obtenue (ex: via batch)
+        """
+        if permissions_result is None:
+            url = f"{self.base_url}/me/permissions"
+            params = {"access_token": self.access_token}
+            
+            result = self._make_request('GET', url, params=params)
+        else:
+            result = permissions_result
         
         if 'data' in result:
             permissions = result['data']
             granted = [p['permission'] for p in permissions if p['status'] == 'granted']
             declined = [p['permission'] for p in permissions if p['status'] == 'declined']
             
-            print("\n✅ Permissions accordées:")
-            for perm in sorted(granted):
-                print(f"   ✅ {perm}")
-            
-            if declined:
-                print("\n❌ Permissions refusées:")
-                for perm in sorted(declined):
-                    print(f"   ❌ {perm}")
-            
             # Vérifier les permissions critiques pour les commentaires
             critical_perms = {
                 'pages_messaging': 'Messages privés',
                 'pages_manage_metadata': 'Gestion métadonnées',
                 'pages_read_engagement': 'Lecture engagement',
-                'pages_manage_posts': '🔥 RÉPONDRE AUX COMMENTAIRES (CRITIQUE!)'
+                'pages_manage_posts': 'Répondre aux commentaires'
             }
+            missing = [perm for perm in critical_perms if perm not in granted]
             
-            print("\n🎯 Permissions critiques:")
-            missing = []
-            for perm, description in critical_perms.items():
-                if perm in granted:
-                    print(f"   ✅ {perm}: {description}")
-                else:
-                    print(f"   ❌ {perm}: {description}")
-                    missing.append(perm)
-            
+            log.info('Permissions du token', extra={
+                'granted': sorted(granted), 'declined': sorted(declined)
+            })
             if missing:
-                print("\n⚠️ ATTENTION: Permissions manquantes!")
-                print("   Sans ces permissions, les commentaires NE FONCTIONNERONT PAS!")
-                print("\n   📝 Actions requises:")
-                print("   1. Allez sur: https://developers.facebook.com/tools/explorer")
-                print("   2. Sélectionnez votre app")
-                print("   3. Cliquez sur 'Generate Access Token'")
-                print("   4. Sélectionnez TOUTES ces permissions:")
-                for perm in missing:
-                    print(f"      - {perm}")
-                print("   5. Copiez le nouveau token")
-                print("   6. Mettez-le à jour dans votre application")
+                # Sans ces permissions, les réponses aux commentaires échouent:
+                # régénérer le token (Graph API Explorer) avec toutes les permissions
+                log.warning('Permissions critiques manquantes: %s', ', '.join(
+                    f'{perm} ({critical_perms[perm]})' for perm in missing
+                ), extra={'missing': missing})
             else:
-                print("\n✅ Toutes les permissions critiques sont OK!")
-            
-            print("="*60)
+                log.info('Toutes les permissions critiques sont accordées')
             
             return {
                 'granted': granted,
@@ -218,7 +220,7 @@ class FacebookService:
                 'all_ok': len(missing) == 0
             }
         
-        print("="*60)
+        log.warning('Permissions du token illisibles', extra={'error': result.get('error')})
         return result
     
     def test_comment_reply(self, comment_id, test_mode=True):
@@ -229,45 +231,37 @@ class FacebookService:
             comment_id: ID du commentaire à tester
             test_mode: Si True, ne fait qu'une validation, n'envoie pas
         """
-        print("\n" + "="*60)
-        print("🧪 TEST DE RÉPONSE AUX COMMENTAIRES")
-        print("="*60)
-        
-        # 1. Vérifier que le commentaire existe
-        print("\n1️⃣ Vérification du commentaire...")
-        comment_info = self.get_comment_info(comment_id)
+        # 1. Vérifier que le commentaire existe (+ permissions, en un seul batch)
+        comment_info, permissions_result = self.batch([
+            ('GET', f"{comment_id}?fields=id,message,from,created_time,parent", None),
+            ('GET', 'me/permissions', None)
+        ])
         
         if 'error' in comment_info:
-            print("   ❌ Commentaire introuvable ou inaccessible")
+            log.warning('Test de réponse: commentaire introuvable ou inaccessible', extra={
+                'comment_id': comment_id, 'error': comment_info['error']
+            })
             return False
         
-        print(f"   ✅ Commentaire trouvé: {comment_info.get('message', '')[:50]}...")
-        
         # 2. Tester les permissions
-        print("\n2️⃣ Vérification des permissions...")
-        perms = self.test_permissions()
+        perms = self.test_permissions(permissions_result)
         
         if not perms.get('all_ok'):
-            print("   ❌ Permissions insuffisantes")
+            log.warning('Test de réponse: permissions insuffisantes', extra={'comment_id': comment_id})
             return False
         
-        print("   ✅ Permissions OK")
-        
         # 3. Test d'envoi (si pas en mode test)
         if not test_mode:
-            print("\n3️⃣ Envoi d'une réponse de test...")
             result = self.reply_to_comment(comment_id, "Test automatique ✅")
             
             if 'error' in result:
-                print("   ❌ Échec de l'envoi")
+                log.warning('Test de réponse: échec de l\'envoi', extra={
+                    'comment_id': comment_id, 'error': result['error']
+                })
                 return False
-            
-            print("   ✅ Réponse envoyée avec succès!")
-        else:
-            print("\n3️⃣ Mode test - pas d'envoi réel")
         
-        print("\n" + "="*60)
-        print("✅ TOUT FONCTIONNE CORRECTEMENT!")
-        print("="*60)
+        log.info('Test de réponse aux commentaires réussi', extra={
+            'comment_id': comment_id, 'test_mode': test_mode
+        })
         
         return True
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+Requêtes Graph API groupées (endpoint batch de Facebook)
+
+Jusqu'à 50 sous-requêtes indépendantes partent dans un seul POST, et les
+réponses sont redistribuées à chaque appelant. Le GraphBatcher regroupe
+automatiquement les requêtes émises dans une courte fenêtre de temps.
+
+Un batcher par token: son thread s'arrête et le batcher est retiré après
+GRAPH_BATCH_IDLE_SECONDS sans requête, pour ne pas garder un thread par
+token remplacé (rotation, reconnexion) ou par page qui ne reçoit plus rien.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from config import Config
+from services.http_client import get_session
+
+MAX_BATCH_SIZE = 50
+
+# (méthode, URL relative, corps optionnel) ex: ('GET', '12345?fields=name', None)
+BatchCall = Tuple[str, str, Optional[Dict]]
+
+
+def _graph_url() -> str:
+    return f"{Config.FACEBOOK_GRAPH_URL}/{Config.FACEBOOK_GRAPH_VERSION}"
+
+
+def _decode_item(item) -> Dict:
+    """Réponse d'une sous-requête -> dict (même format que les appels directs)"""
+    if item is None:
+        # Facebook renvoie null pour une sous-requête non exécutée (timeout)
+        return {'error': {'message': 'Batch item not processed', 'code': 'BATCH_TIMEOUT'}}
+    try:
+        body = json.loads(item.get('body') or '{}')
+    except ValueError:
+        return {'error': {'message': 'Invalid JSON response', 'code': 'JSON_ERROR'}}
+    if not isinstance(body, dict):
+        body = {'data': body}
+    if item.get('code', 200) >= 400 and 'error' not in body:
+        body = {'error': {'message': f"HTTP {item.get('code')}", 'code': item.get('code')}}
+    return body
+
+
+def execute_batch(access_token: str, calls: List[BatchCall]) -> List[Dict]:
+    """
+    Exécuter des appels Graph indépendants en un minimum d'allers-retours
+
+    Returns:
+        Une réponse (dict) par appel, dans le même ordre
+    """
+    results: List[Dict] = []
+
+    for start in range(0, len(calls), MAX_BATCH_SIZE):
+        chunk = calls[start:start + MAX_BATCH_SIZE]
+        batch = []
+        for method, relative_url, body in chunk:
+            request = {'method': method.upper(), 'relative_url': relative_url}
+            if body:
+                request['body'] = urlencode({
+                    key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                    for key, value in body.items()
+                })
+            batch.append(request)
+
+        try:
+            response = get_session().post(_graph_url(), data={
+                'access_token': access_token,
+                'batch': json.dumps(batch),
+                'include_headers': 'false'
+            })
+            payload = response.json()
+        except Exception as e:
+            error = {'error': {'message': str(e), 'code': 'NETWORK_ERROR'}}
+            results.extend(dict(error) for _ in chunk)
+            continue
+
+        # Erreur globale (token invalide...): la même erreur pour chaque appel
+        if isinstance(payload, dict):
+            results.extend(dict(payload) for _ in chunk)
+            continue
+
+        decoded = [_decode_item(item) for item in payload[:len(chunk)]]
+        missing = {'error': {'message': 'Missing batch response', 'code': 'BATCH_ERROR'}}
+        decoded.extend(dict(missing) for _ in range(len(chunk) - len(decoded)))
+        results.extend(decoded)
+
+    return results
+
+
+class GraphBatcher:
+    """
+    Regroupe les requêtes d'un même token émises dans une fenêtre de temps
+
+    Les appelants reçoivent un Future; un thread dédié envoie le lot dès
+    qu'il atteint 50 requêtes ou que la fenêtre est écoulée. Sans requête
+    pendant `idle_timeout` secondes, le thread s'arrête (batcher fermé).
+    """
+
+    def __init__(self, access_token: str, window: float = 0.01, idle_timeout: float = 60.0):
+        self.access_token = access_token
+        self.window = window
+        self.idle_timeout = idle_timeout
+        self.closed = False
+        self._pending: List[Tuple[BatchCall, Future]] = []
+        self._condition = threading.Condition()
+
+        self.batches_sent = 0
+        self.calls_sent = 0
+
+        self._thread = threading.Thread(target=self._run, name='graph-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, method: str, relative_url: str, body: Optional[Dict] = None) -> Future:
+        future = Future()
+        with self._condition:
+            if not self.closed:
+                self._pending.append(((method, relative_url, body), future))
+                self._condition.notify()
+                return future
+        # Fermé entre get_batcher() et cet appel: un nouveau batcher prend le relais
+        return get_batcher(self.access_token).submit(method, relative_url, body)
+
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            _evict(self)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                idle_deadline = time.monotonic() + self.idle_timeout
+                while not self._pending:
+                    remaining = idle_deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.closed = True
+                        return
+                    self._condition.wait(remaining)
+
+                # Laisser la fenêtre se remplir (ou s'arrêter à 50 requêtes)
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < MAX_BATCH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                pending = self._pending[:MAX_BATCH_SIZE]
+                self._pending = self._pending[MAX_BATCH_SIZE:]
+
+            calls = [call for call, _ in pending]
+            try:
+                results = execute_batch(self.access_token, calls)
+            except Exception as e:
+                results = [{'error': {'message': str(e), 'code': 'UNKNOWN_ERROR'}}] * len(calls)
+
+            self.batches_sent += 1
+            self.calls_sent += len(calls)
+            for (_, future), result in zip(pending, results):
+                future.set_result(result)
+
+
+_batchers: Dict[str, GraphBatcher] = {}
+_batchers_pid = None
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(access_token: str) -> GraphBatcher:
+    """Batcher partagé pour ce token (un par processus)"""
+    global _batchers, _batchers_pid
+
+    with _batchers_lock:
+        if _batchers_pid != os.getpid():
+            _batchers = {}
+            _batchers_pid = os.getpid()
+
+        batcher = _batchers.get(access_token)
+        if batcher is None or batcher.closed:
+            batcher = GraphBatcher(access_token, window=Config.GRAPH_BATCH_WINDOW_MS / 1000,
+                                   idle_timeout=Config.GRAPH_BATCH_IDLE_SECONDS)
+            _batchers[access_token] = batcher
+        return batcher
+
+
+def _evict(batcher: GraphBatcher):
+    """Retirer un batcher arrêté (s'il n'a pas déjà été remplacé)"""
+    with _batchers_lock:
+        if _batchers.get(batcher.access_token) is batcher:
+            del _batchers[batcher.access_token]
+
+
+def active_batchers() -> int:
+    with _batchers_lock:
+        return len(_batchers) if _batchers_pid == os.getpid() else 0
@@ -0,0 +1,127 @@
+"""
+Lecture de l'historique des messages et commentaires
+
+Pagination par curseur (keyset sur (timestamp, id), du plus récent au
+plus ancien) avec filtres, et lecture en flux via un curseur côté
+serveur pour parcourir toute la table à mémoire constante.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+
+from models import db, Message, Comment
+
+# Colonnes renvoyées par /messages et /comments (format historique de l'API)
+HISTORY_FIELDS = {
+    'message': ('id', 'message_id', 'sender_id', 'sender_name', 'message_text',
+                'response_sent', 'is_automated', 'timestamp'),
+    'comment': ('id', 'comment_id', 'post_id', 'user_id', 'user_name', 'comment_text',
+                'response_sent', 'is_automated', 'timestamp')
+}
+
+CHANNEL_MODELS = {
+    'message': Message,
+    'comment': Comment
+}
+
+# Filtre de l'API -> colonne, par canal
+FILTER_COLUMNS = {
+    'message': {'page_id': 'page_id', 'sender_id': 'sender_id'},
+    'comment': {'page_id': 'page_id', 'user_id': 'user_id', 'post_id': 'post_id'}
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Curseur invalide: {cursor}') from e
+
+
+def history_query(channel: str, filters: Optional[Dict] = None, cursor: Optional[str] = None,
+                  fields=None):
+    """
+    SELECT de l'historique, du plus récent au plus ancien
+
+    Args:
+        filters: page_id, sender_id / user_id / post_id, automated (bool),
+                 since / until (datetime)
+        cursor: curseur renvoyé par la page précédente
+        fields: colonnes à lire (défaut: format de l'API)
+    """
+    model = CHANNEL_MODELS[channel]
+    filters = filters or {}
+    columns = [getattr(model, name) for name in (fields or HISTORY_FIELDS[channel])]
+
+    statement = select(*columns)
+
+    for name, column in FILTER_COLUMNS[channel].items():
+        if filters.get(name) is not None:
+            statement = statement.where(getattr(model, column) == filters[name])
+    if filters.get('automated') is not None:
+        statement = statement.where(model.is_automated == filters['automated'])
+    if filters.get('since') is not None:
+        statement = statement.where(model.timestamp >= filters['since'])
+    if filters.get('until') is not None:
+        statement = statement.where(model.timestamp < filters['until'])
+
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        # timestamp <= t reste utilisable par les index (.., timestamp); id départage les égalités
+        statement = statement.where(and_(
+            model.timestamp <= timestamp,
+            or_(model.timestamp < timestamp, model.id < row_id)
+        ))
+
+    return statement.order_by(model.timestamp.desc(), model.id.desc())
+
+
+def serialize(row) -> Dict:
+    """Ligne -> dict JSON (dates en ISO 8601)"""
+    data = dict(row._mapping)
+    for key, value in data.items():
+        if isinstance(value, datetime):
+            data[key] = value.isoformat()
+    return data
+
+
+def fetch_page(channel: str, filters: Optional[Dict], cursor: Optional[str], limit: int):
+    """
+    Une page d'historique
+
+    Returns:
+        (lignes sérialisées, curseur de la page suivante ou None)
+    """
+    rows = db.session.execute(history_query(channel, filters, cursor).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more and rows else None
+    return [serialize(row) for row in rows], next_cursor
+
+
+def stream_rows(statement, chunk_size: int = 1000) -> Iterator:
+    """Parcourir un SELECT via un curseur côté serveur (mémoire constante)"""
+    result = db.session.execute(
+        statement,
+        execution_options={'stream_results': True, 'yield_per': chunk_size}
+    )
+    try:
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        result.close()
@@ -0,0 +1,354 @@
+"""
+Export de l'historique (messages, commentaires et leur analyse NLP)
+
+Les lignes sont lues par id croissant via un curseur côté serveur et
+écrites au fil de l'eau dans des fichiers partitionnés:
+
+    <dossier>/<canal>/day=AAAA-MM-JJ/page_id=N/part-<premier id>.<ext>
+
+Formats: Parquet (si pyarrow est installé), CSV ou NDJSON compressés
+gzip. L'export avance par segments de `segment_size` lignes: à la fin de
+chaque segment les fichiers sont renommés puis le dernier id exporté est
+enregistré dans export_job. Une reprise repart de cet id; un segment
+interrompu est réécrit sous les mêmes noms de fichiers (pas de doublons).
+"""
+
+import csv
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import click
+from sqlalchemy import Boolean, DateTime, Float, Integer, or_, update
+
+from models import db, ExportJob
+from services.history import CHANNEL_MODELS, HISTORY_FIELDS, history_query, stream_rows
+from services.structured_logging import get_logger, log_context
+
+log = get_logger('export')
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dépendance optionnelle: export Parquet indisponible
+    pa = pq = None
+
+# Colonnes exportées: format de l'API + page + analyse NLP
+NLP_FIELDS = ('intent', 'sentiment', 'sentiment_score', 'token_count', 'response_sentiment', 'analyzer_version')
+EXPORT_FIELDS = {
+    channel: fields + ('page_id',) + NLP_FIELDS
+    for channel, fields in HISTORY_FIELDS.items()
+}
+
+# Un job 'running' sans point de reprise depuis ce délai est considéré interrompu
+_STALE_AFTER = timedelta(minutes=15)
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class _NdjsonWriter:
+    extension = 'ndjson.gz'
+
+    def __init__(self, path: str, channel: str):
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, row: Dict):
+        self._file.write(json.dumps({k: _jsonable(v) for k, v in row.items()}, ensure_ascii=False))
+        self._file.write('\n')
+
+    def close(self):
+        self._file.close()
+
+
+class _CsvWriter:
+    extension = 'csv.gz'
+
+    def __init__(self, path: str, channel: str):
+        self._file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=EXPORT_FIELDS[channel])
+        self._writer.writeheader()
+
+    def write(self, row: Dict):
+        self._writer.writerow({k: _jsonable(v) for k, v in row.items()})
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    extension = 'parquet'
+    batch_size = 5000
+
+    def __init__(self, path: str, channel: str):
+        self._schema = _arrow_schema(channel)
+        self._writer = pq.ParquetWriter(path, self._schema, compression='zstd')
+        self._rows: List[Dict] = []
+
+    def write(self, row: Dict):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def _arrow_schema(channel: str):
+    """Schéma Arrow déduit des types des colonnes SQLAlchemy"""
+    table = CHANNEL_MODELS[channel].__table__
+    fields = []
+    for name in EXPORT_FIELDS[channel]:
+        column_type = table.c[name].type
+        if isinstance(column_type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column_type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column_type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column_type, DateTime):
+            arrow_type = pa.timestamp('us')
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+WRITERS = {
+    'parquet': _ParquetWriter,
+    'csv': _CsvWriter,
+    'ndjson': _NdjsonWriter
+}
+
+
+def available_formats() -> List[str]:
+    return [name for name in WRITERS if name != 'parquet' or pa is not None]
+
+
+class HistoryExporter:
+    """Création, exécution et reprise des exports"""
+
+    def __init__(self):
+        self.app = None
+        self.export_dir = 'exports'
+        self.segment_size = 50000
+        self.chunk_size = 1000
+
+    @property
+    def default_format(self) -> str:
+        return 'parquet' if pa is not None else 'csv'
+
+    def create_job(self, format: Optional[str] = None, channels=('message', 'comment'),
+                   output_dir: Optional[str] = None, page_id: Optional[int] = None,
+                   since: Optional[datetime] = None, until: Optional[datetime] = None) -> ExportJob:
+        """Enregistrer un nouvel export (commit)"""
+        format = format or self.default_format
+        if format not in WRITERS:
+            raise ExportError(f'Format inconnu: {format} (disponibles: {", ".join(available_formats())})')
+        if format not in available_formats():
+            raise ExportError('Export Parquet indisponible: installer pyarrow')
+        unknown = [channel for channel in channels if channel not in CHANNEL_MODELS]
+        if unknown or not channels:
+            raise ExportError(f'Canaux invalides: {", ".join(unknown) or "aucun"}')
+
+        job = ExportJob(format=format, channels=','.join(channels), output_dir=output_dir or '',
+                        page_id=page_id, since=since, until=until)
+        db.session.add(job)
+        db.session.flush()
+        if not output_dir:
+            job.output_dir = os.path.join(self.export_dir, f'job-{job.id}')
+        db.session.commit()
+        return job
+
+    def is_running(self, job: ExportJob) -> bool:
+        """Job en cours d'exécution (un 'running' sans nouvelle depuis 15 min est considéré interrompu)"""
+        return job.status == 'running' and job.updated_at is not None and \
+            job.updated_at >= datetime.utcnow() - _STALE_AFTER
+
+    def claim(self, job_id: int) -> bool:
+        """Passer le job à 'running' s'il n'est pas déjà exécuté ailleurs (commit)"""
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id, ExportJob.status != 'done', or_(
+                ExportJob.status != 'running', ExportJob.updated_at < now - _STALE_AFTER
+            ))
+            .values(status='running', error=None, updated_at=now)
+        ).rowcount
+        db.session.commit()
+        return claimed == 1
+
+    def run(self, job_id: int) -> ExportJob:
+        """
+        Exécuter (ou reprendre) un export jusqu'au bout
+
+        Raises:
+            ExportError: job introuvable, terminé ou déjà en cours
+        """
+        if db.session.get(ExportJob, job_id) is None:
+            raise ExportError(f'Export {job_id} introuvable')
+        if not self.claim(job_id):
+            raise ExportError(f'Export {job_id} déjà terminé ou en cours')
+
+        job = db.session.get(ExportJob, job_id)
+        try:
+            for channel in job.channels.split(','):
+                while self._export_segment(job, channel):
+                    pass
+            job.status = 'done'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(ExportJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            db.session.commit()
+            raise
+        return job
+
+    def _export_segment(self, job: ExportJob, channel: str) -> int:
+        """
+        Exporter les `segment_size` lignes suivantes d'un canal puis enregistrer
+        le point de reprise (commit)
+
+        Returns:
+            Nombre de lignes exportées (0 = canal terminé)
+        """
+        model = CHANNEL_MODELS[channel]
+        last_id_column = f'last_{channel}_id'
+        last_id = getattr(job, last_id_column)
+        filters = {'page_id': job.page_id, 'since': job.since, 'until': job.until}
+
+        statement = (
+            history_query(channel, filters, fields=EXPORT_FIELDS[channel])
+            .where(model.id > last_id)
+            .order_by(None)
+            .order_by(model.id)
+            .limit(self.segment_size)
+        )
+
+        writer_class = WRITERS[job.format]
+        writers: Dict[tuple, tuple] = {}
+        segment_start = None
+        count = 0
+        try:
+            for row in stream_rows(statement, self.chunk_size):
+                if segment_start is None:
+                    segment_start = row.id
+                day = row.timestamp.strftime('%Y-%m-%d') if row.timestamp else 'unknown'
+                key = (day, row.page_id or 0)
+                if key not in writers:
+                    directory = os.path.join(job.output_dir, channel, f'day={day}', f'page_id={key[1]}')
+                    os.makedirs(directory, exist_ok=True)
+                    path = os.path.join(directory, f'part-{segment_start:012d}.{writer_class.extension}')
+                    writers[key] = (writer_class(path + '.tmp', channel), path)
+                writers[key][0].write(dict(row._mapping))
+                last_id = row.id
+                count += 1
+        finally:
+            for writer, _ in writers.values():
+                writer.close()
+
+        if not count:
+            return 0
+
+        # Fichiers complets d'abord, point de reprise ensuite
+        for _, path in writers.values():
+            os.replace(path + '.tmp', path)
+
+        setattr(job, last_id_column, last_id)
+        job.rows_exported += count
+        job.files_written += len(writers)
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+        return count
+
+    def to_dict(self, job: ExportJob) -> Dict:
+        return {
+            'id': job.id,
+            'status': job.status,
+            'format': job.format,
+            'channels': job.channels.split(','),
+            'output_dir': job.output_dir,
+            'page_id': job.page_id,
+            'since': job.since.isoformat() if job.since else None,
+            'until': job.until.isoformat() if job.until else None,
+            'last_message_id': job.last_message_id,
+            'last_comment_id': job.last_comment_id,
+            'rows_exported': job.rows_exported,
+            'files_written': job.files_written,
+            'error': job.error,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'updated_at': job.updated_at.isoformat() if job.updated_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None
+        }
+
+    # ---------- Exécution en arrière-plan (API) ----------
+
+    def start(self, job_id: int) -> threading.Thread:
+        """Exécuter un export dans un thread (l'appel HTTP répond tout de suite)"""
+        thread = threading.Thread(target=self._run_in_context, args=(job_id,),
+                                  name=f'export-{job_id}', daemon=True)
+        thread.start()
+        return thread
+
+    def _run_in_context(self, job_id: int):
+        with self.app.app_context(), log_context(export_job_id=job_id):
+            try:
+                self.run(job_id)
+            except ExportError as e:
+                # Réservé entre-temps par une autre requête: rien à faire
+                log.warning('Export non lancé: %s', e)
+            except Exception:
+                log.exception('Export interrompu')
+            finally:
+                db.session.remove()
+
+    # ---------- Commandes Flask CLI ----------
+
+    def init_app(self, app):
+        self.app = app
+        self.export_dir = app.config.get('EXPORT_DIR', 'exports')
+        self.segment_size = app.config.get('EXPORT_SEGMENT_SIZE', 50000)
+        self.chunk_size = app.config.get('EXPORT_CHUNK_SIZE', 1000)
+
+        @app.cli.command('export')
+        @click.option('--format', 'format', type=click.Choice(list(WRITERS)), default=None,
+                      help='Défaut: parquet si pyarrow est installé, sinon csv')
+        @click.option('--channel', 'channels', multiple=True, type=click.Choice(list(CHANNEL_MODELS)))
+        @click.option('--output', default=None, help='Dossier de sortie (défaut: EXPORT_DIR/job-<id>)')
+        @click.option('--page-id', type=int, default=None)
+        @click.option('--since', type=click.DateTime(), default=None)
+        @click.option('--until', type=click.DateTime(), default=None)
+        @click.option('--resume', 'resume_id', type=int, default=None, help='Reprendre l\'export <id>')
+        def export(format, channels, output, page_id, since, until, resume_id):
+            """Exporter l'historique en fichiers partitionnés par jour et par page"""
+            try:
+                if resume_id is None:
+                    job = self.create_job(format, channels or tuple(CHANNEL_MODELS), output,
+                                          page_id, since, until)
+                    resume_id = job.id
+                click.echo(f'📦 Export {resume_id} en cours...')
+                job = self.run(resume_id)
+            except ExportError as e:
+                raise click.ClickException(str(e))
+            click.echo(f'✅ Export {job.id}: {job.rows_exported} ligne(s), '
+                       f'{job.files_written} fichier(s) dans {job.output_dir}')
+
+
+history_exporter = HistoryExporter()
@@ -0,0 +1,136 @@
+"""
+Transport HTTP partagé pour les appels Graph API
+
+Une Session requests par processus (connexions keep-alive réutilisées),
+pool dimensionné pour les workers, timeouts explicites par défaut et
+nouvelles tentatives avec backoff sur 429/5xx.
+"""
+
+import os
+import threading
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from config import Config
+
+# Statistiques de réutilisation du pool (par processus)
+_stats = {'requests': 0, 'connections_opened': 0, 'retries': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str, amount: int = 1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count('connections_opened')
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count('connections_opened')
+        return super()._new_conn()
+
+
+class GraphRetry(Retry):
+    """
+    Politique de nouvelle tentative
+
+    Les POST (envoi de messages, réponses) ne sont rejoués que si Facebook
+    ne les a pas traités (429, 503), pour ne jamais envoyer deux fois.
+    """
+
+    POST_RETRY_STATUSES = frozenset({429, 503})
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method and method.upper() == 'POST':
+            return bool(self.total) and status_code in self.POST_RETRY_STATUSES
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def increment(self, *args, **kwargs):
+        _count('retries')
+        return super().increment(*args, **kwargs)
+
+
+class PooledAdapter(HTTPAdapter):
+    """Adaptateur qui compte les connexions réellement ouvertes"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool
+        }
+
+
+class GraphSession(requests.Session):
+    """Session avec timeout (connexion, lecture) par défaut"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.default_timeout)
+        _count('requests')
+        return super().request(method, url, **kwargs)
+
+
+def _build_session() -> GraphSession:
+    session = GraphSession(timeout=(Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT))
+
+    retry = GraphRetry(
+        total=Config.HTTP_MAX_RETRIES,
+        connect=Config.HTTP_MAX_RETRIES,
+        read=Config.HTTP_MAX_RETRIES,
+        status=Config.HTTP_MAX_RETRIES,
+        backoff_factor=Config.HTTP_BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = PooledAdapter(
+        pool_connections=Config.HTTP_POOL_SIZE,
+        pool_maxsize=Config.HTTP_POOL_SIZE,
+        max_retries=retry
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> GraphSession:
+    """Session partagée du processus (recréée après un fork gunicorn)"""
+    global _session, _session_pid
+
+    if _session is not None and _session_pid == os.getpid():
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = _build_session()
+            _session_pid = os.getpid()
+    return _session
+
+
+def pool_stats() -> Dict:
+    """Requêtes émises, connexions ouvertes et taux de réutilisation"""
+    with _stats_lock:
+        stats = dict(_stats)
+    requests_sent = stats['requests']
+    opened = stats['connections_opened']
+    stats['reuse_ratio'] = round(1 - opened / requests_sent, 3) if requests_sent else 0.0
+    stats['pool_size'] = Config.HTTP_POOL_SIZE
+    return stats
@@ -0,0 +1,218 @@
+"""
+Classification des intentions en un seul passage
+
+Les intentions (intégrées à NLPChatbot et définies en base, table
+intent_pattern) sont indexées par mot: le message est découpé une fois en
+mots (\w+), chaque mot est cherché dans un dictionnaire mot -> intentions,
+et les expressions de plusieurs mots ('marche pas') sont vérifiées à partir
+de leur premier mot. Toutes les intentions trouvées sont rapportées avec
+leur position; l'intention principale est la plus prioritaire, exactement
+comme le parcours séquentiel d'origine (un re.search par intention).
+
+Un pattern intégré qui n'est pas une simple liste de mots (\b(a|b)\b)
+reste une regex, compilée une fois et testée seulement si elle peut
+battre l'intention déjà trouvée.
+
+Les intentions définies en base passent avant les intentions intégrées,
+par priorité décroissante; un nom déjà intégré remplace son pattern. Elles
+sont rechargées quand la version 'intents' change (autres workers compris).
+"""
+
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from flask import has_app_context
+
+from config import Config
+from models import IntentPattern
+from services.rule_snapshot import bump_version, read_version
+
+INTENTS_VERSION_KEY = 'intents'
+
+DEFAULT_INTENT = 'general'
+
+_WORD = re.compile(r'\w+')
+
+# \b(mot|autre mot|...)\b : alternance de mots sans métacaractères
+_WORD_LIST_PATTERN = re.compile(r'^\\b\((?:\?:)?([^()\[\]{}*+?.^$\\]+)\)\\b$')
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    start: int
+    end: int
+    text: str
+
+
+def parse_keywords(keywords: str) -> Tuple[str, ...]:
+    """Mots-clés d'une intention définie en base ('livraison, colis, expédition')"""
+    return tuple(word.strip().lower() for word in (keywords or '').split(',') if word.strip())
+
+
+def _word_list(pattern: str) -> Optional[List[str]]:
+    """Mots d'un pattern \b(a|b|c)\b, ou None s'il faut garder la regex"""
+    match = _WORD_LIST_PATTERN.match(pattern)
+    if not match:
+        return None
+    words = [word.lower() for word in match.group(1).split('|')]
+    if not all(word and _WORD.fullmatch(word[0]) and _WORD.fullmatch(word[-1]) for word in words):
+        return None
+    return words
+
+
+class IntentClassifier:
+    """
+    Index mot -> intentions
+
+    Args:
+        intents: nom -> regex (str) ou mots-clés (séquence), dans l'ordre de priorité
+    """
+
+    def __init__(self, intents: Dict[str, Union[str, Sequence[str]]]):
+        self.intents: Tuple[str, ...] = tuple(intents)
+        # mot -> rangs des intentions; premier mot -> [(expression, rang)]
+        self._words: Dict[str, Tuple[int, ...]] = {}
+        self._phrases: Dict[str, List[Tuple[str, int]]] = {}
+        # Patterns gardés en regex: [(rang, regex compilée)]
+        self._regexes: List[Tuple[int, re.Pattern]] = []
+
+        for rank, spec in enumerate(intents.values()):
+            words = _word_list(spec) if isinstance(spec, str) else list(spec)
+            if words is None:
+                self._regexes.append((rank, re.compile(spec, re.IGNORECASE)))
+                continue
+            for word in words:
+                first = _WORD.match(word)
+                if first is None:
+                    continue
+                if first.end() == len(word):
+                    ranks = self._words.get(word, ())
+                    if rank not in ranks:
+                        self._words[word] = ranks + (rank,)
+                else:
+                    self._phrases.setdefault(first.group(), []).append((word, rank))
+
+    @staticmethod
+    def _phrase_end(text: str, start: int, phrase: str) -> Optional[int]:
+        """Fin de l'expression si elle commence à `start` et se termine sur une limite de mot"""
+        end = start + len(phrase)
+        if text[start:end].lower() != phrase or _WORD.match(text, end):
+            return None
+        return end
+
+    def find_all(self, text: str) -> List[IntentMatch]:
+        """Toutes les intentions trouvées, dans l'ordre du texte, avec leur position"""
+        if not text:
+            return []
+        intents = self.intents
+        words = self._words
+        phrases = self._phrases
+        matches = []
+        for m in _WORD.finditer(text):
+            token = m.group().lower()
+            for rank in words.get(token, ()):
+                matches.append(IntentMatch(intents[rank], m.start(), m.end(), m.group()))
+            for phrase, rank in phrases.get(token, ()):
+                end = self._phrase_end(text, m.start(), phrase)
+                if end is not None:
+                    matches.append(IntentMatch(intents[rank], m.start(), end, text[m.start():end]))
+        if self._regexes:
+            for rank, regex in self._regexes:
+                for m in regex.finditer(text):
+                    matches.append(IntentMatch(intents[rank], m.start(), m.end(), m.group()))
+            matches.sort(key=lambda match: match.start)
+        return matches
+
+    def primary(self, matches: List[IntentMatch]) -> str:
+        """Intention la plus prioritaire parmi celles trouvées"""
+        if not matches:
+            return DEFAULT_INTENT
+        return min((m.intent for m in matches), key=self.intents.index)
+
+    def classify(self, text: str) -> str:
+        """Intention principale du texte ('general' si aucune)"""
+        if not text:
+            return DEFAULT_INTENT
+        words = self._words
+        phrases = self._phrases
+        best = len(self.intents)
+        lower = text.lower()
+        for m in _WORD.finditer(lower):
+            token = m.group()
+            ranks = words.get(token)
+            if ranks and ranks[0] < best:
+                best = ranks[0]
+            for phrase, rank in phrases.get(token, ()):
+                if rank < best and self._phrase_end(lower, m.start(), phrase) is not None:
+                    best = rank
+            if best == 0:
+                break
+        for rank, regex in self._regexes:
+            if rank >= best:
+                break
+            if regex.search(lower):
+                best = rank
+                break
+        return self.intents[best] if best < len(self.intents) else DEFAULT_INTENT
+
+
+class IntentRegistry:
+    """Intentions définies en base, invalidées par version"""
+
+    def __init__(self, check_interval: float = 2.0):
+        self.check_interval = check_interval
+        self._version: Optional[int] = None
+        self._patterns: Dict[str, Tuple[str, ...]] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def patterns(self) -> Tuple[Optional[int], Dict[str, Tuple[str, ...]]]:
+        """
+        (version, nom -> mots-clés) des intentions actives, par priorité décroissante
+
+        Hors contexte d'application (scripts, benchmarks), la dernière
+        version chargée est renvoyée telle quelle.
+        """
+        now = time.monotonic()
+        if not has_app_context() or (self._version is not None and now - self._checked_at < self.check_interval):
+            return self._version, self._patterns
+
+        version = read_version(INTENTS_VERSION_KEY)
+        with self._lock:
+            if version != self._version:
+                rows = IntentPattern.query.filter_by(is_active=True).order_by(
+                    IntentPattern.priority.desc(), IntentPattern.id
+                ).all()
+                patterns = {}
+                for row in rows:
+                    keywords = parse_keywords(row.keywords)
+                    if keywords:
+                        patterns[row.name] = keywords
+                self._patterns = patterns
+                self._version = version
+                self.loads += 1
+            self._checked_at = now
+            return self._version, self._patterns
+
+    def invalidate(self):
+        """
+        Signaler une modification des intentions
+
+        À appeler avant db.session.commit(): la nouvelle version est écrite
+        dans la même transaction que la modification.
+        """
+        bump_version(INTENTS_VERSION_KEY)
+        self._checked_at = 0.0
+
+    def stats(self) -> Dict:
+        return {
+            'version': self._version,
+            'custom_intents': list(self._patterns),
+            'loads': self.loads
+        }
+
+
+intent_registry = IntentRegistry(check_interval=Config.INTENTS_VERSION_CHECK_INTERVAL)
@@ -0,0 +1,128 @@
+"""
+Recherche multi-mots-clés compilée (automate d'Aho-Corasick)
+
+L'automate est construit une fois à partir des règles actives (dans l'ordre
+de priorité) et trouve toutes les règles correspondantes en un seul passage
+sur le message, sans compiler de regex à chaque événement.
+"""
+
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def fold_text(text: str, fold_accents: bool = True) -> str:
+    """Minuscules et, optionnellement, suppression des accents (é -> e)"""
+    text = (text or '').lower()
+    if not fold_accents or text.isascii():
+        return text
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """
+    Automate d'Aho-Corasick sur les mots-clés de plusieurs règles
+
+    Args:
+        keywords: triggers des règles, déjà triés par priorité décroissante
+                  (chaque trigger est une liste de mots-clés séparés par des virgules)
+        whole_words: n'accepter que les mots-clés entourés de limites de mots
+        fold_accents: comparaison insensible aux accents
+    """
+
+    def __init__(self, keywords: Iterable[str], whole_words: bool = False,
+                 fold_accents: bool = True):
+        self.whole_words = whole_words
+        self.fold_accents = fold_accents
+
+        # Nœud 0 = racine
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, int]]] = [[]]
+
+        # Règles dont un mot-clé est vide: elles correspondent à tout
+        # (même comportement que `'' in message`)
+        self._always: Set[int] = set()
+
+        self.rule_count = 0
+        self.keyword_count = 0
+
+        for rule_index, trigger in enumerate(keywords):
+            self.rule_count += 1
+            for keyword in (trigger or '').split(','):
+                keyword = fold_text(keyword.strip(), fold_accents)
+                if not keyword:
+                    self._always.add(rule_index)
+                    continue
+                self._add(keyword, rule_index)
+                self.keyword_count += 1
+
+        self._build_failure_links()
+
+    def _add(self, keyword: str, rule_index: int):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((rule_index, len(keyword)))
+
+    def _build_failure_links(self):
+        """Parcours en largeur: liens d'échec et fusion des sorties"""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                if self._output[self._fail[child]]:
+                    self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _is_whole_word(self, text: str, end: int, length: int) -> bool:
+        start = end - length + 1
+        if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+            return False
+        if end + 1 < len(text) and _is_word_char(text[end + 1]) and _is_word_char(text[end]):
+            return False
+        return True
+
+    def find_all(self, text: str) -> List[int]:
+        """Indices (ordre de priorité) de toutes les règles trouvées dans le texte"""
+        text = fold_text(text, self.fold_accents)
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        whole_words = self.whole_words
+
+        found = set(self._always)
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                for rule_index, length in output[node]:
+                    if not whole_words or self._is_whole_word(text, position, length):
+                        found.add(rule_index)
+
+        return sorted(found)
+
+    def first_match(self, text: str) -> Optional[int]:
+        """Indice de la règle la plus prioritaire trouvée (ou None)"""
+        found = self.find_all(text)
+        return found[0] if found else None
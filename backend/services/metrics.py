@@ -0,0 +1,222 @@
+"""
+Métriques du traitement des événements (format texte Prometheus)
+
+Compteurs et histogrammes en mémoire, exposés par GET /metrics. Chaque
+étape des handlers (déduplication, vérification /me, profil, recherche
+de réponse, écriture en base, envoi Graph) est chronométrée dans un
+histogramme; un passage coûte un perf_counter() et un incrément sous
+verrou.
+
+Les valeurs sont propres à chaque processus: avec plusieurs workers
+gunicorn, chaque scrape voit le worker qui répond (étiquette `pid`).
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Secondes: de 0,5 ms (étapes en mémoire) à 10 s (appels Graph lents)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Compteur par combinaison d'étiquettes"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def snapshot(self) -> Dict[Tuple, float]:
+        """Copie des valeurs par combinaison d'étiquettes"""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {value}'
+
+
+class _Timer:
+    __slots__ = ('histogram', 'label_values', 'started')
+
+    def __init__(self, histogram: 'Histogram', label_values: Tuple):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+        return False
+
+
+class Histogram:
+    """Histogramme à buckets fixes (compte, somme, buckets cumulés à l'export)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # étiquettes -> [compte par bucket (+Inf en dernier), somme, total]
+        self._values: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, *label_values) -> _Timer:
+        """with histogram.time('message', 'dedup'): ..."""
+        return _Timer(self, label_values)
+
+    def count(self, *label_values) -> int:
+        state = self._values.get(label_values)
+        return state[2] if state else 0
+
+    def snapshot(self) -> Dict[Tuple, Tuple[int, float]]:
+        """(compte, somme) par combinaison d'étiquettes"""
+        with self._lock:
+            return {k: (v[2], v[1]) for k, v in self._values.items()}
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        for label_values, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                yield f'{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, label_values)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labels, label_values)} {count}'
+
+
+class Gauge:
+    """Valeur lue au moment du scrape"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def samples(self) -> Iterator[str]:
+        try:
+            value = self.read()
+        except Exception:
+            return
+        if value is not None:
+            yield f'{self.name} {value}'
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées par /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Réenregistrement (create_app appelé plusieurs fois): garder la première
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> Gauge:
+        with self._lock:
+            # La fonction de lecture peut changer (nouvelle app): on la remplace
+            self._metrics[name] = Gauge(name, documentation, read)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        """Exposition au format texte Prometheus 0.0.4"""
+        lines = [
+            '# HELP chatbot_process_info Processus qui a répondu au scrape',
+            '# TYPE chatbot_process_info gauge',
+            f'chatbot_process_info{{pid="{os.getpid()}"}} 1'
+        ]
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# ---------- Métriques du traitement des événements ----------
+
+events = registry.counter(
+    'chatbot_events_total',
+    'Événements webhook par canal, page (ID Graph) et issue '
+    '(received, deduped, replied, unanswered, ignored, failed)',
+    ('channel', 'page', 'outcome')
+)
+stage_seconds = registry.histogram(
+    'chatbot_stage_seconds',
+    'Durée de chaque étape du traitement d\'un événement',
+    ('channel', 'stage')
+)
+replies = registry.counter(
+    'chatbot_replies_total',
+    'Réponses envoyées par le dispatcher (sent, retry, failed)',
+    ('channel', 'page', 'status')
+)
+graph_errors = registry.counter(
+    'chatbot_graph_errors_total',
+    'Erreurs renvoyées par le Graph API, par code',
+    ('code',)
+)
+rule_hits = registry.counter(
+    'chatbot_rule_hits_total',
+    'Règles de réponse retenues, par règle et méthode (keyword, similarity)',
+    ('rule_id', 'method')
+)
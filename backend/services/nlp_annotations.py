@@ -0,0 +1,108 @@
+"""
+Analyse NLP enregistrée avec chaque message/commentaire
+
+L'intention, le sentiment et le nombre de tokens sont calculés une fois
+à la réception et stockés sur la ligne, avec la version de l'analyseur.
+Les statistiques NLP deviennent des agrégats SQL; quand les règles de
+NLPChatbot changent, `flask nlp-reanalyze` recalcule les lignes dont la
+version est différente.
+"""
+
+from typing import Dict, Optional
+
+import click
+from sqlalchemy import or_
+
+from models import db, Message, Comment
+from services.response_service import ResponseService
+from services.nlp_rollups import nlp_rollups
+
+# Modèle -> colonne du texte analysé
+TEXT_COLUMNS = {
+    Message: 'message_text',
+    Comment: 'comment_text'
+}
+
+CHANNELS = {
+    Message: 'message',
+    Comment: 'comment'
+}
+
+
+class NLPAnnotator:
+    """Colonnes d'analyse à l'enregistrement et recalcul par lots"""
+
+    @property
+    def version(self) -> str:
+        return ResponseService.chatbot.analyzer_version
+
+    def columns(self, analysis: Optional[Dict], response_text: Optional[str] = None) -> Dict:
+        """Valeurs des colonnes d'analyse pour Message(...) / Comment(...)"""
+        chatbot = ResponseService.chatbot
+        values = {
+            'intent': None,
+            'sentiment': None,
+            'sentiment_score': None,
+            'token_count': None,
+            'response_sentiment': chatbot.analyze_sentiment(response_text)['sentiment'] if response_text else None,
+            'analyzer_version': chatbot.analyzer_version
+        }
+        if analysis:
+            values.update({
+                'intent': analysis['intent'],
+                'sentiment': analysis['sentiment']['sentiment'],
+                'sentiment_score': analysis['sentiment']['score'],
+                'token_count': len(analysis['tokens'])
+            })
+        return values
+
+    def annotate(self, row):
+        """(Re)calculer l'analyse d'une ligne existante (et ses agrégats)"""
+        channel = CHANNELS[type(row)]
+        text = getattr(row, TEXT_COLUMNS[type(row)])
+        analysis = ResponseService.analyze_message_details(text) if text else None
+
+        nlp_rollups.record(channel, row, delta=-1)
+        for column, value in self.columns(analysis, row.response_sent).items():
+            setattr(row, column, value)
+        nlp_rollups.record(channel, row)
+
+    def _stale(self, model):
+        return or_(model.analyzer_version.is_(None), model.analyzer_version != self.version)
+
+    def pending(self) -> int:
+        """Lignes sans analyse ou analysées par une autre version"""
+        return sum(model.query.filter(self._stale(model)).count() for model in TEXT_COLUMNS)
+
+    def reanalyze(self, batch_size: int = 500, limit: Optional[int] = None) -> int:
+        """Recalculer les lignes obsolètes par lots (un commit par lot)"""
+        done = 0
+        for model in TEXT_COLUMNS:
+            last_id = 0
+            while limit is None or done < limit:
+                size = batch_size if limit is None else min(batch_size, limit - done)
+                rows = model.query.filter(
+                    model.id > last_id, self._stale(model)
+                ).order_by(model.id).limit(size).all()
+                if not rows:
+                    break
+                for row in rows:
+                    self.annotate(row)
+                db.session.commit()
+                done += len(rows)
+                last_id = rows[-1].id
+        return done
+
+    def init_app(self, app):
+        """Commande Flask CLI: nlp-reanalyze"""
+
+        @app.cli.command('nlp-reanalyze')
+        @click.option('--batch-size', default=500, show_default=True)
+        def nlp_reanalyze(batch_size):
+            """Recalculer l'analyse NLP des messages/commentaires obsolètes"""
+            click.echo(f'🧠 Analyseur {self.version}: {self.pending()} ligne(s) à recalculer')
+            done = self.reanalyze(batch_size=batch_size)
+            click.echo(f'✅ {done} ligne(s) analysée(s)')
+
+
+nlp_annotator = NLPAnnotator()
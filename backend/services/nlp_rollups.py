@@ -0,0 +1,308 @@
+"""
+Agrégats NLP par tranche de temps (sentiment / intention)
+
+Chaque message/commentaire analysé incrémente une tranche horaire
+(page × canal × intention × sentiment -> nombre, somme des scores) dans
+la même transaction. Un thread de fond replie les tranches horaires
+anciennes en tranches journalières. Les statistiques d'une période
+additionnent les tranches au lieu de parcourir les lignes.
+
+Les écritures vont toujours dans les tranches horaires (y compris les
+corrections de `flask nlp-reanalyze`); une même journée peut donc avoir
+une tranche journalière et des tranches horaires, dont la somme reste
+exacte. Les bornes d'une période sont arrondies au début de la tranche.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import click
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Message, Comment, NlpRollup
+from services.structured_logging import get_logger
+
+log = get_logger('nlp_rollups')
+
+_DIALECT_INSERTS = {
+    'postgresql': pg_insert,
+    'sqlite': sqlite_insert
+}
+
+CHANNEL_MODELS = {
+    'message': Message,
+    'comment': Comment
+}
+
+_KEY_COLUMNS = ['granularity', 'bucket', 'page_id', 'channel', 'intent', 'sentiment']
+
+
+def floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _hour_expression(column, dialect_name: str):
+    if dialect_name == 'postgresql':
+        return func.date_trunc('hour', column)
+    return func.strftime('%Y-%m-%d %H:00:00', column)
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def hourly_history(conn):
+    """Tranches horaires recalculées depuis les lignes analysées (générateur de dicts)"""
+    for channel, model in CHANNEL_MODELS.items():
+        hour = _hour_expression(model.timestamp, conn.dialect.name)
+        page_id = func.coalesce(model.page_id, 0)
+        rows = conn.execute(
+            select(hour, page_id, model.intent, model.sentiment,
+                   func.count(model.id), func.coalesce(func.sum(model.sentiment_score), 0.0))
+            .where(model.intent.isnot(None), model.sentiment.isnot(None))
+            .group_by(hour, page_id, model.intent, model.sentiment)
+        )
+        for bucket, row_page_id, intent, sentiment, count, score_sum in rows:
+            yield {
+                'granularity': 'hour',
+                'bucket': _as_datetime(bucket),
+                'page_id': row_page_id,
+                'channel': channel,
+                'intent': intent,
+                'sentiment': sentiment,
+                'count': count,
+                'score_sum': float(score_sum)
+            }
+
+
+class NlpRollups:
+    """Mise à jour, compaction et lecture des tranches NLP"""
+
+    def __init__(self):
+        self.app = None
+        self.hourly_retention = 48
+        self.compact_interval = 3600.0
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.compactions = 0
+        self.compacted_rows = 0
+        self.last_compaction = None
+
+    # ---------- Écriture ----------
+
+    def _upsert(self, rows: List[Dict]):
+        """Ajouter count/score_sum aux tranches (un seul executemany)"""
+        if not rows:
+            return
+        insert = _DIALECT_INSERTS.get(db.engine.dialect.name)
+
+        if insert is not None:
+            statement = insert(NlpRollup)
+            statement = statement.on_conflict_do_update(
+                index_elements=_KEY_COLUMNS,
+                set_={
+                    'count': NlpRollup.count + statement.excluded.count,
+                    'score_sum': NlpRollup.score_sum + statement.excluded.score_sum
+                }
+            )
+            db.session.execute(statement, rows)
+            return
+
+        for values in rows:
+            key = tuple(values[column] for column in _KEY_COLUMNS)
+            rollup = db.session.get(NlpRollup, key, with_for_update=True)
+            if rollup is None:
+                db.session.add(NlpRollup(**values))
+            else:
+                rollup.count += values['count']
+                rollup.score_sum += values['score_sum']
+
+    def record(self, channel: str, row, delta: int = 1):
+        """
+        Ajouter (delta=1) ou retirer (delta=-1) une ligne analysée de sa tranche horaire
+
+        Dans la transaction courante: l'appelant fait le commit.
+        """
+        if row.intent is None or row.sentiment is None:
+            return
+        self._upsert([{
+            'granularity': 'hour',
+            'bucket': floor_hour(row.timestamp or datetime.utcnow()),
+            'page_id': row.page_id or 0,
+            'channel': channel,
+            'intent': row.intent,
+            'sentiment': row.sentiment,
+            'count': delta,
+            'score_sum': delta * (row.sentiment_score or 0.0)
+        }])
+
+    # ---------- Compaction ----------
+
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """
+        Replier les tranches horaires des journées terminées depuis plus de
+        `hourly_retention` heures en tranches journalières (commit)
+
+        Returns:
+            Nombre de tranches horaires repliées
+        """
+        cutoff = floor_day((now or datetime.utcnow()) - timedelta(hours=self.hourly_retention))
+        condition = (NlpRollup.granularity == 'hour') & (NlpRollup.bucket < cutoff)
+        columns = (NlpRollup.bucket, NlpRollup.page_id, NlpRollup.channel,
+                   NlpRollup.intent, NlpRollup.sentiment, NlpRollup.count, NlpRollup.score_sum)
+
+        if db.engine.dialect.delete_returning:
+            # DELETE ... RETURNING: chaque tranche n'est repliée qu'une fois, même entre workers
+            rows = db.session.execute(delete(NlpRollup).where(condition).returning(*columns)).all()
+        else:
+            rows = db.session.execute(select(*columns).where(condition).with_for_update()).all()
+            db.session.execute(delete(NlpRollup).where(condition))
+
+        daily: Dict[tuple, list] = {}
+        for bucket, page_id, channel, intent, sentiment, count, score_sum in rows:
+            key = (floor_day(bucket), page_id, channel, intent, sentiment)
+            totals = daily.setdefault(key, [0, 0.0])
+            totals[0] += count
+            totals[1] += score_sum
+
+        self._upsert([
+            {
+                'granularity': 'day',
+                'bucket': day,
+                'page_id': page_id,
+                'channel': channel,
+                'intent': intent,
+                'sentiment': sentiment,
+                'count': count,
+                'score_sum': score_sum
+            }
+            for (day, page_id, channel, intent, sentiment), (count, score_sum) in daily.items()
+            if count or abs(score_sum) > 1e-9
+        ])
+
+        db.session.commit()
+
+        with self._lock:
+            self.compactions += 1
+            self.compacted_rows += len(rows)
+            self.last_compaction = datetime.utcnow()
+        return len(rows)
+
+    def rebuild(self) -> int:
+        """Recalculer toutes les tranches depuis les lignes analysées, puis compacter"""
+        NlpRollup.query.delete()
+        rows = list(hourly_history(db.session.connection()))
+        if rows:
+            db.session.execute(NlpRollup.__table__.insert(), rows)
+        db.session.commit()
+        self.compact()
+        return len(rows)
+
+    # ---------- Lecture ----------
+
+    def totals(self, start: datetime, end: Optional[datetime] = None,
+               page_id: Optional[int] = None, channel: Optional[str] = None) -> Dict:
+        """
+        Nombres par sentiment et par intention sur [start, end[
+
+        Returns:
+            {'sentiments': {sentiment: count}, 'intents': {intent: count},
+             'total': int, 'score_sum': float}
+        """
+        query = db.session.query(
+            NlpRollup.intent, NlpRollup.sentiment,
+            func.sum(NlpRollup.count), func.sum(NlpRollup.score_sum)
+        ).filter(
+            ((NlpRollup.granularity == 'hour') & (NlpRollup.bucket >= floor_hour(start))) |
+            ((NlpRollup.granularity == 'day') & (NlpRollup.bucket >= floor_day(start)))
+        )
+        if end is not None:
+            query = query.filter(NlpRollup.bucket < end)
+        if page_id is not None:
+            query = query.filter(NlpRollup.page_id == page_id)
+        if channel is not None:
+            query = query.filter(NlpRollup.channel == channel)
+
+        sentiments: Dict[str, int] = {}
+        intents: Dict[str, int] = {}
+        total = 0
+        score_sum = 0.0
+        for intent, sentiment, count, scores in query.group_by(NlpRollup.intent, NlpRollup.sentiment):
+            count = int(count or 0)
+            if not count:
+                continue
+            sentiments[sentiment] = sentiments.get(sentiment, 0) + count
+            intents[intent] = intents.get(intent, 0) + count
+            total += count
+            score_sum += scores or 0.0
+
+        return {'sentiments': sentiments, 'intents': intents, 'total': total, 'score_sum': score_sum}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'compactions': self.compactions,
+                'compacted_rows': self.compacted_rows,
+                'last_compaction': self.last_compaction.isoformat() if self.last_compaction else None,
+                'hourly_retention_hours': self.hourly_retention
+            }
+
+    # ---------- Thread de compaction ----------
+
+    def init_app(self, app):
+        self.app = app
+        self.hourly_retention = app.config.get('NLP_ROLLUP_HOURLY_RETENTION', 48)
+        self.compact_interval = app.config.get('NLP_ROLLUP_COMPACT_INTERVAL', 3600.0)
+
+        if self.compact_interval > 0:
+            # Démarrage au premier appel HTTP (après le fork gunicorn), pas dans les scripts
+            app.before_request(self._ensure_started)
+
+        @app.cli.command('rollups-rebuild')
+        def rollups_rebuild():
+            """Recalculer les agrégats NLP depuis les messages/commentaires analysés"""
+            rows = self.rebuild()
+            click.echo(f'✅ Agrégats NLP recalculés ({rows} tranches horaires)')
+
+        @app.cli.command('rollups-compact')
+        def rollups_compact():
+            """Replier les tranches horaires anciennes en tranches journalières"""
+            rows = self.compact()
+            click.echo(f'✅ {rows} tranche(s) horaire(s) repliée(s)')
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() or self.app is None:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='nlp-rollups', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.compact()
+                except Exception:
+                    log.exception('Compaction des agrégats NLP impossible')
+                    db.session.rollback()
+            time.sleep(self.compact_interval)
+
+
+nlp_rollups = NlpRollups()
@@ -0,0 +1,487 @@
+"""
+Dispatcher des réponses sortantes (messages privés et réponses aux commentaires)
+
+Les réponses sont enregistrées dans la table outbound_reply dans la même
+transaction que le message/commentaire reçu, puis envoyées par un thread
+de fond au rythme d'un token bucket par page. Le débit s'adapte aux
+en-têtes X-App-Usage / X-Page-Usage / X-Business-Use-Case-Usage, et les
+erreurs de limite de débit (4, 17, 32, 613) replanifient l'envoi au lieu
+de le perdre. Les autres erreurs temporaires sont réessayées avec un
+backoff exponentiel (avec jitter); les erreurs définitives marquent la
+réponse 'failed' sans écraser le texte prévu. L'état est en base: rien
+n'est perdu au redémarrage.
+
+Chaque worker gunicorn fait tourner son dispatcher avec ses propres seaux:
+le débit par page (OUTBOUND_RATE_PER_PAGE, OUTBOUND_BURST) est donc divisé
+par OUTBOUND_PROCESSES pour que la somme des workers respecte la limite.
+Une ligne est réservée (pending -> sending) avant de prendre un jeton: un
+worker ne consomme de jeton que pour les lignes qu'il a obtenues.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, update
+
+from models import db, Message, Comment, OutboundReply
+from services.facebook_service import FacebookService
+from services.stats_counters import stats_counters
+from services.metrics import replies, stage_seconds
+from services.page_registry import page_registry
+from services.structured_logging import get_logger, log_context
+
+log = get_logger('outbound')
+
+# Codes d'erreur Graph API de limite de débit
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613}
+
+# Erreurs temporaires (réseau, erreurs serveur Facebook): nouvel essai
+RETRYABLE_ERROR_CODES = {'NETWORK_ERROR', 'JSON_ERROR', 'UNKNOWN_ERROR', 1, 2}
+
+# Erreurs définitives (paramètre invalide, token expiré, permission): pas de nouvel essai
+PERMANENT_ERROR_CODES = {'PAGE_NOT_FOUND', 10, 100, 190, 200}
+
+
+def classify_error(code) -> str:
+    """'rate_limit', 'retryable' ou 'permanent' selon le code d'erreur Graph"""
+    if code in RATE_LIMIT_ERROR_CODES:
+        return 'rate_limit'
+    if code in RETRYABLE_ERROR_CODES:
+        return 'retryable'
+    if code in PERMANENT_ERROR_CODES or (isinstance(code, int) and 200 <= code < 300):
+        return 'permanent'
+    # Code inconnu: réessayer, dans la limite du nombre de tentatives
+    return 'retryable'
+
+
+def backoff_delay(attempts: int, base: float, maximum: float) -> float:
+    """Backoff exponentiel avec jitter: entre la moitié et la totalité du délai"""
+    delay = min(maximum, base * (2 ** max(0, attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class TokenBucket:
+    """Seau à jetons: `rate` envois par seconde, rafales jusqu'à `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self) -> float:
+        """Prendre un jeton; sinon renvoyer le délai d'attente en secondes"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+def parse_usage_headers(headers: Dict) -> Tuple[float, Optional[float]]:
+    """
+    Utilisation maximale (%) et délai de récupération (secondes) annoncés par Facebook
+    """
+    usage = 0.0
+    regain_seconds = None
+
+    for name in ('X-App-Usage', 'X-Page-Usage'):
+        raw = headers.get(name)
+        if not raw:
+            continue
+        try:
+            values = json.loads(raw)
+            usage = max(usage, *(float(values.get(k, 0)) for k in ('call_count', 'total_cputime', 'total_time')))
+        except (ValueError, TypeError, AttributeError):
+            continue
+
+    raw = headers.get('X-Business-Use-Case-Usage')
+    if raw:
+        try:
+            for entries in json.loads(raw).values():
+                for entry in entries:
+                    usage = max(usage, *(float(entry.get(k, 0)) for k in ('call_count', 'total_cputime', 'total_time')))
+                    minutes = entry.get('estimated_time_to_regain_access')
+                    if minutes:
+                        regain_seconds = max(regain_seconds or 0, float(minutes) * 60)
+        except (ValueError, TypeError, AttributeError):
+            pass
+
+    return usage, regain_seconds
+
+
+def throttle_factor(usage: float) -> float:
+    """Facteur de débit selon l'utilisation du quota (1 = plein débit)"""
+    if usage < 50:
+        return 1.0
+    if usage >= 100:
+        return 0.0
+    # Décroissance linéaire de 100% du débit à 50% d'utilisation vers 10% à 100%
+    return max(0.1, 1.0 - (usage - 50) / 50 * 0.9)
+
+
+class OutboundDispatcher:
+    """File persistante + envoi cadencé par page"""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = True
+        self.rate = 2.0
+        self.burst = 10
+        self.processes = 1
+        self.poll_interval = 1.0
+        self.rate_limit_delay = 60
+        self.max_attempts = 8
+        self.retry_base_delay = 5.0
+        self.retry_max_delay = 3600.0
+        self.batch_size = 50
+        self._next_wait = 1.0
+
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        self.sent = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self.retried = 0
+        self.deferred = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('OUTBOUND_DISPATCHER', True)
+        # Part de ce processus du débit par page
+        self.processes = max(1, app.config.get('OUTBOUND_PROCESSES', 1))
+        self.rate = app.config.get('OUTBOUND_RATE_PER_PAGE', 2.0) / self.processes
+        self.burst = max(1.0, app.config.get('OUTBOUND_BURST', 10) / self.processes)
+        self.poll_interval = app.config.get('OUTBOUND_POLL_INTERVAL', 1.0)
+        self.rate_limit_delay = app.config.get('OUTBOUND_RATE_LIMIT_DELAY', 60)
+        self.max_attempts = app.config.get('OUTBOUND_MAX_ATTEMPTS', 8)
+        self.retry_base_delay = app.config.get('OUTBOUND_RETRY_BASE_DELAY', 5.0)
+        self.retry_max_delay = app.config.get('OUTBOUND_RETRY_MAX_DELAY', 3600.0)
+        app.extensions['outbound_dispatcher'] = self
+
+        if self.enabled:
+            # Démarrage au premier appel HTTP (après le fork gunicorn), pas dans les scripts
+            app.before_request(self._ensure_started)
+
+    # ---------- File ----------
+
+    def enqueue(self, page_id: int, channel: str, recipient_id: str, response_text: str,
+                message: Optional[Message] = None, comment: Optional[Comment] = None) -> OutboundReply:
+        """
+        Ajouter une réponse à envoyer dans la session courante
+
+        L'appelant fait le commit (même transaction que le message reçu).
+        """
+        reply = OutboundReply(
+            page_id=page_id,
+            channel=channel,
+            recipient_id=str(recipient_id),
+            response_text=response_text,
+            status='pending',
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+            message_id=message.id if message is not None else None,
+            comment_id=comment.id if comment is not None else None
+        )
+        db.session.add(reply)
+        return reply
+
+    def submit(self, reply: OutboundReply):
+        """Après le commit: réveiller le dispatcher, ou envoyer tout de suite s'il est désactivé"""
+        if not self.enabled:
+            self.deliver(reply)
+            return
+        self._ensure_started()
+        self._wake.set()
+
+    # ---------- Cadence par page ----------
+
+    def _bucket(self, page_id: int) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(page_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[page_id] = bucket
+            return bucket
+
+    def _adapt(self, page_id: int, headers: Dict) -> Optional[float]:
+        """Ajuster le débit de la page selon les en-têtes d'utilisation"""
+        if not headers:
+            return None
+        usage, regain_seconds = parse_usage_headers(headers)
+        bucket = self._bucket(page_id)
+        factor = throttle_factor(usage)
+        if factor == 0.0:
+            bucket.pause(regain_seconds or self.rate_limit_delay)
+        else:
+            bucket.set_rate(bucket.base_rate * factor)
+        return regain_seconds
+
+    # ---------- Envoi ----------
+
+    def deliver(self, reply: OutboundReply) -> bool:
+        """Envoyer une réponse et enregistrer le résultat (commit)"""
+        with log_context(reply_id=reply.id, channel=reply.channel, page_id=reply.page_id):
+            return self._deliver(reply)
+
+    def _deliver(self, reply: OutboundReply) -> bool:
+        page = page_registry.get(reply.page_id) if reply.page_id else None
+        reply.attempts = (reply.attempts or 0) + 1
+
+        if page is None:
+            self._fail(reply, 'PAGE_NOT_FOUND', 'Page introuvable')
+            replies.inc(reply.channel, '', 'failed')
+            db.session.commit()
+            return False
+
+        fb_service = FacebookService(page.access_token)
+        with stage_seconds.time(reply.channel, 'graph_send'):
+            if reply.channel == 'comment':
+                result = fb_service.reply_to_comment(reply.recipient_id, reply.response_text)
+            else:
+                result = fb_service.send_message(reply.recipient_id, reply.response_text)
+
+        regain_seconds = self._adapt(page.id, fb_service.last_usage_headers)
+
+        if 'error' not in result:
+            reply.status = 'sent'
+            reply.sent_at = datetime.utcnow()
+            reply.last_error_code = None
+            reply.last_error = None
+            with self._lock:
+                self.sent += 1
+            replies.inc(reply.channel, page.page_id, 'sent')
+            db.session.commit()
+            return True
+
+        error = result['error']
+        code = error.get('code')
+        message = error.get('message', 'Erreur inconnue')
+        kind = classify_error(code)
+
+        if kind in ('rate_limit', 'retryable') and not self.enabled:
+            # Envoi immédiat sans thread de fond: une ligne replanifiée ne serait
+            # jamais reprise. 'failed' peut être relancé (/deliveries/<id>/retry)
+            self._fail(reply, code, message)
+        elif kind == 'rate_limit':
+            # Limite atteinte: ralentir la page et replanifier, sans rien perdre
+            delay = regain_seconds or self.rate_limit_delay
+            self._bucket(page.id).pause(delay)
+            self._retry(reply, code, message, delay)
+            with self._lock:
+                self.rate_limited += 1
+            log.warning('Limite de débit Graph API, nouvel essai dans %.0fs', delay, extra={'code': code})
+        elif kind == 'retryable' and reply.attempts < self.max_attempts:
+            delay = backoff_delay(reply.attempts, self.retry_base_delay, self.retry_max_delay)
+            self._retry(reply, code, message, delay)
+            log.warning('Erreur temporaire, essai %d/%d, nouvel essai dans %.0fs',
+                        reply.attempts, self.max_attempts, delay, extra={'code': code})
+        else:
+            self._fail(reply, code, message)
+
+        replies.inc(reply.channel, page.page_id, 'failed' if reply.status == 'failed' else 'retry')
+        db.session.commit()
+        return False
+
+    def _retry(self, reply: OutboundReply, code, message: str, delay: float):
+        """Replanifier l'envoi dans `delay` secondes"""
+        reply.status = 'pending'
+        reply.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        reply.last_error_code = str(code) if code is not None else None
+        reply.last_error = message
+        with self._lock:
+            self.retried += 1
+
+    def _fail(self, reply: OutboundReply, code, message: str):
+        """
+        Échec définitif: la réponse reste en base avec son erreur
+
+        Le texte prévu (response_sent) est conservé; seul is_automated
+        indique que la réponse n'a pas été envoyée.
+        """
+        log.error('Échec d\'envoi: %s', message, extra={'code': code, 'recipient_id': reply.recipient_id})
+        reply.status = 'failed'
+        reply.last_error_code = str(code) if code is not None else None
+        reply.last_error = message
+        with self._lock:
+            self.failed += 1
+        self._set_automated(reply, False)
+
+    def can_retry(self, reply: OutboundReply) -> bool:
+        """Réponse relançable à la main: en échec, ou en attente et déjà échue"""
+        if reply.status == 'failed':
+            return True
+        return reply.status == 'pending' and reply.next_attempt_at is not None and \
+            reply.next_attempt_at <= datetime.utcnow()
+
+    def retry_now(self, reply: OutboundReply):
+        """Remettre une réponse en échec (ou en attente échue) dans la file (nouveau cycle de tentatives)"""
+        reply.status = 'pending'
+        reply.attempts = 0
+        reply.next_attempt_at = datetime.utcnow()
+        self._set_automated(reply, True)
+
+    def _set_automated(self, reply: OutboundReply, is_automated: bool):
+        """Mettre à jour is_automated du message/commentaire d'origine et les compteurs"""
+        if reply.message_id:
+            channel, source = 'message', db.session.get(Message, reply.message_id)
+        elif reply.comment_id:
+            channel, source = 'comment', db.session.get(Comment, reply.comment_id)
+        else:
+            return
+        if source is None:
+            return
+        stats_counters.move(channel, source, is_automated)
+        source.is_automated = is_automated
+
+    def dispatch_due(self) -> int:
+        """Envoyer les réponses arrivées à échéance; renvoie le nombre traité"""
+        now = datetime.utcnow()
+        due = OutboundReply.query.filter(
+            OutboundReply.status == 'pending',
+            OutboundReply.next_attempt_at <= now
+        ).order_by(OutboundReply.next_attempt_at, OutboundReply.id).limit(self.batch_size).all()
+
+        processed = 0
+        self._next_wait = self.poll_interval
+        for reply in due:
+            # Réserver la ligne d'abord (plusieurs workers gunicorn peuvent tourner):
+            # seul le worker qui l'obtient prend un jeton et modifie la ligne
+            claimed = db.session.execute(
+                update(OutboundReply)
+                .where(OutboundReply.id == reply.id, OutboundReply.status == 'pending',
+                       OutboundReply.next_attempt_at <= now)
+                .values(status='sending', next_attempt_at=datetime.utcnow())
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                continue
+
+            db.session.refresh(reply)
+            wait = self._bucket(reply.page_id).reserve()
+            if wait > 0:
+                self._next_wait = min(self._next_wait, wait)
+                # Pas de jeton pour cette page: rendre la ligne, sans bloquer les autres pages
+                reply.status = 'pending'
+                reply.next_attempt_at = now + timedelta(seconds=wait)
+                with self._lock:
+                    self.deferred += 1
+                db.session.commit()
+                continue
+
+            try:
+                self.deliver(reply)
+            except Exception as e:
+                log.exception('Erreur dispatcher', extra={'reply_id': reply.id})
+                # Le rollback annule aussi l'incrément de _deliver: tentative recomptée ici
+                db.session.rollback()
+                reply.attempts = (reply.attempts or 0) + 1
+                if reply.attempts >= self.max_attempts:
+                    self._fail(reply, 'UNKNOWN_ERROR', str(e))
+                else:
+                    delay = backoff_delay(reply.attempts, self.retry_base_delay, self.retry_max_delay)
+                    self._retry(reply, 'UNKNOWN_ERROR', str(e), delay)
+                db.session.commit()
+            processed += 1
+
+        return processed
+
+    def recover_stale(self, older_than: int = 300):
+        """Remettre en file les envois interrompus (crash pendant 'sending')"""
+        limit = datetime.utcnow() - timedelta(seconds=older_than)
+        db.session.execute(
+            update(OutboundReply)
+            .where(OutboundReply.status == 'sending', OutboundReply.next_attempt_at < limit)
+            .values(status='pending')
+        )
+        db.session.commit()
+
+    # ---------- Thread de fond ----------
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() or self.app is None:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._wake = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='outbound-dispatcher', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        with self.app.app_context():
+            try:
+                self.recover_stale()
+            except Exception as e:
+                log.warning('Reprise des envois interrompus impossible: %s', e)
+                db.session.rollback()
+
+        while True:
+            processed = 0
+            with self.app.app_context():
+                try:
+                    processed = self.dispatch_due()
+                except Exception:
+                    log.exception('Erreur dispatcher')
+                    db.session.rollback()
+            if not processed:
+                self._wake.wait(self._next_wait)
+                self._wake.clear()
+
+    def stats(self) -> Dict:
+        counts = dict(
+            db.session.query(OutboundReply.status, func.count(OutboundReply.id))
+            .group_by(OutboundReply.status).all()
+        )
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'processes': self.processes,
+                'queue': {status: counts.get(status, 0) for status in ('pending', 'sending', 'sent', 'failed')},
+                'sent': self.sent,
+                'rate_limited': self.rate_limited,
+                'retried': self.retried,
+                'deferred': self.deferred,
+                'failed': self.failed,
+                'pages': {
+                    str(page_id): {
+                        'rate_per_second': round(bucket.rate, 3),
+                        'paused_for_seconds': round(max(0.0, bucket.paused_until - time.monotonic()), 1)
+                    }
+                    for page_id, bucket in self._buckets.items()
+                }
+            }
+
+
+outbound_dispatcher = OutboundDispatcher()
@@ -0,0 +1,109 @@
+"""
+Cache de l'identité Graph des pages connectées
+
+Évite d'appeler /me à chaque événement webhook juste pour détecter les
+messages et commentaires publiés par notre propre page.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config import Config
+from services.http_client import get_session
+from services.structured_logging import get_logger
+
+log = get_logger('page_identity')
+
+
+class PageIdentityCache:
+    """Cache access_token -> ID Graph de la page, avec TTL"""
+
+    def __init__(self, ttl: float = 3600, failure_ttl: float = 60):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, access_token: str) -> Optional[str]:
+        """Lecture en mémoire uniquement (None si absent ou expiré)"""
+        with self._lock:
+            entry = self._entries.get(access_token)
+            if entry and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def set(self, access_token: str, page_fb_id: str, ttl: Optional[float] = None):
+        """Enregistrer l'ID Graph associé à un token"""
+        if not access_token or not page_fb_id:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[access_token] = (str(page_fb_id), time.monotonic() + ttl)
+
+    def invalidate(self, access_token: Optional[str] = None):
+        """Oublier un token (ou tout le cache)"""
+        with self._lock:
+            if access_token is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(access_token, None)
+
+    def fetch(self, access_token: str) -> Optional[str]:
+        """Interroger /me pour obtenir l'ID Graph de la page"""
+        try:
+            response = get_session().get(
+                f"{Config.FACEBOOK_GRAPH_URL}/{Config.FACEBOOK_GRAPH_VERSION}/me",
+                params={'access_token': access_token, 'fields': 'id'},
+                timeout=5
+            )
+            if response.status_code == 200:
+                return response.json().get('id')
+        except Exception:
+            log.warning('Impossible de vérifier l\'ID de la page via /me', exc_info=True)
+        return None
+
+    def resolve(self, access_token: str, fallback: Optional[str] = None) -> Optional[str]:
+        """
+        ID Graph de la page pour ce token
+
+        Consulte le cache, sinon /me une seule fois. Si /me échoue, l'ID
+        stocké en base (fallback) est mis en cache pour une courte durée.
+        """
+        page_fb_id = self.get(access_token)
+        if page_fb_id:
+            return page_fb_id
+
+        page_fb_id = self.fetch(access_token)
+        if page_fb_id:
+            self.set(access_token, page_fb_id)
+            return page_fb_id
+
+        if fallback:
+            self.set(access_token, fallback, ttl=self.failure_ttl)
+        return fallback
+
+    def is_own_page(self, access_token: str, author_id, fallback: Optional[str] = None) -> bool:
+        """L'auteur de l'événement est-il notre propre page ?"""
+        if not author_id:
+            return False
+        page_fb_id = self.resolve(access_token, fallback)
+        return bool(page_fb_id) and str(author_id) == str(page_fb_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+page_identity_cache = PageIdentityCache(
+    ttl=Config.PAGE_IDENTITY_TTL,
+    failure_ttl=min(60, Config.PAGE_IDENTITY_TTL)
+)
@@ -0,0 +1,123 @@
+"""
+Registre en mémoire des pages Facebook connectées
+
+Chaque entrée webhook porte l'ID Graph de la page concernée (entry['id']):
+le registre associe cet ID à la page (id interne, token, réglages) sans
+requête par événement. Il est rechargé d'un bloc quand les pages changent
+(connexion, activation, déconnexion); un compteur de version en base
+invalide les registres des autres workers gunicorn.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from config import Config
+from models import FacebookPage
+from services.rule_snapshot import bump_version, read_version
+
+PAGES_VERSION_KEY = 'pages'
+
+
+class PageEntry:
+    """Copie figée d'une FacebookPage (utilisable hors session)"""
+
+    __slots__ = ('id', 'page_id', 'page_name', 'access_token', 'is_active')
+
+    def __init__(self, page: FacebookPage):
+        self.id = page.id
+        self.page_id = str(page.page_id)
+        self.page_name = page.page_name
+        self.access_token = page.access_token
+        self.is_active = bool(page.is_active)
+
+
+class PageSnapshot:
+    """Pages indexées par ID Graph et par id interne"""
+
+    __slots__ = ('version', 'by_page_id', 'by_id', 'active')
+
+    def __init__(self, version: int, pages):
+        self.version = version
+        entries = [PageEntry(page) for page in pages]
+        self.by_page_id: Dict[str, PageEntry] = {e.page_id: e for e in entries}
+        self.by_id: Dict[int, PageEntry] = {e.id: e for e in entries}
+        self.active = tuple(e for e in entries if e.is_active)
+
+    @classmethod
+    def load(cls, version: int) -> 'PageSnapshot':
+        return cls(version, FacebookPage.query.order_by(FacebookPage.id).all())
+
+
+class PageRegistry:
+    """Registre des pages, invalidé par version"""
+
+    def __init__(self, check_interval: float = 2.0):
+        self.check_interval = check_interval
+        self._snapshot: Optional[PageSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fallbacks = 0
+        self.misses = 0
+
+    def _current(self) -> PageSnapshot:
+        """Instantané courant, rechargé si la version en base a changé"""
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+
+        version = read_version(PAGES_VERSION_KEY)
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = PageSnapshot.load(version)
+            self._checked_at = now
+            return self._snapshot
+
+    def resolve(self, page_fb_id) -> Optional[PageEntry]:
+        """
+        Page active destinataire d'une entrée webhook
+
+        Si l'ID Graph n'est pas connu (ID saisi différent de celui de Graph,
+        entrée sans id) et qu'une seule page est active, c'est elle qui est
+        utilisée, comme avant le routage par page.
+        """
+        snapshot = self._current()
+        page = snapshot.by_page_id.get(str(page_fb_id)) if page_fb_id else None
+        if page is not None and page.is_active:
+            self.hits += 1
+            return page
+        if page is None and len(snapshot.active) == 1:
+            self.fallbacks += 1
+            return snapshot.active[0]
+        self.misses += 1
+        return None
+
+    def get(self, page_id: int) -> Optional[PageEntry]:
+        """Page par id interne (active ou non)"""
+        return self._current().by_id.get(page_id)
+
+    def invalidate(self):
+        """
+        Signaler une modification des pages
+
+        À appeler avant db.session.commit(): la nouvelle version est écrite
+        dans la même transaction que la modification.
+        """
+        bump_version(PAGES_VERSION_KEY)
+        self._checked_at = 0.0
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            'pages': len(snapshot.by_id) if snapshot else 0,
+            'active_pages': len(snapshot.active) if snapshot else 0,
+            'version': snapshot.version if snapshot else None,
+            'hits': self.hits,
+            'fallbacks': self.fallbacks,
+            'misses': self.misses
+        }
+
+
+page_registry = PageRegistry(check_interval=Config.PAGE_REGISTRY_CHECK_INTERVAL)
@@ -0,0 +1,190 @@
+"""
+Cache des profils des expéditeurs (get_user_info)
+
+LRU en mémoire avec TTL, cache négatif pour les profils inaccessibles,
+et persistance optionnelle dans la table user_profile.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from models import db, UserProfile
+
+# Erreurs temporaires: ne pas les mettre en cache négatif
+TRANSIENT_ERROR_CODES = {'NETWORK_ERROR', 'JSON_ERROR', 'UNKNOWN_ERROR', 'BATCH_TIMEOUT',
+                         1, 2, 4, 17, 32, 341, 613}
+
+PROFILE_FIELDS = ('name', 'first_name', 'last_name')
+
+_MISSING = object()
+
+
+def _row_profile(row) -> Optional[Dict]:
+    if not row.is_accessible:
+        return None
+    return {field: getattr(row, field) for field in PROFILE_FIELDS if getattr(row, field)}
+
+
+class ProfileCache:
+    """Cache LRU (page, expéditeur) -> profil, avec TTL"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 86400,
+                 negative_ttl: float = 3600, persist: bool = False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.persist = persist
+
+        self._entries: 'OrderedDict[Tuple, Tuple[Optional[Dict], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    # ---------- Mémoire ----------
+
+    def _get(self, key: Tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            profile, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            if profile is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return profile
+
+    def _set(self, key: Tuple, profile: Optional[Dict], ttl: float):
+        with self._lock:
+            self._entries[key] = (profile, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, page_id=None, sender_id=None):
+        """Oublier un profil, ceux d'une page, ou tout le cache"""
+        with self._lock:
+            if page_id is None and sender_id is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if (page_id is None or key[0] == page_id) and (sender_id is None or key[1] == str(sender_id)):
+                    del self._entries[key]
+
+    # ---------- Base de données ----------
+
+    def _load(self, page_id, sender_id):
+        row = UserProfile.query.filter_by(page_id=page_id, sender_id=sender_id).first()
+        if row is None:
+            return _MISSING
+        ttl = self.ttl if row.is_accessible else self.negative_ttl
+        age = (datetime.utcnow() - row.fetched_at).total_seconds() if row.fetched_at else ttl
+        if age >= ttl:
+            return _MISSING
+        profile = _row_profile(row)
+        self._set((page_id, sender_id), profile, ttl - age)
+        with self._lock:
+            self.db_hits += 1
+        return profile
+
+    def _save(self, page_id, sender_id, profile: Optional[Dict]):
+        values = {field: (profile or {}).get(field) for field in PROFILE_FIELDS}
+        try:
+            with db.session.begin_nested():
+                row = UserProfile.query.filter_by(page_id=page_id, sender_id=sender_id).first()
+                if row is None:
+                    row = UserProfile(page_id=page_id, sender_id=sender_id)
+                    db.session.add(row)
+                for field, value in values.items():
+                    setattr(row, field, value)
+                row.is_accessible = profile is not None
+                row.fetched_at = datetime.utcnow()
+        except IntegrityError:
+            # Un autre worker vient d'enregistrer ce profil
+            pass
+
+    # ---------- API ----------
+
+    def get_profile(self, fb_service, page_id, sender_id) -> Optional[Dict]:
+        """
+        Profil de l'expéditeur: cache mémoire, puis base, puis Graph API
+
+        Returns:
+            dict du profil, ou None si le profil n'est pas accessible
+        """
+        sender_id = str(sender_id)
+        key = (page_id, sender_id)
+
+        profile = self._get(key)
+        if profile is not _MISSING:
+            return profile
+
+        if self.persist:
+            profile = self._load(page_id, sender_id)
+            if profile is not _MISSING:
+                return profile
+
+        with self._lock:
+            self.misses += 1
+
+        result = fb_service.get_user_info(sender_id)
+
+        if 'error' in result:
+            code = result['error'].get('code')
+            if code in TRANSIENT_ERROR_CODES:
+                # Ne pas mémoriser: on réessaiera au prochain message
+                with self._lock:
+                    self.errors += 1
+                return None
+            profile = None
+            self._set(key, None, self.negative_ttl)
+        else:
+            profile = {field: result.get(field) for field in PROFILE_FIELDS if result.get(field)}
+            self._set(key, profile, self.ttl)
+
+        if self.persist:
+            self._save(page_id, sender_id, profile)
+
+        return profile
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.db_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'evictions': self.evictions,
+                'hit_ratio': round((lookups - self.misses) / lookups, 3) if lookups else 0.0,
+                'ttl_seconds': self.ttl,
+                'negative_ttl_seconds': self.negative_ttl,
+                'persist': self.persist
+            }
+
+
+profile_cache = ProfileCache(
+    max_size=Config.PROFILE_CACHE_SIZE,
+    ttl=Config.PROFILE_CACHE_TTL,
+    negative_ttl=Config.PROFILE_CACHE_NEGATIVE_TTL,
+    persist=Config.PROFILE_CACHE_PERSIST
+)
@@ -2,11 +2,21 @@
 Service de réponses automatiques avec NLP - VERSION INTÉGRÉE
 """
 
+import hashlib
+import json
 import re
 import string
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from difflib import SequenceMatcher
+from config import Config
 from models import db, AutoResponse
+from services.intent_classifier import IntentClassifier, intent_registry
+from services.metrics import rule_hits
+from services.rule_snapshot import rule_cache
+from services.similarity_index import SimilarityIndex
+from services.structured_logging import get_logger
+
+log = get_logger('responses')
 
 class NLPChatbot:
     """Chatbot avec capacités de traitement du langage naturel"""
@@ -20,7 +30,8 @@ class NLPChatbot:
             'nous', 'vous', 'ils', 'elles', 'en', 'y', 'dans', 'sur', 'est'
         }
         
-        # Patterns d'intentions
+        # Patterns d'intentions (par priorité; indexés par mot dans
+        # IntentClassifier, précédés des intentions définies en base)
         self.intent_patterns = {
             'salutation': r'\b(bonjour|bonsoir|salut|hello|hi|coucou)\b',
             'question_prix': r'\b(prix|coût|combien|tarif)\b',
@@ -40,6 +51,42 @@ class NLPChatbot:
             'negatif': ['mauvais', 'nul', 'horrible', 'problème', 'erreur',
                        'déçu', 'arnaque', 'pourri', 'pas content']
         }
+        
+        self._classifier: Optional[IntentClassifier] = None
+        self._classifier_version = None
+        self._analyzer_version: Optional[str] = None
+        self._analyzer_version_key = None
+    
+    @property
+    def intent_classifier(self) -> IntentClassifier:
+        """Index des intentions, reconstruit quand les intentions en base changent"""
+        version, custom = intent_registry.patterns()
+        if self._classifier is None or version != self._classifier_version:
+            patterns = dict(custom)
+            for intent, pattern in self.intent_patterns.items():
+                patterns.setdefault(intent, pattern)
+            self._classifier = IntentClassifier(patterns)
+            self._classifier_version = version
+        return self._classifier
+    
+    @property
+    def analyzer_version(self) -> str:
+        """
+        Identifiant des règles d'analyse: change dès qu'un pattern ou un mot change
+
+        Calculé une fois par version des intentions en base (lu pour chaque
+        message annoté); les règles intégrées ne changent qu'au déploiement.
+        """
+        version, custom = intent_registry.patterns()
+        if self._analyzer_version is None or version != self._analyzer_version_key:
+            rules = [sorted(self.stopwords), self.intent_patterns, self.sentiment_words]
+            if custom:
+                # Ordre significatif (priorité): liste plutôt que dict trié
+                rules.append(list(custom.items()))
+            rules = json.dumps(rules, sort_keys=True, ensure_ascii=False)
+            self._analyzer_version = hashlib.sha1(rules.encode()).hexdigest()[:12]
+            self._analyzer_version_key = version
+        return self._analyzer_version
     
     def preprocess_text(self, text: str) -> str:
         """Nettoyage et normalisation du texte"""
@@ -57,12 +104,12 @@ class NLPChatbot:
         return [t for t in tokens if t not in self.stopwords and len(t) > 2]
     
     def extract_intent(self, text: str) -> str:
-        """Reconnaître l'intention du message"""
-        text_lower = text.lower()
-        for intent, pattern in self.intent_patterns.items():
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return intent
-        return 'general'
+        """Reconnaître l'intention du message (la plus prioritaire trouvée)"""
+        return self.intent_classifier.classify(text)
+    
+    def extract_intents(self, text: str) -> List[Dict]:
+        """Toutes les intentions trouvées, avec leur position dans le texte"""
+        return [match._asdict() for match in self.intent_classifier.find_all(text)]
     
     def analyze_sentiment(self, text: str) -> Dict:
         """Analyser le sentiment du message"""
@@ -107,62 +154,34 @@ class NLPChatbot:
         # Moyenne pondérée
         return (seq_sim * 0.4 + jaccard_sim * 0.6)
     
-    def find_best_response(self, user_message: str, responses_db: List[Dict]) -> Optional[Dict]:
-        """Trouver la meilleure réponse avec scoring NLP"""
-        if not responses_db:
-            return None
-        
-        processed_message = self.preprocess_text(user_message)
-        active_responses = [r for r in responses_db if r.get('is_active', True)]
-        
-        if not active_responses:
-            return None
-        
-        scored_responses = []
-        
-        for response in active_responses:
-            keyword = response.get('trigger_keyword', '')
-            priority = response.get('priority', 0)
-            
-            # Calculer les scores
-            similarity = self.calculate_similarity(processed_message, keyword)
-            
-            # Vérifier correspondance exacte des mots-clés (comme l'ancien système)
-            keywords = [k.strip().lower() for k in keyword.split(',')]
-            keyword_match = 0.0
-            for kw in keywords:
-                if kw in processed_message or re.search(r'\b' + re.escape(kw) + r'\b', processed_message):
-                    keyword_match = 1.0
-                    break
-            
-            # Score final pondéré
-            final_score = (
-                similarity * 0.5 +
-                keyword_match * 0.4 +
-                (priority / 100) * 0.1
-            )
-            
-            scored_responses.append({
-                'response': response,
-                'score': final_score
-            })
+    def find_best_response(self, user_message: str, responses_db: List[Dict],
+                           index: Optional[SimilarityIndex] = None) -> Optional[Dict]:
+        """
+        Trouver la meilleure réponse avec scoring NLP
         
-        # Trier par score décroissant
-        scored_responses.sort(key=lambda x: x['score'], reverse=True)
+        Le scoring est vectorisé (SimilarityIndex); passer un index déjà
+        construit évite de re-tokeniser les mots-clés à chaque message.
+        """
+        if index is None:
+            if not responses_db:
+                return None
+            index = SimilarityIndex(responses_db, self)
         
-        # Retourner si score suffisant
-        best = scored_responses[0]
-        return best['response'] if best['score'] >= 0.3 else None
+        return index.best_match(user_message)
     
     def analyze_message(self, message: str) -> Dict:
         """Analyse complète d'un message"""
         processed = self.preprocess_text(message)
+        # Un seul passage: intention principale et liste complète
+        classifier = self.intent_classifier
+        intents = classifier.find_all(message)
         
         return {
             'original': message,
             'processed': processed,
             'tokens': self.tokenize(processed),
-            'intent': self.extract_intent(message),
+            'intent': classifier.primary(intents),
+            'intents': [match._asdict() for match in intents],
             'sentiment': self.analyze_sentiment(message),
             'word_count': len(message.split())
         }
@@ -201,7 +220,7 @@ class ResponseService:
     chatbot = NLPChatbot()
     
     @staticmethod
-    def find_matching_response(message_text: str, response_type: str = 'message'):
+    def find_matching_response(message_text: str, response_type: str = 'message', page_id: Optional[int] = None):
         """
         Trouver une réponse correspondante basée sur les mots-clés
         VERSION AMÉLIORÉE avec NLP tout en gardant la compatibilité
@@ -209,64 +228,64 @@ class ResponseService:
         Args:
             message_text: Texte du message/commentaire
             response_type: 'message', 'comment', ou 'both'
+            page_id: page concernée (ses règles + les règles globales);
+                     None = règles globales seulement
         
         Returns:
             Texte de la réponse ou None
         """
+        return ResponseService.match_response(message_text, response_type, page_id)[0]
+    
+    @staticmethod
+    def match_response(message_text: str, response_type: str = 'message',
+                       page_id: Optional[int] = None) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        Comme find_matching_response, mais renvoie aussi l'analyse NLP du
+        message (calculée une seule fois, réutilisée pour l'enregistrer)
+        
+        Returns:
+            (texte de la réponse ou None, analyse ou None)
+        """
+        analysis = None
         try:
             message_lower = message_text.lower()
+            analysis = ResponseService.chatbot.analyze_message(message_text)
             
-            # Récupérer toutes les réponses actives triées par priorité
-            responses = AutoResponse.query.filter_by(
-                is_active=True
-            ).filter(
-                (AutoResponse.response_type == response_type) | 
-                (AutoResponse.response_type == 'both')
-            ).order_by(AutoResponse.priority.desc()).all()
+            # Instantané en mémoire des règles actives de la page, triées par priorité
+            snapshot = rule_cache.get(response_type, page_id)
             
-            if not responses:
-                return None
+            if not snapshot.rules:
+                return None, analysis
             
             # MÉTHODE 1: Recherche exacte (comme l'ancien système) - PRIORITAIRE
-            for response in responses:
-                keywords = response.trigger_keyword.lower().split(',')
-                for keyword in keywords:
-                    keyword = keyword.strip()
-                    # Recherche exacte ou partielle
-                    if keyword in message_lower or re.search(r'\b' + re.escape(keyword) + r'\b', message_lower):
-                        # Analyser le message pour personnaliser
-                        analysis = ResponseService.chatbot.analyze_message(message_text)
-                        return ResponseService.chatbot.generate_context_response(
-                            analysis,
-                            response.response_text
-                        )
+            # Un seul passage sur le message pour toutes les règles, insensible aux accents
+            match_index = snapshot.matcher.first_match(message_lower)
+            if match_index is not None:
+                rule_hits.inc(str(snapshot.rules[match_index]['id']), 'keyword')
+                # Personnaliser selon l'analyse du message
+                return ResponseService.chatbot.generate_context_response(
+                    analysis,
+                    snapshot.rules[match_index]['response_text']
+                ), analysis
             
             # MÉTHODE 2: Recherche par NLP si aucune correspondance exacte
-            responses_dict = [{
-                'id': r.id,
-                'trigger_keyword': r.trigger_keyword,
-                'response_text': r.response_text,
-                'response_type': r.response_type,
-                'is_active': r.is_active,
-                'priority': r.priority
-            } for r in responses]
-            
             best_response = ResponseService.chatbot.find_best_response(
                 message_text,
-                responses_dict
+                list(snapshot.rules),
+                index=snapshot.get_similarity_index(ResponseService.chatbot)
             )
             
             if best_response:
-                analysis = ResponseService.chatbot.analyze_message(message_text)
+                rule_hits.inc(str(best_response['id']), 'similarity')
                 return ResponseService.chatbot.generate_context_response(
                     analysis,
                     best_response['response_text']
-                )
+                ), analysis
             
-            return None
+            return None, analysis
             
-        except Exception as e:
-            print(f"Erreur dans find_matching_response: {str(e)}")
+        except Exception:
+            log.exception('Erreur dans find_matching_response, recherche simple par mot-clé')
             # En cas d'erreur, utiliser l'ancienne méthode simple
             message_lower = message_text.lower()
             responses = AutoResponse.query.filter_by(
@@ -274,16 +293,22 @@ class ResponseService:
             ).filter(
                 (AutoResponse.response_type == response_type) | 
                 (AutoResponse.response_type == 'both')
+            ).filter(
+                (AutoResponse.page_id == page_id) | AutoResponse.page_id.is_(None)
             ).order_by(AutoResponse.priority.desc()).all()
             
             for response in responses:
                 keywords = response.trigger_keyword.lower().split(',')
                 for keyword in keywords:
                     keyword = keyword.strip()
-                    if keyword in message_lower:
-                        return response.response_text
+                    if Config.KEYWORD_WHOLE_WORDS:
+                        found = re.search(r'\b' + re.escape(keyword) + r'\b', message_lower)
+                    else:
+                        found = keyword in message_lower
+                    if found:
+                        return response.response_text, analysis
             
-            return None
+            return None, analysis
     
     @staticmethod
     def get_default_response():
@@ -316,6 +341,11 @@ class ResponseService:
         intents = []
         
         for msg in messages:
+            # Analyse déjà enregistrée avec le message: pas de recalcul
+            if msg.get('intent') is not None and msg.get('sentiment_score') is not None:
+                sentiments.append(msg['sentiment_score'])
+                intents.append(msg['intent'])
+                continue
             try:
                 analysis = ResponseService.chatbot.analyze_message(
                     msg.get('message_text', '')
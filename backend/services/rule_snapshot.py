@@ -0,0 +1,221 @@
+"""
+Instantané en mémoire des règles de réponse automatique
+
+Les règles changent quelques fois par jour mais sont lues à chaque message:
+on garde par page et par type de réponse ('message', 'comment', 'both') un
+instantané figé (règles de la page + règles globales, automate de
+mots-clés) remplacé d'un bloc quand elles changent. Les instantanés sont
+construits au premier événement de la page et oubliés après une période
+sans utilisation.
+
+Des compteurs de version en base invalident les caches des autres workers
+gunicorn: 'rules' pour les règles globales (tous les instantanés),
+'rules:<page>' pour les règles d'une page (ses instantanés seulement).
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import Config
+from models import db, AutoResponse, CacheVersion
+from services.keyword_matcher import KeywordMatcher
+from services.similarity_index import SimilarityIndex
+
+RULES_VERSION_KEY = 'rules'
+
+
+def read_version(name: str) -> int:
+    """Version actuelle d'un cache partagé (0 si jamais incrémentée)"""
+    version = db.session.execute(
+        select(CacheVersion.version).where(CacheVersion.name == name)
+    ).scalar()
+    return version or 0
+
+
+def read_versions(prefix: str) -> Dict[str, int]:
+    """Versions 'prefix' et 'prefix:*' en une requête"""
+    return dict(db.session.execute(
+        select(CacheVersion.name, CacheVersion.version).where(or_(
+            CacheVersion.name == prefix,
+            CacheVersion.name.like(f'{prefix}:%')
+        ))
+    ).all())
+
+
+def rules_version_key(page_id: Optional[int]) -> str:
+    return RULES_VERSION_KEY if page_id is None else f'{RULES_VERSION_KEY}:{page_id}'
+
+
+_DIALECT_INSERTS = {
+    'postgresql': pg_insert,
+    'sqlite': sqlite_insert
+}
+
+
+def bump_version(name: str):
+    """
+    Incrémenter une version dans la transaction courante (commit par l'appelant)
+
+    INSERT ... ON CONFLICT DO UPDATE: deux requêtes qui créent la même clé
+    en même temps (première modification d'une page) ne se gênent pas.
+    """
+    insert = _DIALECT_INSERTS.get(db.engine.dialect.name)
+    if insert is not None:
+        statement = insert(CacheVersion).values(name=name, version=1, updated_at=datetime.utcnow())
+        statement = statement.on_conflict_do_update(
+            index_elements=['name'],
+            set_={'version': CacheVersion.version + 1, 'updated_at': statement.excluded.updated_at}
+        )
+        db.session.execute(statement)
+        return
+
+    result = db.session.execute(
+        update(CacheVersion)
+        .where(CacheVersion.name == name)
+        .values(version=CacheVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.add(CacheVersion(name=name, version=1))
+
+
+class RuleSnapshot:
+    """Règles actives figées pour une page et un type de réponse, triées par priorité"""
+
+    __slots__ = ('version', 'page_id', 'response_type', 'rules', 'matcher',
+                 'last_used', '_similarity_index')
+
+    def __init__(self, version: Tuple[int, int], response_type: str, rules: Tuple[Dict, ...],
+                 page_id: Optional[int] = None):
+        self.version = version
+        self.page_id = page_id
+        self.response_type = response_type
+        self.rules = rules
+        self.matcher = KeywordMatcher((r['trigger_keyword'] for r in rules),
+                                      whole_words=Config.KEYWORD_WHOLE_WORDS)
+        self.last_used = time.monotonic()
+        self._similarity_index = None
+
+    @classmethod
+    def load(cls, response_type: str, version: Tuple[int, int],
+             page_id: Optional[int] = None) -> 'RuleSnapshot':
+        """Règles de la page et règles globales (à priorité égale, celles de la page d'abord)"""
+        scope = AutoResponse.page_id.is_(None)
+        if page_id is not None:
+            scope = or_(AutoResponse.page_id == page_id, scope)
+
+        responses = AutoResponse.query.filter_by(
+            is_active=True
+        ).filter(
+            (AutoResponse.response_type == response_type) |
+            (AutoResponse.response_type == 'both')
+        ).filter(scope).order_by(
+            AutoResponse.priority.desc(),
+            AutoResponse.page_id.is_(None)
+        ).all()
+
+        rules = tuple({
+            'id': r.id,
+            'trigger_keyword': r.trigger_keyword,
+            'response_text': r.response_text,
+            'response_type': r.response_type,
+            'is_active': r.is_active,
+            'priority': r.priority,
+            'page_id': r.page_id
+        } for r in responses)
+
+        return cls(version, response_type, rules, page_id)
+
+    def get_similarity_index(self, chatbot) -> SimilarityIndex:
+        """Index NLP de secours, construit au premier besoin"""
+        if self._similarity_index is None:
+            self._similarity_index = SimilarityIndex(self.rules, chatbot)
+        return self._similarity_index
+
+
+class RuleCache:
+    """Cache des instantanés de règles par (page, type), invalidé par version"""
+
+    def __init__(self, check_interval: float = 2.0, idle_ttl: float = 1800.0):
+        self.check_interval = check_interval
+        self.idle_ttl = idle_ttl
+        self._snapshots: Dict[Tuple[Optional[int], str], RuleSnapshot] = {}
+        self._versions: Optional[Dict[str, int]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _version_for(self, page_id: Optional[int]) -> Tuple[int, int]:
+        versions = self._versions or {}
+        page_version = versions.get(rules_version_key(page_id), 0) if page_id is not None else 0
+        return versions.get(RULES_VERSION_KEY, 0), page_version
+
+    def _refresh_versions(self):
+        """
+        Relire les versions en base au plus toutes les check_interval secondes,
+        écarter les instantanés périmés ou inutilisés depuis idle_ttl
+        """
+        now = time.monotonic()
+        if self._versions is not None and now - self._checked_at < self.check_interval:
+            return
+
+        versions = read_versions(RULES_VERSION_KEY)
+        with self._lock:
+            self._versions = versions
+            # Remplacement atomique: les lecteurs en cours gardent l'ancien dict
+            kept = {
+                key: snapshot for key, snapshot in self._snapshots.items()
+                if snapshot.version == self._version_for(key[0])
+                and now - snapshot.last_used < self.idle_ttl
+            }
+            self.evictions += len(self._snapshots) - len(kept)
+            self._snapshots = kept
+            self._checked_at = now
+
+    def get(self, response_type: str, page_id: Optional[int] = None) -> RuleSnapshot:
+        """Instantané des règles pour cette page (None = règles globales seules) et ce type"""
+        self._refresh_versions()
+
+        key = (page_id, response_type)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshots.get(key)
+                if snapshot is None:
+                    snapshot = RuleSnapshot.load(response_type, self._version_for(page_id), page_id)
+                    self._snapshots = {**self._snapshots, key: snapshot}
+                    self.loads += 1
+        snapshot.last_used = time.monotonic()
+        return snapshot
+
+    def invalidate(self, page_id: Optional[int] = None):
+        """
+        Signaler une modification des règles d'une page (None = règles globales)
+
+        À appeler avant db.session.commit(): la nouvelle version est écrite
+        dans la même transaction que la modification.
+        """
+        bump_version(rules_version_key(page_id))
+        self._checked_at = 0.0
+
+    def stats(self) -> Dict:
+        snapshots = self._snapshots
+        return {
+            'snapshots': len(snapshots),
+            'pages': len({page_id for page_id, _ in snapshots}),
+            'rules': sum(len(snapshot.rules) for snapshot in snapshots.values()),
+            'loads': self.loads,
+            'evictions': self.evictions
+        }
+
+
+rule_cache = RuleCache(
+    check_interval=Config.RULES_VERSION_CHECK_INTERVAL,
+    idle_ttl=Config.RULES_IDLE_TTL
+)
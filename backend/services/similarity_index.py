@@ -0,0 +1,150 @@
+"""
+Index de similarité pour la recherche NLP de secours
+
+Les mots-clés des règles sont pré-tokenisés une fois dans des matrices
+(tokens et comptes de caractères). Pour un message, une opération NumPy
+donne pour toutes les règles une borne supérieure du score de
+NLPChatbot.find_best_response ; le score exact (SequenceMatcher) n'est
+ensuite calculé que pour les règles dont la borne peut encore l'emporter.
+Le résultat est identique à celui du calcul règle par règle.
+"""
+
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.keyword_matcher import KeywordMatcher
+
+# Marge pour comparer bornes NumPy et scores Python sans faux négatif
+_EPSILON = 1e-9
+
+
+class SimilarityIndex:
+    """Scoring vectorisé des règles contre un message"""
+
+    def __init__(self, responses: List[Dict], chatbot, threshold: float = 0.3):
+        self.chatbot = chatbot
+        self.threshold = threshold
+        self.responses = [r for r in responses if r.get('is_active', True)]
+
+        count = len(self.responses)
+        self.keywords = [r.get('trigger_keyword', '') or '' for r in self.responses]
+        self.keywords_lower = [k.lower() for k in self.keywords]
+        self.priority_scores = [((r.get('priority', 0) or 0) / 100) * 0.1 for r in self.responses]
+
+        # Correspondance exacte des mots-clés (sans repli des accents, comme l'original)
+        self.keyword_matcher = KeywordMatcher(self.keywords, fold_accents=False)
+
+        # Tokens: matrice creuse règles × vocabulaire (format COO)
+        self.token_sets = [frozenset(chatbot.tokenize(k)) for k in self.keywords]
+        self.vocabulary: Dict[str, int] = {}
+        rows, cols = [], []
+        for row, tokens in enumerate(self.token_sets):
+            for token in tokens:
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+        self.token_rows = np.array(rows, dtype=np.int64)
+        self.token_cols = np.array(cols, dtype=np.int64)
+        self.token_counts = np.array([len(t) for t in self.token_sets], dtype=np.float64)
+
+        # Caractères: comptes par règle (borne de SequenceMatcher.quick_ratio)
+        self.alphabet: Dict[str, int] = {}
+        for keyword in self.keywords_lower:
+            for char in keyword:
+                self.alphabet.setdefault(char, len(self.alphabet))
+        self.char_counts = np.zeros((count, max(len(self.alphabet), 1)), dtype=np.int32)
+        for row, keyword in enumerate(self.keywords_lower):
+            for char in keyword:
+                self.char_counts[row, self.alphabet[char]] += 1
+        self.lengths = np.array([len(k) for k in self.keywords_lower], dtype=np.float64)
+        self.priority_array = np.array(self.priority_scores, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.responses)
+
+    def upper_bounds(self, processed_message: str, keyword_hits: np.ndarray) -> np.ndarray:
+        """Borne supérieure du score final pour chaque règle"""
+        count = len(self.responses)
+        message_lower = processed_message.lower()
+
+        # quick_ratio = 2 * caractères communs (multiensemble) / longueur totale
+        message_chars = {}
+        for char in message_lower:
+            message_chars[char] = message_chars.get(char, 0) + 1
+        columns = [self.alphabet[c] for c in message_chars if c in self.alphabet]
+        if columns:
+            wanted = np.array([message_chars[c] for c in message_chars if c in self.alphabet], dtype=np.int32)
+            common = np.minimum(self.char_counts[:, columns], wanted).sum(axis=1)
+        else:
+            common = np.zeros(count)
+        total_length = self.lengths + len(message_lower)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            seq_bound = np.where(total_length > 0, 2.0 * common / total_length, 1.0)
+
+        # Jaccard exact sur les tokens
+        message_tokens = set(self.chatbot.tokenize(processed_message))
+        token_ids = [self.vocabulary[t] for t in message_tokens if t in self.vocabulary]
+        if token_ids and len(self.token_cols):
+            hits = np.isin(self.token_cols, token_ids)
+            intersection = np.bincount(self.token_rows[hits], minlength=count).astype(np.float64)
+        else:
+            intersection = np.zeros(count)
+        union = self.token_counts + len(message_tokens) - intersection
+        with np.errstate(divide='ignore', invalid='ignore'):
+            jaccard = np.where(union > 0, intersection / union, 0.0)
+
+        if message_tokens:
+            similarity = np.where(self.token_counts > 0, seq_bound * 0.4 + jaccard * 0.6, seq_bound)
+        else:
+            similarity = seq_bound
+
+        return similarity * 0.5 + keyword_hits * 0.4 + self.priority_array
+
+    def exact_score(self, index: int, processed_message: str, message_tokens: set, keyword_match: float) -> float:
+        """Score identique à NLPChatbot.find_best_response pour une règle"""
+        seq_sim = SequenceMatcher(None, processed_message.lower(), self.keywords_lower[index]).ratio()
+        rule_tokens = self.token_sets[index]
+        if not message_tokens or not rule_tokens:
+            similarity = seq_sim
+        else:
+            intersection = message_tokens.intersection(rule_tokens)
+            union = message_tokens.union(rule_tokens)
+            jaccard_sim = len(intersection) / len(union) if union else 0
+            similarity = (seq_sim * 0.4 + jaccard_sim * 0.6)
+
+        return (
+            similarity * 0.5 +
+            keyword_match * 0.4 +
+            self.priority_scores[index]
+        )
+
+    def best_match(self, user_message: str) -> Optional[Dict]:
+        """Meilleure règle (score >= seuil) ou None"""
+        if not self.responses:
+            return None
+
+        processed = self.chatbot.preprocess_text(user_message)
+        keyword_hits = np.zeros(len(self.responses))
+        matched = self.keyword_matcher.find_all(processed)
+        if matched:
+            keyword_hits[matched] = 1.0
+
+        bounds = self.upper_bounds(processed, keyword_hits)
+        message_tokens = set(self.chatbot.tokenize(processed))
+
+        # Évaluer par borne décroissante (à borne égale, ordre des règles)
+        order = np.lexsort((np.arange(len(bounds)), -bounds))
+        best_index, best_score = None, float('-inf')
+        for index in order:
+            bound = bounds[index] + _EPSILON
+            if bound < self.threshold or bound < best_score:
+                break
+            index = int(index)
+            score = self.exact_score(index, processed, message_tokens, float(keyword_hits[index]))
+            if score > best_score or (score == best_score and index < best_index):
+                best_index, best_score = index, score
+
+        if best_index is None or best_score < self.threshold:
+            return None
+        return self.responses[best_index]
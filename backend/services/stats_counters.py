@@ -0,0 +1,163 @@
+"""
+Compteurs de statistiques maintenus de façon incrémentale
+
+Chaque message/commentaire enregistré incrémente une ligne de
+stats_counter (page, jour, canal, automatique) dans la même transaction,
+et /stats lit ces compteurs au lieu de compter les tables d'historique.
+Commandes Flask: `flask stats-rebuild` (recalcul depuis l'historique)
+et `flask stats-check` (vérification de cohérence).
+"""
+
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+import click
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Message, Comment, StatsCounter
+
+_DIALECT_INSERTS = {
+    'postgresql': pg_insert,
+    'sqlite': sqlite_insert
+}
+
+CHANNEL_MODELS = {
+    'message': Message,
+    'comment': Comment
+}
+
+CounterKey = Tuple[int, date, str, bool]
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def aggregate_history(conn) -> Dict[CounterKey, int]:
+    """Compter l'historique par (page, jour, canal, automatique)"""
+    totals: Dict[CounterKey, int] = {}
+    for channel, model in CHANNEL_MODELS.items():
+        day = func.date(model.timestamp)
+        page_id = func.coalesce(model.page_id, 0)
+        automated = func.coalesce(model.is_automated, False)
+        rows = conn.execute(
+            select(page_id, day, automated, func.count(model.id)).group_by(page_id, day, automated)
+        )
+        for row_page_id, row_day, row_automated, count in rows:
+            key = (row_page_id, _as_date(row_day), channel, bool(row_automated))
+            totals[key] = totals.get(key, 0) + count
+    return totals
+
+
+class StatsCounters:
+    """Lecture et mise à jour des compteurs"""
+
+    def record(self, channel: str, page_id: Optional[int], timestamp: Optional[datetime],
+               is_automated: bool, delta: int = 1):
+        """
+        Ajouter `delta` au compteur, dans la transaction courante
+
+        L'appelant fait le commit avec l'insertion du message/commentaire.
+        """
+        values = {
+            'page_id': page_id or 0,
+            'day': (timestamp or datetime.utcnow()).date(),
+            'channel': channel,
+            'is_automated': bool(is_automated),
+            'count': delta
+        }
+        insert = _DIALECT_INSERTS.get(db.engine.dialect.name)
+
+        if insert is not None:
+            statement = insert(StatsCounter).values(**values)
+            statement = statement.on_conflict_do_update(
+                index_elements=['page_id', 'day', 'channel', 'is_automated'],
+                set_={'count': StatsCounter.count + statement.excluded.count}
+            )
+            db.session.execute(statement)
+            return
+
+        counter = db.session.get(StatsCounter, (values['page_id'], values['day'], channel, values['is_automated']),
+                                 with_for_update=True)
+        if counter is None:
+            db.session.add(StatsCounter(**values))
+        else:
+            counter.count += delta
+
+    def move(self, channel: str, source, is_automated: bool):
+        """Déplacer un message/commentaire existant vers l'autre compteur (is_automated modifié)"""
+        if bool(source.is_automated) == bool(is_automated):
+            return
+        self.record(channel, source.page_id, source.timestamp, source.is_automated, delta=-1)
+        self.record(channel, source.page_id, source.timestamp, is_automated)
+
+    def totals(self, page_id: Optional[int] = None, since: Optional[date] = None) -> Dict[str, int]:
+        """Totaux par canal et automatique / non automatique"""
+        query = db.session.query(
+            StatsCounter.channel, StatsCounter.is_automated, func.sum(StatsCounter.count)
+        )
+        if page_id is not None:
+            query = query.filter(StatsCounter.page_id == page_id)
+        if since is not None:
+            query = query.filter(StatsCounter.day >= since)
+
+        totals = {'total_messages': 0, 'total_comments': 0, 'automated_messages': 0, 'automated_comments': 0}
+        for channel, automated, count in query.group_by(StatsCounter.channel, StatsCounter.is_automated):
+            totals[f'total_{channel}s'] += count or 0
+            if automated:
+                totals[f'automated_{channel}s'] += count or 0
+        return totals
+
+    def rebuild(self) -> int:
+        """Recalculer tous les compteurs depuis l'historique (commit)"""
+        totals = aggregate_history(db.session.connection())
+        StatsCounter.query.delete()
+        db.session.add_all([
+            StatsCounter(page_id=page_id, day=day, channel=channel, is_automated=automated, count=count)
+            for (page_id, day, channel, automated), count in totals.items()
+        ])
+        db.session.commit()
+        return len(totals)
+
+    def check(self) -> Dict[CounterKey, Tuple[int, int]]:
+        """Écarts entre compteurs et historique: {clé: (compteur, réel)}"""
+        expected = aggregate_history(db.session.connection())
+        actual = {
+            (c.page_id, c.day, c.channel, c.is_automated): c.count
+            for c in StatsCounter.query.all()
+        }
+        return {
+            key: (actual.get(key, 0), expected.get(key, 0))
+            for key in set(expected) | set(actual)
+            if actual.get(key, 0) != expected.get(key, 0)
+        }
+
+    def init_app(self, app):
+        """Commandes Flask CLI: stats-rebuild et stats-check"""
+
+        @app.cli.command('stats-rebuild')
+        def stats_rebuild():
+            """Recalculer les compteurs de /stats depuis l'historique"""
+            rows = self.rebuild()
+            click.echo(f'✅ Compteurs recalculés ({rows} lignes)')
+
+        @app.cli.command('stats-check')
+        def stats_check():
+            """Vérifier que les compteurs correspondent à l'historique"""
+            mismatches = self.check()
+            if not mismatches:
+                click.echo('✅ Compteurs cohérents avec l\'historique')
+                return
+            for (page_id, day, channel, automated), (counter, real) in sorted(mismatches.items(), key=str):
+                click.echo(f'❌ page={page_id} jour={day} {channel} automatique={automated}: '
+                           f'compteur={counter} réel={real}')
+            raise SystemExit(1)
+
+
+stats_counters = StatsCounters()
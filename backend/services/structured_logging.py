@@ -0,0 +1,219 @@
+"""
+Journalisation structurée et asynchrone
+
+Les modules écrivent via logging (loggers 'chatbot.*'); le handler ne fait
+que déposer l'enregistrement dans une file bornée: formatage, masquage des
+tokens et écriture sur stdout se font dans un thread dédié. Si la file est
+pleine, l'enregistrement est abandonné (compté) plutôt que de bloquer la
+requête.
+
+Chaque enregistrement porte le contexte courant (contextvars): identifiant
+de corrélation de l'événement, page, canal... Les dumps de payload sont
+émis en DEBUG, ou pour un échantillon (LOG_PAYLOAD_SAMPLE_RATE) en INFO.
+"""
+
+import atexit
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+ROOT_LOGGER = 'chatbot'
+
+_context: ContextVar[Dict] = ContextVar('log_context', default={})
+
+# access_token=..., "access_token": "...", appsecret_proof, jetons de page (EAA...)
+_SECRET_PATTERNS = [
+    (re.compile(r'((?:access_token|appsecret_proof|client_secret)=)[^&\s\'"]+'), r'\1***'),
+    (re.compile(r'''(['"](?:access_token|appsecret_proof|client_secret)['"]\s*:\s*['"])[^'"]+'''), r'\1***'),
+    (re.compile(r'\bEAA[A-Za-z0-9]{20,}'), 'EAA***'),
+]
+
+# Attributs standard d'un LogRecord (le reste vient de extra=...)
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'context'}
+
+
+def redact(text: str) -> str:
+    """Masquer les tokens d'accès et secrets dans un texte"""
+    for pattern, replacement in _SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Ajouter des champs (event_id, page_id, channel...) aux logs du bloc"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context() -> Dict:
+    return _context.get()
+
+
+# ---------- Échantillonnage des payloads ----------
+
+_payload_sample_rate = 0.0
+
+
+def log_payload(logger: logging.Logger, message: str, payload):
+    """
+    Dump d'un payload: toujours en DEBUG, sinon pour un échantillon en INFO
+
+    Le payload n'est converti en texte que s'il est effectivement écrit
+    (dans le thread d'écriture).
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('%s: %s', message, payload)
+    elif _payload_sample_rate and random.random() < _payload_sample_rate:
+        logger.info('%s (échantillon): %s', message, payload)
+
+
+# ---------- Formatage (thread d'écriture) ----------
+
+def _extra_fields(record: logging.LogRecord) -> Dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **getattr(record, 'context', {}),
+            **_extra_fields(record)
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return redact(json.dumps(data, ensure_ascii=False, default=str))
+
+
+class TextFormatter(logging.Formatter):
+    """Format lisible: date niveau logger [contexte] message clé=valeur"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s%(context_text)s %(message)s%(extra_text)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        context = getattr(record, 'context', {})
+        record.context_text = f" [{' '.join(f'{k}={v}' for k, v in context.items())}]" if context else ''
+        extra = _extra_fields(record)
+        extra.pop('context_text', None)
+        extra.pop('extra_text', None)
+        record.extra_text = ''.join(f' {k}={v}' for k, v in extra.items())
+        return redact(super().format(record))
+
+
+# ---------- Handler non bloquant ----------
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Dépose les enregistrements dans une file bornée, sans formatage
+
+    Le thread d'écriture est (re)démarré dans chaque processus (après le
+    fork des workers gunicorn).
+    """
+
+    def __init__(self, target: logging.Handler, max_size: int = 10000):
+        super().__init__(queue.Queue(maxsize=max_size))
+        self.target = target
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # File en mémoire: pas besoin de pré-formater (fait dans le thread d'écriture)
+        record.context = _context.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Vider la file (arrêt du processus)"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+    def stats(self) -> Dict:
+        return {
+            'queued': self.queue.qsize(),
+            'max_size': self.queue.maxsize,
+            'dropped': self.dropped
+        }
+
+
+_handler: Optional[AsyncQueueHandler] = None
+
+
+def configure_logging(app=None, level: Optional[str] = None, fmt: Optional[str] = None) -> AsyncQueueHandler:
+    """Installer le handler asynchrone sur les loggers 'chatbot.*' (une fois par processus)"""
+    global _handler, _payload_sample_rate
+
+    config = app.config if app is not None else {}
+    level = (level or config.get('LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or config.get('LOG_FORMAT', 'text')
+    _payload_sample_rate = config.get('LOG_PAYLOAD_SAMPLE_RATE', 0.0)
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    if _handler is not None:
+        return _handler
+
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    _handler = AsyncQueueHandler(target, max_size=config.get('LOG_QUEUE_SIZE', 10000))
+    root.addHandler(_handler)
+    root.propagate = False
+    atexit.register(_handler.stop)
+    return _handler
+
+
+def logging_stats() -> Dict:
+    stats = _handler.stats() if _handler is not None else {}
+    return {
+        'level': logging.getLevelName(logging.getLogger(ROOT_LOGGER).getEffectiveLevel()),
+        'payload_sample_rate': _payload_sample_rate,
+        **stats
+    }